@@ -1,11 +1,12 @@
 import os
-import time
 import pandas as pd
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
-from utils.drivers import setup_driver
+from utils.drivers import leased_driver
+from utils.waits import polite_pause, wait_for_network_idle
+from utils.storage import save_snapshot
 from tqdm import tqdm
 
 
@@ -28,10 +29,8 @@ def navigate_to_page(driver, url):
         button = WebDriverWait(driver, 20).until(
             EC.presence_of_element_located((By.CSS_SELECTOR, advisor_button_selector)))
         button.click()
-        # Wait for the redirection to complete
-        time.sleep(5)
 
-        # Try to find and click the "I have read and agree to the terms" checkbox
+        # Try to find and click the "I have read and agree to the terms" checkbox once the redirection is complete
         checkbox_selector = '#I\\ have\\ read\\ and\\ agree\\ to\\ the\\ terms\\.'
         checkbox = WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.CSS_SELECTOR, checkbox_selector)))
         checkbox.click()
@@ -45,8 +44,9 @@ def navigate_to_page(driver, url):
             EC.presence_of_element_located((By.CSS_SELECTOR, accept_and_continue_button_selector)))
         accept_button.click()
 
-        # Add delay and then redirect back to the target page
-        time.sleep(10)
+        # Wait for the affirmation to be registered and then redirect back to the target page
+        wait_for_network_idle(driver, timeout=10)
+        polite_pause('dimensional')
         driver.get(url)
 
     except NoSuchElementException:
@@ -141,15 +141,12 @@ def get_etf_data(driver, links):
     # Get data for all ETFs
     data = []
     for link in tqdm(links):
+        polite_pause('dimensional')
         etf_data = extract_etf_info(driver, link)
 
         # Only add the etf_data to the list if it's not None and if Yield to Maturity is not '—'
         if etf_data is not None and etf_data['Yield to Maturity'] != '—':
             data.append(etf_data)
-        elif etf_data is not None and etf_data['Yield to Maturity'] == '—':
-            continue
-
-        time.sleep(3)
 
     # Convert data list to a pandas DataFrame
     df = pd.DataFrame(data)
@@ -168,7 +165,7 @@ def get_etf_data(driver, links):
     return df
 
 
-def dimensional_bot(return_df=False, headless=True):
+def dimensional_bot(return_df=False, headless=True, lean=False):
     """
     :description: Run the Dimensional ETF yield bot
 
@@ -176,20 +173,22 @@ def dimensional_bot(return_df=False, headless=True):
     :type return_df: bool, optional
     :param headless: run the bot in headless mode if True, default is True
     :type headless: bool, optional
+    :param lean: block images, fonts, stylesheets and trackers to speed up page loads if True, default is False
+    :type lean: bool, optional
     :return: Dimensional ETF yield data
     :rtype: pd.DataFrame
     """
     print('Downloading Dimensional ETF yield data...')
     url = 'https://www.dimensional.com/us-en/funds?ac=fixed-income&ft=etf'
-    driver = setup_driver(headless)
-    navigate_to_page(driver, url)
-    links = get_links(driver)
+    with leased_driver(headless, lean) as driver:
+        navigate_to_page(driver, url)
+        links = get_links(driver)
 
-    try:
-        df = get_etf_data(driver, links)
-    except KeyError as e:
-        print(f"KeyError encountered: {e}. Skipping Dimensional ETF yield data.")
-        return None
+        try:
+            df = get_etf_data(driver, links)
+        except KeyError as e:
+            print(f"KeyError encountered: {e}. Skipping Dimensional ETF yield data.")
+            return None
 
     # Get the absolute path of the project's root directory
     project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -201,7 +200,7 @@ def dimensional_bot(return_df=False, headless=True):
     csv_path = os.path.join(project_dir, 'data', 'dimensional.csv')
 
     print('Saving Dimensional ETF yield data to CSV file...')
-    df.to_csv(csv_path)
+    save_snapshot(df, csv_path)
     print('Done!')
     if return_df:
         return df
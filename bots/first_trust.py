@@ -1,15 +1,19 @@
 import os
 import re
-import time
-import requests
 import random
 import pandas as pd
-from bs4 import BeautifulSoup
 from datetime import datetime
-from tqdm import tqdm
-from time import sleep
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from utils.http_client import fetch_all, NOT_MODIFIED
+from utils.incremental import plan_refresh, load_previous, merge_previous, load_validators, save_validators
+from utils.storage import save_snapshot
+from utils.parsing import parse_html, table_pairs
+
+# Elements of the ETF summary page read by parse_etf_data
+page_ids = [
+    'FundNavigation_lblPageHeader',
+    'FundCharacteristics_FundControlContainer',
+    'FundCharacteristics_FundControlContainer_NameValuePairListing'
+]
 
 
 def get_as_of_date(soup):
@@ -58,73 +62,91 @@ USER_AGENTS = [
 ]
 
 
-def get_etf_data(ticker):
+def etf_url(ticker):
     """
-    :description: Get the ETF data
+    :description: Get the url of the ETF summary page
 
     :param ticker: The ETF ticker
     :type ticker: str
-    :return: ETF data
+    :return: The url of the ETF summary page
+    :rtype: str
+    """
+    return f'https://www.ftportfolios.com/Retail/Etf/EtfSummary.aspx?Ticker={ticker}'
+
+
+def parse_etf_data(html):
+    """
+    :description: Parse the ETF data from the ETF summary page
+
+    :param html: The html of the ETF summary page
+    :type html: str
+    :return: ETF data, or None if the characteristics table is missing
     :rtype: dict
     """
-    url = f'https://www.ftportfolios.com/Retail/Etf/EtfSummary.aspx?Ticker={ticker}'
+    # Only build the page header and the fund characteristics, which hold all the data
+    soup = parse_html(html, ids=page_ids)
+    etf_name = None
+
+    # Extract ETF name
+    etf_name_span = soup.find('span', {'id': 'FundNavigation_lblPageHeader'})
+    if etf_name_span is not None:
+        etf_name = re.sub(r' \(.*\)', '', etf_name_span.text)
+
+    table = soup.find('table', {'id': 'FundCharacteristics_FundControlContainer_NameValuePairListing'})
+    if table is None:
+        return None
+
+    data_dict = {clean_index_field(field_name): value for field_name, value in table_pairs(table).items()}
+    data_dict['As of'] = get_as_of_date(soup)
+    data_dict['ETF Name'] = etf_name
+    return data_dict
 
+
+def get_etf_data(tickers, validators=None):
+    """
+    :description: Get the ETF data, fetching the ETF summary pages concurrently
+
+    :param tickers: The ETF tickers
+    :type tickers: list
+    :param validators: ETag and Last-Modified headers by url of the previous fetch. If given, pages that haven't
+        changed are not downloaded again, and the dict is updated with the headers of the pages that were parsed.
+    :type validators: dict, optional
+    :return: ETF data by ticker, NOT_MODIFIED for unchanged pages, tickers that failed are left out
+    :rtype: dict
+    """
     # Select a random user-agent
     headers = {
         'User-Agent': random.choice(USER_AGENTS)
     }
 
-    # Retry strategy
-    retry_strategy = Retry(
-        total=1,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["HEAD", "GET", "OPTIONS"],
-        backoff_factor=1
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    http = requests.Session()
-    http.mount("https://", adapter)
-
-    # Making the request with retries and random delays
-    for attempt in range(3):
-        try:
-            response = http.get(url, headers=headers)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            etf_name = None
-
-            # Extract ETF name
-            etf_name_span = soup.find('span', {'id': 'FundNavigation_lblPageHeader'})
-            if etf_name_span is not None:
-                etf_name = re.sub(r' \(.*\)', '', etf_name_span.text)
-
-            table = soup.find('table', {'id': 'FundCharacteristics_FundControlContainer_NameValuePairListing'})
-
-            data_dict = {}
-            rows = table.find_all('tr')
-            for row in rows:
-                cols = row.find_all('td')
-                field_name = clean_index_field(cols[0].text.strip())
-                value = cols[1].text.strip()
-                data_dict[field_name] = value
-            data_dict['As of'] = get_as_of_date(soup)
-            data_dict['ETF Name'] = etf_name
-            return data_dict
-
-        except requests.exceptions.RequestException as e:
-            print(f"Attempt {attempt + 1} failed: {e}")
-            sleep(random.uniform(1, 5))  # Random delay between 1 and 5 seconds
-
-    print(f"Failed to retrieve data for ticker {ticker} after 3 attempts.")
-    return None
+    urls = [etf_url(ticker) for ticker in tickers]
+    pages = fetch_all(urls, headers=headers, retries=2, progress=True, validators=validators)
 
-
-def first_trust_bot(return_df=False):
+    data = {}
+    for ticker, url, html in zip(tickers, urls, pages):
+        if html is NOT_MODIFIED:
+            data[ticker] = NOT_MODIFIED
+            continue
+        etf_data = parse_etf_data(html) if html is not None else None
+        if etf_data is None:
+            # Forget the page, so it isn't skipped as unchanged next time although it gave no data
+            if validators is not None:
+                validators.pop(url, None)
+            print(f"Failed to retrieve data for ticker {ticker}.")
+            continue
+        data[ticker] = etf_data
+    return data
+
+
+def first_trust_bot(return_df=False, incremental=False):
     """
     :description: Run the First Trust ETF yield bot
 
     :param return_df: return the DataFrame if True, default is False
     :type return_df: bool, optional
+    :param incremental: only fetch the funds whose data may have changed since the previous run if True, default is
+        False
+    :type incremental: bool, optional
     :return: First Trust ETF yield data
     :rtype: pd.DataFrame
     """
@@ -152,16 +174,34 @@ def first_trust_bot(return_df=False):
     ]
 
     print('Downloading First Trust ETF yield data...')
-    data = {}
-    for ticker in tqdm(tickers):
-        data[ticker] = get_etf_data(ticker)
-        time.sleep(2)
+    previous = None
+    validators = None
+    if incremental:
+        tickers, previous = plan_refresh('first_trust', tickers)
+        validators = load_validators()
+    data = get_etf_data(tickers, validators)
+
+    # Keep the previous rows of the pages that haven't changed
+    unchanged = [ticker for ticker, etf_data in data.items() if etf_data is NOT_MODIFIED]
+    if unchanged:
+        last_run = load_previous('first_trust')
+
+        # Fetch the unchanged pages without a previous row again in full, e.g. after a run that failed to save
+        missing = [ticker for ticker in unchanged if ticker not in last_run.index]
+        if missing:
+            for ticker in missing:
+                validators.pop(etf_url(ticker), None)
+            data.update(get_etf_data(missing, validators))
+        previous = merge_previous(previous, last_run.loc[last_run.index.intersection(unchanged)])
+    data = {ticker: etf_data for ticker, etf_data in data.items() if etf_data is not NOT_MODIFIED}
 
     df = pd.DataFrame(data)
-    df = df.loc[['ETF Name', 'Weighted Average Yield-to-Worst', 'As of']].dropna(axis=1).T
+    if not df.empty:
+        df = df.loc[['ETF Name', 'Weighted Average Yield-to-Worst', 'As of']].dropna(axis=1).T
+        df['Weighted Average Yield-to-Worst'] = df['Weighted Average Yield-to-Worst'].apply(
+            lambda x: float(x.replace('%', '')) / 100)
     df.index.name = 'Ticker'
-    df['Weighted Average Yield-to-Worst'] = df['Weighted Average Yield-to-Worst'].apply(
-        lambda x: float(x.replace('%', '')) / 100)
+    df = merge_previous(df, previous)
 
     # Get the absolute path of the project's root directory
     project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -173,7 +213,11 @@ def first_trust_bot(return_df=False):
     csv_path = os.path.join(project_dir, 'data', 'first_trust.csv')
 
     print('Saving First Trust ETF yield data to CSV file...')
-    df.to_csv(csv_path)
+    save_snapshot(df, csv_path)
+
+    # Only remember the page versions once their data is saved
+    if validators is not None:
+        save_validators(validators)
     print('Done!')
     if return_df:
         return df
@@ -1,12 +1,13 @@
 import os
-import time
-import random
 import pandas as pd
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, ElementClickInterceptedException
-from utils.drivers import setup_driver
+from utils.drivers import leased_driver
+from utils.waits import polite_pause, wait_for_element
+from utils.extraction import extract_fields
+from utils.storage import save_snapshot
 from tqdm import tqdm
 
 
@@ -38,7 +39,7 @@ def navigate_to_page(driver, url):
     :return: None
     :rtype: None
     """
-    time.sleep(random.randint(2, 10))  # delay before accessing the URL
+    polite_pause('flexshares')
     driver.get(url)
 
     WebDriverWait(driver, 20).until(EC.presence_of_element_located((
@@ -53,7 +54,9 @@ def navigate_to_page(driver, url):
         'div.cmp-fund-performance__filters > div.d-md-flex.d-none.cmp-fund-performance__filters__gap-40 > '
         'div:nth-child(1) > div:nth-child(2) > div > fieldset > div > div:nth-child(3) > label > span'
     ))).click()
-    time.sleep(random.randint(2, 10))  # delay after accessing the URL
+
+    # Wait for the filtered table to show the fund links
+    wait_for_element(driver, (By.CSS_SELECTOR, 'table.table > tbody > tr > td:nth-child(1) .fund-name-data > a'), 20)
 
 
 def get_links(driver):
@@ -87,22 +90,29 @@ def get_etf_data(driver, links):
     data = []
 
     for link in tqdm(links):
+        polite_pause('flexshares')
         driver.get(link)
-        time.sleep(3)  # wait for the page to load completely
-
-        # Extract the ticker and name
-        ticker = driver.find_element(By.CSS_SELECTOR, 'div.cmp-fund-intro > h1').text
-        name = driver.find_element(By.CSS_SELECTOR, 'div.cmp-fund-intro__desc-wrapper > h2').text
-        as_of_date = driver.find_element(By.CSS_SELECTOR, '#quick-stats > div > div > div > div > p').text
-
-        table_elements = driver.find_elements(By.CSS_SELECTOR,
-                                              '.cmp-quick-stats__item')
 
-        data_row = {"TICKER": ticker, "NAME": name, "AS OF DATE": as_of_date}  # start the row with the ticker and name
-        for element in table_elements:
-            label = element.find_element(By.CSS_SELECTOR, '.cmp-quick-stats__label > p').text
-            value = element.find_element(By.CSS_SELECTOR, '.cmp-quick-stats__value').text
-            data_row[label] = value
+        # Wait for the fund intro and the quick stats to be rendered
+        wait_for_element(driver, (By.CSS_SELECTOR, 'div.cmp-fund-intro > h1'), 20)
+        wait_for_element(driver, (By.CSS_SELECTOR, '.cmp-quick-stats__item .cmp-quick-stats__value'), 20)
+
+        # Extract the ticker, name, as of date and all quick stats in one round trip
+        fields = extract_fields(driver, {
+            'ticker': 'div.cmp-fund-intro > h1',
+            'name': 'div.cmp-fund-intro__desc-wrapper > h2',
+            'as_of_date': '#quick-stats > div > div > div > div > p',
+            'stats': {
+                'selector': '.cmp-quick-stats__item',
+                'all': True,
+                'fields': {'label': '.cmp-quick-stats__label > p', 'value': '.cmp-quick-stats__value'}
+            }
+        })
+
+        # start the row with the ticker and name
+        data_row = {"TICKER": fields['ticker'], "NAME": fields['name'], "AS OF DATE": fields['as_of_date']}
+        for stat in fields['stats']:
+            data_row[stat['label']] = stat['value']
 
         data.append(data_row)
 
@@ -127,7 +137,7 @@ def get_etf_data(driver, links):
     return df
 
 
-def flexshares_bot(return_df=False, headless=True):
+def flexshares_bot(return_df=False, headless=True, lean=False):
     """
     :description: Run the FlexShares ETF yield bot
 
@@ -135,15 +145,17 @@ def flexshares_bot(return_df=False, headless=True):
     :type return_df: bool, optional
     :param headless: run the bot in headless mode if True, default is True
     :type headless: bool, optional
+    :param lean: block images, fonts, stylesheets and trackers to speed up page loads if True, default is False
+    :type lean: bool, optional
     :return: FlexShares ETF yield data
     :rtype: pd.DataFrame
     """
     print('Downloading FlexShares ETF yield data...')
     url = 'https://www.flexshares.com/us/en/individual/funds'
-    driver = setup_driver(headless)
-    navigate_to_page(driver, url)
-    links = get_links(driver)
-    df = get_etf_data(driver, links)
+    with leased_driver(headless, lean) as driver:
+        navigate_to_page(driver, url)
+        links = get_links(driver)
+        df = get_etf_data(driver, links)
 
     # Get the absolute path of the project's root directory
     project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -155,7 +167,7 @@ def flexshares_bot(return_df=False, headless=True):
     csv_path = os.path.join(project_dir, 'data', 'flexshares.csv')
 
     print('Saving FlexShares ETF yield data to CSV file...')
-    df.to_csv(csv_path)
+    save_snapshot(df, csv_path)
     print('Done!')
     if return_df:
         return df
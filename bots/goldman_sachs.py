@@ -1,12 +1,14 @@
 import os
-import time
 import pandas as pd
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
-from selenium.common.exceptions import NoSuchElementException
-from utils.drivers import setup_driver
+from utils.drivers import leased_driver
+from utils.waits import polite_pause
+from utils.extraction import extract_fields
+from utils.frames import coalesce
+from utils.storage import save_snapshot
 from tqdm import tqdm
 
 
@@ -43,38 +45,25 @@ def get_links(driver):
         '#gridContainerWrapper'
     )))
 
-    links = []
-    index = 0
-
-    while True:
-        try:
-            # Wait for the row to load
-            WebDriverWait(driver, 20).until(EC.presence_of_element_located((
-                By.CSS_SELECTOR,
-                f"#gridContainerWrapper > div.dockedColumns > div.spacetop_list > "
-                f"div.main_table_row.white_row_bg.actionable._data_row_{index}.{'odd' if index % 2 == 0 else 'even'} "
-                f"> div:nth-child(1) > div > div > div.col4.assetclass-col > a"
-            )))
-
-            # Get the link
-            link = driver.find_element(
-                By.CSS_SELECTOR,
-                f"#gridContainerWrapper > div.dockedColumns > div.spacetop_list > "
-                f"div.main_table_row.white_row_bg.actionable._data_row_{index}.{'odd' if index % 2 == 0 else 'even'} "
-                f"> div:nth-child(1) > div > div > div.col4.assetclass-col > a"
-            ).get_attribute('href')
-
-            # Append the link to the list of links
-            links.append(link)
-
-            # Increment the index for the next row
-            index += 1
-
-        except (NoSuchElementException, TimeoutException):
-            # No more rows found
-            break
-
-    return links
+    # Wait for the first row, then read the links of all rows in one round trip
+    try:
+        WebDriverWait(driver, 20).until(EC.presence_of_element_located((
+            By.CSS_SELECTOR,
+            '#gridContainerWrapper > div.dockedColumns > div.spacetop_list > div.main_table_row._data_row_0'
+        )))
+    except TimeoutException:
+        # No rows found
+        return []
+
+    fields = extract_fields(driver, {
+        'links': (
+            '#gridContainerWrapper > div.dockedColumns > div.spacetop_list > '
+            'div.main_table_row.white_row_bg.actionable > div:nth-child(1) > div > div > div.col4.assetclass-col > a',
+            'href',
+            'all'
+        )
+    })
+    return fields['links']
 
 
 def extract_etf_info(driver, url):
@@ -97,55 +86,38 @@ def extract_etf_info(driver, url):
         '#holdTabContainerRight > section > div'
     )))
 
-    name = driver.find_element(By.CSS_SELECTOR,
-                               'body > div.container-fluid.header-section-container > div:nth-child(12) > div > h1'
-                               ).text
-    as_of_date = driver.find_element(By.CSS_SELECTOR,
-                                     '#holdTabContainerRight > section > h2 > span').text
-    ticker = driver.find_element(By.CSS_SELECTOR,
-                                 '#SCMpreferedValue').text  # Extract the ticker from the page
-
-    etf_info = {"Ticker": ticker, "Name": name}
-    index = 1
-
-    while True:
-        try:
-            try:
-                # Try to get the first column value for 2-column table
-                first_column_value = driver.find_element(
-                    By.CSS_SELECTOR,
-                    f"#holdTabContainerRight > section > div > div:nth-child({index}) > span.altRows__left"
-                ).text
-
-                # Try to get the second column value for 2-column table
-                second_column_value = driver.find_element(
-                    By.CSS_SELECTOR,
-                    f"#holdTabContainerRight > section > div > div:nth-child({index}) > span.altRows__right"
-                ).text
-
-            except NoSuchElementException:
-                # If not found, it is a 3-column table
-                first_column_value = driver.find_element(
-                    By.CSS_SELECTOR,
-                    f"#holdTabContainerRight > section > div > div:nth-child({index}) > span.altRows__col1"
-                ).text
-
-                second_column_value = driver.find_element(
-                    By.CSS_SELECTOR,
-                    f"#holdTabContainerRight > section > div > div:nth-child({index}) > span.altRows__col2"
-                ).text
-
-            # Add the data to the dictionary
-            etf_info[first_column_value] = second_column_value
-
-            # Increment the index for the next row
-            index += 1
-
-        except NoSuchElementException:
+    # Read the header and all characteristic rows in one round trip
+    fields = extract_fields(driver, {
+        'name': 'body > div.container-fluid.header-section-container > div:nth-child(12) > div > h1',
+        'as_of_date': '#holdTabContainerRight > section > h2 > span',
+        'ticker': '#SCMpreferedValue',
+        'rows': {
+            'selector': '#holdTabContainerRight > section > div > div',
+            'all': True,
+            'fields': {
+                # 2-column tables use left/right, 3-column tables use col1/col2
+                'left': ':scope > span.altRows__left',
+                'right': ':scope > span.altRows__right',
+                'col1': ':scope > span.altRows__col1',
+                'col2': ':scope > span.altRows__col2',
+            }
+        }
+    })
+
+    etf_info = {"Ticker": fields['ticker'], "Name": fields['name']}
+
+    for row in fields['rows']:
+        if row['left'] is not None and row['right'] is not None:
+            first_column_value, second_column_value = row['left'], row['right']
+        elif row['col1'] is not None and row['col2'] is not None:
+            first_column_value, second_column_value = row['col1'], row['col2']
+        else:
             # No more rows found
             break
 
-        etf_info['As of Date'] = as_of_date
+        # Add the data to the dictionary
+        etf_info[first_column_value] = second_column_value
+        etf_info['As of Date'] = fields['as_of_date']
 
     return etf_info
 
@@ -164,14 +136,13 @@ def get_etf_data(driver, links):
     # Get data for all ETFs
     data = []
     for link in tqdm(links):
+        polite_pause('goldman_sachs')
         etf_data = extract_etf_info(driver, link + '#activeTab=holdings')
 
         # Only add the etf_data to the list if it's not None
         if etf_data is not None:
             data.append(etf_data)
 
-        time.sleep(5)
-
     # Convert data list to a pandas DataFrame
     df = pd.DataFrame(data)
 
@@ -200,21 +171,24 @@ def get_etf_data(driver, links):
     df.rename(columns={'Weighted Avg YTM': 'Yield to Maturity'}, inplace=True)
 
     # Replace the NaN values in 'Yield to Maturity' and 'Yield to Worst' with the values from the capped columns
+    capped_columns = ['Yield to Maturity,capped (YTM,%)', 'Yield to Worst,capped (YTW,%)']
     try:
-        df['Yield to Maturity'].fillna(df['Yield to Maturity,capped (YTM,%)'] / 100.0, inplace=True)
-        df['Yield to Worst'].fillna(df['Yield to Worst,capped (YTW,%)'] / 100.0, inplace=True)
+        capped = df.assign(**{column: df[column] / 100.0 for column in capped_columns})
     except TypeError:
         return df
+    df['Yield to Maturity'], df['Yield to Maturity Source'] = coalesce(
+        capped, ['Yield to Maturity', 'Yield to Maturity,capped (YTM,%)'])
+    df['Yield to Worst'], _ = coalesce(capped, ['Yield to Worst', 'Yield to Worst,capped (YTW,%)'])
 
     # Drop the capped columns
-    df.drop(['Yield to Maturity,capped (YTM,%)', 'Yield to Worst,capped (YTW,%)'], axis=1, inplace=True)
+    df.drop(capped_columns, axis=1, inplace=True)
 
     # Drop unwanted ETFs
     df.dropna(subset=['Yield to Maturity'], inplace=True)
 
     # Filter columns
     df = df[[
-        'Name', 'Yield to Maturity', 'As of Date', 'Weighted Avg Coupon',
+        'Name', 'Yield to Maturity', 'Yield to Maturity Source', 'As of Date', 'Weighted Avg Coupon',
         'Effective Duration', 'Weighted Avg Maturity', 'Option Adjusted Spread',
         'Yield to Worst', 'Average Price', 'Number of Holdings',
         'Average Coupon (%)', 'Effective Maturity (yrs)',
@@ -224,7 +198,7 @@ def get_etf_data(driver, links):
     return df
 
 
-def goldman_sachs_bot(return_df=False, headless=True):
+def goldman_sachs_bot(return_df=False, headless=True, lean=False):
     """
     :description: Run the Goldman Sachs ETF yield bot
 
@@ -232,16 +206,18 @@ def goldman_sachs_bot(return_df=False, headless=True):
     :type return_df: bool, optional
     :param headless: run the bot in headless mode if True, default is True
     :type headless: bool, optional
+    :param lean: block images, fonts, stylesheets and trackers to speed up page loads if True, default is False
+    :type lean: bool, optional
     :return: Goldman Sachs ETF yield data
     :rtype: pd.DataFrame
     """
     print('Downloading Goldman Sachs ETF yield data...')
     url = 'https://www.gsam.com/content/gsam/us/en/advisors/fund-center/etf-fund-finder.html#activeTab=charTab&sortF' \
           '=SUPER_ASSETCLASS&sortO=desc'
-    driver = setup_driver(headless)
-    navigate_to_page(driver, url)
-    links = get_links(driver)
-    df = get_etf_data(driver, links)
+    with leased_driver(headless, lean) as driver:
+        navigate_to_page(driver, url)
+        links = get_links(driver)
+        df = get_etf_data(driver, links)
 
     # Get the absolute path of the project's root directory
     project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -253,7 +229,7 @@ def goldman_sachs_bot(return_df=False, headless=True):
     csv_path = os.path.join(project_dir, 'data', 'goldman_sachs.csv')
 
     print('Saving Goldman Sachs ETF yield data to CSV file...')
-    df.to_csv(csv_path)
+    save_snapshot(df, csv_path)
     print('Done!')
     if return_df:
         return df
@@ -1,6 +1,4 @@
 import os
-import time
-import random
 import pandas as pd
 from tqdm import tqdm
 from traceback import print_exc
@@ -11,7 +9,10 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from selenium.common.exceptions import NoSuchElementException
 from selenium.common.exceptions import ElementNotInteractableException
-from utils.drivers import setup_driver
+from utils.drivers import leased_driver
+from utils.waits import polite_pause
+from utils.incremental import plan_refresh, merge_previous
+from utils.storage import save_snapshot
 
 url = ('https://www.invesco.com/us/financial-products/etfs/performance?'
        'audienceType=Advisor')
@@ -185,6 +186,18 @@ def find_table(driver, css_selector):
             return None
 
 
+def ticker_from_link(hyperlink):
+    """
+    :description: Get the ticker from the hyperlink to the ETF page
+
+    :param hyperlink: The hyperlink to the ETF page
+    :type hyperlink: str
+    :return: The ticker
+    :rtype: str
+    """
+    return hyperlink.split('=')[-1]
+
+
 def extract_data(driver, hyperlinks):
     """
     :description: Extract data from each hyperlink
@@ -200,6 +213,8 @@ def extract_data(driver, hyperlinks):
 
     # Iterate through each hyperlink to extract data
     for hyperlink in tqdm(hyperlinks):
+        # Keep a minimum delay between requests to avoid being blocked
+        polite_pause('invesco')
         driver.get(hyperlink)
 
         # Find the table elements
@@ -207,7 +222,7 @@ def extract_data(driver, hyperlinks):
         table2 = find_table(driver, yield_table_css2)
 
         # Find ticker and name
-        ticker = hyperlink.split('=')[-1]
+        ticker = ticker_from_link(hyperlink)
         name = driver.find_element(By.CSS_SELECTOR, name_css).text
 
         # Extract the text content of the table and ticker from the hyperlink
@@ -218,9 +233,6 @@ def extract_data(driver, hyperlinks):
         data.append(table_text1)
         data.append(table_text2)
 
-        # Add a delay to avoid being blocked
-        time.sleep(random.randint(2, 10))
-
     return data
 
 
@@ -332,56 +344,64 @@ def process_data(data_list: List[str]) -> pd.DataFrame:
     return df_final
 
 
-def invesco_bot(headless=True):
+def invesco_bot(headless=True, lean=False, incremental=False):
     """
     :description: Run the Invesco ETF yield bot
 
     :param headless: Whether to run the WebDriver in headless mode
     :type headless: bool
+    :param lean: Whether to block images, fonts, stylesheets and trackers to
+        speed up page loads
+    :type lean: bool
+    :param incremental: Whether to only fetch the funds whose data may have
+        changed since the previous run
+    :type incremental: bool
     :return: Invesco ETF yield data
     :rtype: pd.DataFrame
     """
     print('Downloading Invesco ETF yield data...')
 
-    # Set up the Chrome WebDriver
-    driver = setup_driver(headless)
-
-    try:
-        # Navigate to the page with the ETF data
-        navigate_to_page(driver)
+    # Lease a Chrome WebDriver, which is returned to the pool or closed on exit
+    with leased_driver(headless, lean) as driver:
+        try:
+            # Navigate to the page with the ETF data
+            navigate_to_page(driver)
 
-        # Extract hyperlinks from the resulting table
-        hyperlinks = extract_hyperlinks(driver)
+            # Extract hyperlinks from the resulting table
+            hyperlinks = extract_hyperlinks(driver)
 
-        # Extract data from each hyperlink
-        data = extract_data(driver, hyperlinks)
+            # Skip the funds whose previous data is still current
+            previous = None
+            if incremental:
+                hyperlinks, previous = plan_refresh(
+                    'invesco', hyperlinks, ticker_from_link
+                )
 
-        # Process the data into a DataFrame
-        df = process_data(data)
+            # Extract data from each hyperlink
+            data = extract_data(driver, hyperlinks)
 
-        # Save the data to a CSV file
-        # Get the absolute path of the project's root directory
-        project_dir = os.path.dirname(
-            os.path.dirname(os.path.abspath(__file__)))
+            # Process the data into a DataFrame
+            df = merge_previous(process_data(data), previous)
 
-        # Change the working directory to the project's root directory
-        os.chdir(project_dir)
+            # Save the data to a CSV file
+            # Get the absolute path of the project's root directory
+            project_dir = os.path.dirname(
+                os.path.dirname(os.path.abspath(__file__)))
 
-        # Construct the paths to your CSV files relative to the project's root
-        # directory
-        csv_path = os.path.join(project_dir, 'data', 'invesco.csv')
+            # Change the working directory to the project's root directory
+            os.chdir(project_dir)
 
-        # Save to CSV file
-        print('Saving Invesco ETF yield data to CSV file...')
-        df.to_csv(csv_path)
-        print('Done!')
+            # Construct the paths to your CSV files relative to the project's
+            # root directory
+            csv_path = os.path.join(project_dir, 'data', 'invesco.csv')
 
-    except (TimeoutException, ElementNotInteractableException):
-        print_exc()
-        df = pd.DataFrame()
+            # Save to CSV file
+            print('Saving Invesco ETF yield data to CSV file...')
+            save_snapshot(df, csv_path)
+            print('Done!')
 
-    finally:
-        # Close the WebDriver
-        driver.quit()
+        except (TimeoutException, ElementNotInteractableException):
+            print_exc()
+            df = pd.DataFrame()
 
     return df
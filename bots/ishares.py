@@ -4,35 +4,54 @@ import shutil
 import requests
 import pandas as pd
 import xml.etree.ElementTree as ET
-from tqdm import tqdm
-from bs4 import BeautifulSoup
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from utils.drivers import webdriver_path
+from utils.drivers import leased_driver
+from utils.waits import polite_pause, wait_for_download
+from utils.http_client import fetch, fetch_all
+from utils.network import captured_download_urls, download_file, get_endpoint, save_endpoint
+from utils.storage import save_snapshot
+from utils.parsing import parse_html
 
 base_url = 'https://www.ishares.com'
 filepath = './data/downloads/ishares.xml'
-
-
-def get_soup(url):
+spreadsheet_ns = '{urn:schemas-microsoft-com:office:spreadsheet}'
+
+# Columns of the downloaded product list kept by xml_to_df
+xml_columns = [
+    'Ticker',
+    'Name',
+    'Net Expense Ratio (%)',
+    'Net Assets (USD)',
+    'Asset Class',
+    'Sub Asset Class',
+    'Region',
+    'Market',
+    'Location',
+    'Investment Style',
+    'Duration (yrs)',
+    'Avg. Yield (%)',
+    'Avg. Yield as of Date'
+]
+
+
+def get_soup(url, names=None):
     """
     :description: Get the BeautifulSoup object from the url
 
     :param url: The url of the target page
     :type url: str
+    :param names: The tag names of the elements to parse, e.g. ['table'], defaults to the whole page
+    :type names: list, optional
     :return: The BeautifulSoup object
     :rtype: bs4.BeautifulSoup
     """
-    response = requests.get(url)
-    if response.status_code != 200:
-        print(f'Failed to retrieve page: {url}')
+    html = fetch(url)
+    if html is None:
         return None
-    return BeautifulSoup(response.content, 'html.parser')
+    return parse_html(html, names=names)
 
 
 def get_etf_list():
@@ -45,7 +64,27 @@ def get_etf_list():
     etf_list_url = base_url + '/us/products/etf-investments#/?productView=etf&fac=43549%7C43563%7C43566%7C43567' \
                               '%7C43573%7C43588%7C43590%7C43775%7C60556&pageNumber=1&sortColumn=totalNetAssets' \
                               '&sortDirection=desc&dataView=keyFacts'
-    return get_soup(etf_list_url)
+    return get_soup(etf_list_url, names=['table'])
+
+
+def parse_yield_data(html):
+    """
+    :description: Parse the yield data from the html of a fund page
+
+    :param html: The html of the fund page
+    :type html: str
+    :return: The yield to worst and its as of date
+    :rtype: tuple
+    :raises ValueError: If the page has no yield to worst
+    """
+    soup = parse_html(html, classes=['col-yieldToWorst'])
+    yield_div = soup.find('div', attrs={'class': 'col-yieldToWorst'})
+    if yield_div:
+        yield_data = yield_div.find('span', class_='data')
+        as_of_date = yield_div.find('span', class_='as-of-date')
+        if yield_data and as_of_date:
+            return yield_data.text.strip(), as_of_date.text.strip()
+    raise ValueError('no yield to worst on the page')
 
 
 def get_yield_data(url):
@@ -54,33 +93,34 @@ def get_yield_data(url):
 
     :param url: The url of the target page
     :type url: str
-    :return: The yield data
+    :return: The yield to worst and its as of date, or None if the page could not be fetched or has no yield
     :rtype: tuple
     """
-    soup = get_soup(url)
-    if soup:
-        yield_div = soup.find('div', attrs={'class': 'col-yieldToWorst'})
-        if yield_div:
-            yield_data = yield_div.find('span', class_='data')
-            as_of_date = yield_div.find('span', class_='as-of-date')
-            if yield_data:
-                return yield_data.text.strip(), as_of_date.text.strip()
-    return 'N/A'
-
-
-def ishares_query():
+    html = fetch(url)
+    if html is None:
+        return None
+    try:
+        return parse_yield_data(html)
+    except ValueError:
+        return None
+
+
+def ishares_query(max_concurrency=8):
     """
-    :description: Get the iShares ETF yield data
+    :description: Get the iShares ETF yield data. The fund pages are fetched concurrently and parsed in worker
+        threads as they arrive. The funds whose page failed are listed in df.attrs['failures'].
 
+    :param max_concurrency: Maximum number of fund pages requested at the same time, defaults to 8
+    :type max_concurrency: int, optional
     :return: The iShares ETF yield data
     :rtype: pd.DataFrame
     """
     soup = get_etf_list()
     if soup is None:
         return
-    data = []
+    funds = []
     table = soup.find('table')
-    for row in tqdm(table.find_all('tr')):
+    for row in table.find_all('tr'):
         link_elements = row.find_all('a')
         if link_elements:
             ticker_link = link_elements[0]
@@ -88,103 +128,161 @@ def ishares_query():
             link = base_url + ticker_link['href']
             etf_name_link = link_elements[1]
             etf_name = etf_name_link.text.strip()
-            yield_data, as_of_date = get_yield_data(link)
-            data.append([ticker, etf_name, link, yield_data, as_of_date])
-            time.sleep(1)
-    df = pd.DataFrame(data, columns=['Ticker', 'ETF Name', 'Link', 'Yield to Worst', 'As of Date'])
+            funds.append((ticker, etf_name, link))
+
+    results = fetch_all([link for _, _, link in funds], progress=True, parse=parse_yield_data,
+                        max_concurrency=max_concurrency)
+
+    data, failures = [], {}
+    for (ticker, etf_name, link), result in zip(funds, results):
+        if result is None:
+            failures[ticker] = f'request failed: {link}'
+        elif isinstance(result, Exception):
+            failures[ticker] = f'{result}: {link}'
+        else:
+            yield_data, as_of_date = result
+            data.append([ticker, etf_name, yield_data, as_of_date])
+    if failures:
+        print(f'No yield data for {len(failures)} of {len(funds)} iShares funds: {", ".join(failures)}')
+
+    df = pd.DataFrame(data, columns=['Ticker', 'ETF Name', 'Yield to Worst', 'As of Date'])
     df.set_index('Ticker', inplace=True)
-    df.drop('Link', axis=1, inplace=True)
-    df = df[df['Yield to Worst'] != 'N/A']
     df['As of Date'] = pd.to_datetime(df['As of Date'])
     df['As of Date'] = df['As of Date'].dt.strftime('%m-%d-%Y')
+    df.attrs['failures'] = failures
     return df
 
 
-def download_xls(headless=True):
+def download_xls(headless=True, lean=False, capture_network=False):
     """
     :description: Download the iShares ETF list as a xls file
 
     :param headless: Whether to run the browser in headless mode, defaults to True
     :type headless: bool, optional
+    :param lean: Whether to block images, fonts, stylesheets and trackers to speed up page loads, defaults to False
+    :type lean: bool, optional
+    :param capture_network: Whether to record the URL of the download as the screener export endpoint used by
+        download_direct, see record_export_endpoint, defaults to False
+    :type capture_network: bool, optional
+
+    :return: The path to the downloaded file
+    :rtype: str
+    """
+    # Set default download directory
+    download_dir = os.path.join(os.path.expanduser('~'), 'Downloads')
 
-    :return: None
-    :rtype: None
+    # Lease a Chrome driver, which is returned to the pool or closed on exit
+    with leased_driver(headless, lean, capture_network) as driver:
+        # Allow downloads into the download directory without a prompt
+        driver.execute_cdp_cmd('Page.setDownloadBehavior', {'behavior': 'allow', 'downloadPath': download_dir})
+
+        # Go to the webpage
+        etf_list_url = 'https://www.ishares.com/us/products/etf-investments#/?productView=etf&fac=43549%7C43563%7C435' \
+                       '66%7C43567%7C43573%7C43588%7C43590%7C43775%7C60556&pageNumber=1&sortColumn=totalNetAssets' \
+                       '&sortDirection=desc&dataView=keyFacts'
+        driver.get(etf_list_url)
+
+        # Wait for the cookie notice to appear and click "Required Only" if it does
+        try:
+            cookie_button = WebDriverWait(driver, 10).until(
+                EC.element_to_be_clickable((By.CSS_SELECTOR, '#onetrust-reject-all-handler')))
+            ActionChains(driver).move_to_element(cookie_button).click(cookie_button).perform()
+        except:
+            pass
+
+        # Wait for the DOWNLOAD button to become clickable
+        wait = WebDriverWait(driver, 10)  # wait for up to 10 seconds
+        download_button = wait.until(EC.element_to_be_clickable((
+            By.CSS_SELECTOR, '#c1612780367522 > div > product-screener > screener-main > screener-control-bar > div > '
+                             'screener-download-funds > button')))
+        ActionChains(driver).move_to_element(download_button).click(download_button).perform()
+
+        # Find the "DOWNLOAD FILTERED FUNDS (XLS)" button within the dropdown menu and click it
+        download_xls_button = wait.until(
+            EC.element_to_be_clickable((By.CSS_SELECTOR, '#mat-menu-panel-0 > div > button:nth-child(2)')))
+        started_after = time.time()
+        ActionChains(driver).move_to_element(download_xls_button).click(download_xls_button).perform()
+
+        # Wait for the file to be downloaded before the browser is released
+        xls_path = wait_for_download(download_dir, '.xls', started_after)
+
+        urls = captured_download_urls(driver) if capture_network else []
+
+    if urls and record_export_endpoint(urls) is None:
+        print('None of the captured download URLs serves the iShares product list without the browser')
+    return xls_path
+
+
+def is_spreadsheet(chunk):
     """
-    # Prepare Chrome options. Headless mode means the browser is run in the background
-    webdriver_options = Options()
-    if headless:
-        webdriver_options.add_argument('--headless')
+    :description: Check whether a downloaded file starts like the SpreadsheetML workbook of the screener export
 
-    # Suppress WebDriver Logs
-    webdriver_options.add_argument('--log-level=3')
+    :param chunk: The first bytes of the file
+    :type chunk: bytes
+    :return: Whether the file is a workbook rather than an error page
+    :rtype: bool
+    """
+    return chunk.lstrip(b'\xef\xbb\xbf \r\n\t').startswith(b'<?xml') and b'<Workbook' in chunk
 
-    # Set default download directory and disable download prompt
-    download_dir = os.path.join(os.path.expanduser('~'), 'Downloads')
-    prefs = {
-        'download.default_directory': download_dir,
-        'download.prompt_for_download': False,
-        'download.directory_upgrade': True,
-        'safebrowsing.enabled': True,
-    }
-    webdriver_options.add_experimental_option('prefs', prefs)
-
-    # Set user-agent
-    webdriver_options.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/89.0.4389.82 Safari/537.36")
-
-    # Create a new instance of the Chrome driver
-    # driver = setup_driver()
-    driver = webdriver.Chrome(service=Service(webdriver_path()), options=webdriver_options)
-
-    # Go to the webpage
-    etf_list_url = 'https://www.ishares.com/us/products/etf-investments#/?productView=etf&fac=43549%7C43563%7C435' \
-                   '66%7C43567%7C43573%7C43588%7C43590%7C43775%7C60556&pageNumber=1&sortColumn=totalNetAssets' \
-                   '&sortDirection=desc&dataView=keyFacts'
-    driver.get(etf_list_url)
-
-    # Wait for the cookie notice to appear and click "Required Only" if it does
-    try:
-        cookie_button = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, '#onetrust-reject-all-handler')))
-        ActionChains(driver).move_to_element(cookie_button).click(cookie_button).perform()
-    except:
-        pass
 
-    # Wait for the DOWNLOAD button to become clickable
-    wait = WebDriverWait(driver, 10)  # wait for up to 10 seconds
-    download_button = wait.until(EC.element_to_be_clickable((
-        By.CSS_SELECTOR, '#c1612780367522 > div > product-screener > screener-main > screener-control-bar > div > '
-                         'screener-download-funds > button')))
-    ActionChains(driver).move_to_element(download_button).click(download_button).perform()
+def record_export_endpoint(urls):
+    """
+    :description: Record the first captured download URL that serves the product list to plain HTTP as the screener
+        export endpoint. Each URL is tried the way download_direct requests it, without the browser's cookies, so
+        only an endpoint that download_direct can use is recorded. The verified download is saved to
+        data/downloads/ishares.xml.
+
+    :param urls: The download URLs captured while the browser downloaded the product list, latest last
+    :type urls: list
+    :return: The recorded URL, or None if none of the URLs serves the product list
+    :rtype: str
+    """
+    for url in reversed(urls):
+        try:
+            download_file(url, filepath, validate=is_spreadsheet)
+        except (ValueError, requests.RequestException):
+            continue
+        save_endpoint('ishares', 'screener_export', url)
+        return url
+    return None
 
-    # Find the "DOWNLOAD FILTERED FUNDS (XLS)" button within the dropdown menu and click it
-    download_xls_button = wait.until(
-        EC.element_to_be_clickable((By.CSS_SELECTOR, '#mat-menu-panel-0 > div > button:nth-child(2)')))
-    ActionChains(driver).move_to_element(download_xls_button).click(download_xls_button).perform()
 
-    # We need to wait for the file to be downloaded. This delay depends on your internet speed.
-    time.sleep(5)
+def download_direct():
+    """
+    :description: Download the iShares ETF list from the screener export endpoint without a browser, straight to
+        data/downloads/ishares.xml. The endpoint is recorded by download_xls with capture_network=True, once a plain
+        HTTP download from it has been verified.
 
-    # Close the browser
-    driver.quit()
+    :return: The path to the downloaded file
+    :rtype: str
+    :raises KeyError: If the endpoint has not been recorded yet
+    """
+    url = get_endpoint('ishares', 'screener_export')
+    if url is None:
+        raise KeyError('No screener export endpoint recorded for ishares')
+    polite_pause('ishares')
+    return download_file(url, filepath, validate=is_spreadsheet)
 
 
-def move_xls():
+def move_xls(xls_path=None):
     """
     :description: Move the downloaded xls file to the data/downloads directory and rename it to "ishares.xml"
 
+    :param xls_path: The path to the downloaded file, defaults to the latest xls file in the Downloads folder
+    :type xls_path: str, optional
     :return: None
     :rtype: None
     """
-    # Get list of all files from the download directory
-    files = os.listdir(os.path.expanduser('~/Downloads'))
-    # Find the latest downloaded xls file
-    xls_file = max([f for f in files if f.endswith('.xls')],
-                   key=lambda x: os.path.getctime(os.path.join(os.path.expanduser('~/Downloads'), x)))
+    if xls_path is None:
+        # Get list of all files from the download directory
+        files = os.listdir(os.path.expanduser('~/Downloads'))
+        # Find the latest downloaded xls file
+        xls_file = max([f for f in files if f.endswith('.xls')],
+                       key=lambda x: os.path.getctime(os.path.join(os.path.expanduser('~/Downloads'), x)))
+        xls_path = os.path.join(os.path.expanduser('~/Downloads'), xls_file)
 
     # Define old and new location
-    old_file_location = os.path.join(os.path.expanduser('~/Downloads'), xls_file)
+    old_file_location = xls_path
     new_dir = './data/downloads'
     new_file_location = os.path.join(new_dir, 'ishares.xml')  # changed the extension to .xml
 
@@ -219,6 +317,23 @@ def load_xls():
     return data
 
 
+def iter_xml_rows(path):
+    """
+    :description: Stream the rows of the first worksheet table of a SpreadsheetML file, clearing each row once read
+
+    :param path: The path to the file
+    :type path: str
+    :return: The texts of the data cells of each row
+    :rtype: generator
+    """
+    for _, elem in ET.iterparse(path, events=('end',)):
+        if elem.tag == spreadsheet_ns + 'Row':
+            yield [data.text for data in elem.iter(spreadsheet_ns + 'Data')]
+            elem.clear()
+        elif elem.tag == spreadsheet_ns + 'Table':
+            return
+
+
 def xml_to_df():
     """
     :description: Convert the xls file to a pandas DataFrame
@@ -226,59 +341,23 @@ def xml_to_df():
     :return: The pandas DataFrame
     :rtype: pd.DataFrame
     """
-    # Parse the XML file
-    tree = ET.parse(filepath)
-    root = tree.getroot()
+    rows = iter_xml_rows(filepath)
 
+    # The main columns are in the first row, the sub-columns of the grouped main columns in the second
+    main_columns = [column for column in next(rows) if column is not None][:16]
+    sub_columns = [column for column in next(rows) if column is not None]
+    columns = main_columns + sub_columns
+    positions = [columns.index(column) for column in xml_columns]
+
+    # Keep the needed columns of the rows before the first empty row, which ends the first table
     data = []
+    for row in rows:
+        if all(value is None for value in row):
+            break
+        data.append([row[position] if position < len(row) else None for position in positions])
+    rows.close()
 
-    # Loop over each row in the Worksheet
-    for row in root.iter('{urn:schemas-microsoft-com:office:spreadsheet}Row'):
-        rowData = []
-        for cell in row.iter('{urn:schemas-microsoft-com:office:spreadsheet}Cell'):
-            # Get the cell data
-            for dataElem in cell.iter('{urn:schemas-microsoft-com:office:spreadsheet}Data'):
-                rowData.append(dataElem.text)
-        data.append(rowData)
-
-    # Convert to pandas DataFrame and return
-    df = pd.DataFrame(data)
-
-    # Gather main columns
-    main_columns = df.loc[0][pd.notnull(df.loc[0])][:16]
-
-    # Gather sub-columns
-    sub_columns = df.loc[1]
-    sub_columns = sub_columns[pd.notnull(sub_columns)]
-
-    # Assign column headers
-    df.columns = list(pd.concat([main_columns, sub_columns]))
-
-    # Remove first two unneeded rows
-    df = df.loc[2:]
-
-    # Find the first row index where all cells are None
-    index_of_none_row = df[df.isnull().all(axis=1)].index[0]
-
-    # Retain only the rows before the first None row
-    df = df.loc[:index_of_none_row - 1]
-
-    # Filter df columns
-    df = df[[
-        'Ticker',
-        'Name',
-        'Net Expense Ratio (%)',
-        'Net Assets (USD)',
-        'Asset Class',
-        'Sub Asset Class',
-        'Region',
-        'Market',
-        'Location',
-        'Investment Style',
-        'Duration (yrs)',
-        'Avg. Yield (%)',
-        'Avg. Yield as of Date'
-    ]]
+    df = pd.DataFrame(data, columns=xml_columns)
 
     # Process the data
     df.set_index('Ticker', inplace=True)
@@ -292,23 +371,34 @@ def xml_to_df():
     return df
 
 
-def ishares_bot(method='xls', return_df=False, headless=True):
+def ishares_bot(method='direct', return_df=False, headless=True, lean=False):
     """
     Downloads, moves, and loads iShares ETF data into a pandas DataFrame.
 
-    :param method: 'xls' or 'query'
+    :param method: 'direct' to download the xls file without a browser, falling back to 'xls' if the screener export
+        endpoint is not known yet or the download fails, 'xls' or 'query'
     :type method: str
     :param return_df: True or False
     :type return_df: bool
     :param headless: Whether to run the browser in headless mode, defaults to True
     :type headless: bool, optional
+    :param lean: Whether to block images, fonts, stylesheets and trackers to speed up page loads, defaults to False
+    :type lean: bool, optional
     :return: pandas DataFrame
     :rtype: pd.DataFrame
     """
-    if method == 'xls':
+    if method == 'direct':
+        print('Downloading iShares ETF yield data...')
+        try:
+            download_direct()
+        except (KeyError, ValueError, requests.RequestException) as e:
+            print(f'Direct download failed ({e}), downloading with the browser...')
+            move_xls(download_xls(headless, lean, capture_network=True))
+        df = xml_to_df()
+        print('Saving iShares ETF data...')
+    elif method == 'xls':
         print('Downloading iShares ETF yield data...')
-        download_xls(headless)
-        move_xls()
+        move_xls(download_xls(headless, lean))
         df = xml_to_df()
         print('Saving iShares ETF data...')
     elif method == 'query':
@@ -316,7 +406,7 @@ def ishares_bot(method='xls', return_df=False, headless=True):
         df = ishares_query()
         print('Saving iShares ETF yield data...')
     else:
-        raise ValueError('method must be "xls" or "query"')
+        raise ValueError('method must be "direct", "xls" or "query"')
 
     # Get the absolute path of the project's root directory
     project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -328,7 +418,7 @@ def ishares_bot(method='xls', return_df=False, headless=True):
     csv_path = os.path.join(project_dir, 'data', 'ishares.csv')
 
     # Save DataFrame to csv
-    df.to_csv(csv_path)
+    save_snapshot(df, csv_path)
 
     print('Done!')
     if return_df:
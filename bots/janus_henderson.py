@@ -1,15 +1,13 @@
 import os
-import requests
 import pandas as pd
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
-from utils.drivers import webdriver_path
+from utils.drivers import leased_driver
+from utils.http_client import fetch, fetch_all
+from utils.storage import save_snapshot
+from utils.parsing import parse_html, table_pairs
 from datetime import datetime
 
 
@@ -22,12 +20,23 @@ def get_yield_to_worst(url):
     :return: The yield to worst and as of date
     :rtype: tuple
     """
-    response = requests.get(url)
-    if response.status_code != 200:
-        print(f'Failed to retrieve page: {url}')
-        return None
+    html = fetch(url)
+    if html is None:
+        return None, None
+    return parse_yield_to_worst(html)
 
-    soup = BeautifulSoup(response.content, 'html.parser')
+
+def parse_yield_to_worst(html):
+    """
+    :description: Parse the yield to worst and as of date from the ETF page
+
+    :param html: The html of the ETF page
+    :type html: str
+    :return: The yield to worst and as of date
+    :rtype: tuple
+    """
+    # Only build the characteristics table and its as of date
+    soup = parse_html(html, ids=['portfolio_characteristics_table'], classes=['as-of-text-characteristics'])
     table = soup.find('table', attrs={'id': 'portfolio_characteristics_table'})
 
     # Find the as_of_date
@@ -43,10 +52,9 @@ def get_yield_to_worst(url):
         as_of_date = None
 
     yield_to_worst = None
-    for row in table.find_all('tr'):
-        first_col = row.find('td')
-        if first_col and 'Yield to Worst' in first_col.text:
-            yield_to_worst = first_col.find_next_sibling('td').text
+    for field_name, value in table_pairs(table).items():
+        if 'Yield to Worst' in field_name:
+            yield_to_worst = value
             break
 
     return yield_to_worst, as_of_date
@@ -99,7 +107,7 @@ def get_etf_data(driver):
     return data
 
 
-def janus_henderson_bot(return_df=False, headless=True):
+def janus_henderson_bot(return_df=False, headless=True, lean=False):
     """
     :description: Run the Janus Henderson ETF yield bot
 
@@ -107,24 +115,22 @@ def janus_henderson_bot(return_df=False, headless=True):
     :type return_df: bool
     :param headless: Whether to run the bot in headless mode
     :type headless: bool
+    :param lean: Whether to block images, fonts, stylesheets and trackers to speed up page loads
+    :type lean: bool
     :return: The ETF data
     :rtype: pd.DataFrame
     """
     print('Downloading Janus Henderson ETF yield data...')
-    options = Options()
-    if headless:
-        options.add_argument('--headless')
-
-    # Suppress WebDriver Logs
-    options.add_argument('--log-level=3')
-
-    with webdriver.Chrome(service=Service(webdriver_path()), options=options) as driver:
+    with leased_driver(headless, lean) as driver:
         driver.get('https://www.janushenderson.com/en-us/advisor/product/?vehicle=ETF')
         data = get_etf_data(driver)
 
     df = pd.DataFrame(data, columns=['Ticker', 'Name', 'Link'])
     df.set_index('Ticker', inplace=True)
-    df['Yield to Worst'], df['As of Date'] = zip(*df['Link'].map(get_yield_to_worst))
+    pages = fetch_all(df['Link'], progress=True)
+    df['Yield to Worst'], df['As of Date'] = zip(*[
+        parse_yield_to_worst(html) if html is not None else (None, None) for html in pages
+    ])
     df['Yield to Worst'] = df['Yield to Worst'].str.rstrip('%').astype('float') / 100.0
     df.drop('Link', axis=1, inplace=True)
 
@@ -138,7 +144,7 @@ def janus_henderson_bot(return_df=False, headless=True):
     csv_path = os.path.join(project_dir, 'data', 'janus_henderson.csv')
 
     print('Saving Janus Henderson ETF yield data to CSV file...')
-    df.to_csv(csv_path)
+    save_snapshot(df, csv_path)
     print('Done!')
     if return_df:
         return df
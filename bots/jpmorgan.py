@@ -1,13 +1,19 @@
 import os
-import time
 import pandas as pd
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
-from utils.drivers import setup_driver
+from utils.drivers import leased_driver
+from utils.incremental import load_previous
+from utils.network import captured_json_responses, discover_fund_endpoints, query_fund_endpoint
+from utils.waits import wait_for_network_idle
+from utils.storage import save_snapshot
 from tqdm import tqdm
 
+# Columns read from the fund detail endpoint, located in its JSON by utils.network.discover_fields
+endpoint_columns = ['Name', 'Yield to Maturity', 'As of Date']
+
 
 def navigate_to_page(driver, url):
     """
@@ -46,25 +52,25 @@ def select_asset_classes(driver):
                                                                 '#assetClassDropdown > div.dropdown-list > div > '
                                                                 'div:nth-child(4) > div:nth-child(1) > a > '
                                                                 'span'))).click()
-    time.sleep(1)
+    wait_for_network_idle(driver, idle_time=0.3, timeout=5)
     WebDriverWait(driver, 20).until(EC.element_to_be_clickable((By.CSS_SELECTOR,
                                                                 '#assetClassDropdown > div.dropdown-list > div > '
                                                                 'div:nth-child(5) > div:nth-child(1) > a > '
                                                                 'span'))).click()
-    time.sleep(1)
+    wait_for_network_idle(driver, idle_time=0.3, timeout=5)
     WebDriverWait(driver, 20).until(EC.element_to_be_clickable((By.CSS_SELECTOR,
                                                                 '#assetClassDropdown > div.dropdown-list > div > '
                                                                 'div:nth-child(6) > div:nth-child(1) > a > '
                                                                 'span'))).click()
-    time.sleep(1)
+    wait_for_network_idle(driver, idle_time=0.3, timeout=5)
     WebDriverWait(driver, 20).until(EC.element_to_be_clickable((By.CSS_SELECTOR,
                                                                 '#assetClassDropdown > div.dropdown-list > div > '
                                                                 'div:nth-child(7) > div:nth-child(1) > a > '
                                                                 'span'))).click()
-    time.sleep(1)
+    wait_for_network_idle(driver, idle_time=0.3, timeout=5)
     WebDriverWait(driver, 20).until(
         EC.element_to_be_clickable((By.CSS_SELECTOR, '#assetClassDropdown > div.dropdown-display.clicked'))).click()
-    time.sleep(1)
+    wait_for_network_idle(driver, idle_time=0.3, timeout=5)
 
 
 def get_links(driver):
@@ -93,7 +99,7 @@ def get_links(driver):
 
         # Scroll down by chunk
         driver.execute_script("window.scrollBy(0, 800);")  # Adjust this value according to your needs
-        time.sleep(2)  # Adjust this value according to your internet speed or webpage's response time
+        wait_for_network_idle(driver, timeout=5)  # wait for the next rows to be loaded
 
         # Calculate new scroll height and compare with last scroll height
         new_height = driver.execute_script("return document.body.scrollHeight")
@@ -138,7 +144,7 @@ def extract_etf_info(driver, url):
     return {"Ticker": ticker, "Name": name, "Yield to Maturity": yield_to_maturity, "As of Date": as_of_date}
 
 
-def get_etf_data(driver, links):
+def get_etf_data(driver, links, responses=None):
     """
     :description: Get the ETF data
 
@@ -146,6 +152,9 @@ def get_etf_data(driver, links):
     :type driver: selenium.webdriver.chrome.webdriver.WebDriver
     :param links: The links to the ETF pages
     :type links: list
+    :param responses: Collects the JSON responses of each ETF page right after it is read, while the browser still
+        holds them
+    :type responses: list, optional
     :return: The ETF data
     :rtype: pd.DataFrame
     """
@@ -153,6 +162,8 @@ def get_etf_data(driver, links):
     data = []
     for link in tqdm(links):
         etf_data = extract_etf_info(driver, link)
+        if responses is not None:
+            responses.extend(captured_json_responses(driver))
 
         # Only add the etf_data to the list if it's not None
         if etf_data is not None:
@@ -174,7 +185,26 @@ def get_etf_data(driver, links):
     return df
 
 
-def jpmorgan_bot(return_df=False, headless=True):
+def query_etf_data(tickers, max_concurrency=8):
+    """
+    :description: Get the ETF data from the fund detail endpoint with plain HTTP, without a browser. The endpoint and
+        the fields of its JSON are recorded by jpmorgan_bot with capture_network=True.
+
+    :param tickers: The tickers of the ETFs
+    :type tickers: list
+    :param max_concurrency: Maximum number of requests in flight
+    :type max_concurrency: int, optional
+    :return: The ETF data, with the yield as a fraction and the as of date as MM-DD-YYYY
+    :rtype: pd.DataFrame
+    :raises KeyError: If the endpoint has not been recorded yet, or a response no longer has the recorded fields
+    :raises ValueError: If a request failed or a value no longer converts
+    """
+    df = pd.DataFrame.from_dict(query_fund_endpoint('jpmorgan', tickers, max_concurrency), orient='index')
+    df.index.name = 'Ticker'
+    return df
+
+
+def jpmorgan_bot(return_df=False, headless=True, lean=False, capture_network=False, method='browser'):
     """
     :description: Run the JPMorgan ETF yield bot
 
@@ -182,16 +212,42 @@ def jpmorgan_bot(return_df=False, headless=True):
     :type return_df: bool
     :param headless: Whether to run the bot in headless mode
     :type headless: bool
+    :param lean: Whether to block images, fonts, stylesheets and trackers to speed up page loads
+    :type lean: bool
+    :param capture_network: Whether to record the issuer's JSON endpoints from the network traffic
+    :type capture_network: bool
+    :param method: 'browser' to scrape the fund list and the fund pages, or 'endpoint' to read the funds of the
+        previous run from the recorded fund detail endpoint with plain HTTP, falling back to 'browser' with
+        capture_network=True if the endpoint is not recorded yet or reading it fails. 'endpoint' neither finds new
+        funds nor drops delisted ones, so run 'browser' regularly to refresh the fund list.
+    :type method: str
     :return: The ETF data
     :rtype: pd.DataFrame
     """
     print('Downloading JPMorgan ETF yield data...')
-    url = 'https://am.jpmorgan.com/us/en/asset-management/adv/products/fund-explorer/etf'
-    driver = setup_driver(headless)
-    navigate_to_page(driver, url)
-    select_asset_classes(driver)
-    links = get_links(driver)
-    df = get_etf_data(driver, links)
+    if method == 'endpoint':
+        try:
+            tickers = list(load_previous('jpmorgan').index)
+            if not tickers:
+                raise KeyError('No previous run to take the JPMorgan tickers from')
+            df = query_etf_data(tickers)
+        except (KeyError, ValueError) as e:
+            print(f'Reading the fund detail endpoint failed ({e}), scraping the fund pages...')
+            method, capture_network = 'browser', True
+    elif method != 'browser':
+        raise ValueError('method must be "endpoint" or "browser"')
+
+    if method == 'browser':
+        url = 'https://am.jpmorgan.com/us/en/asset-management/adv/products/fund-explorer/etf'
+        with leased_driver(headless, lean, capture_network) as driver:
+            navigate_to_page(driver, url)
+            select_asset_classes(driver)
+            links = get_links(driver)
+            list_responses = captured_json_responses(driver) if capture_network else []
+            detail_responses = [] if capture_network else None
+            df = get_etf_data(driver, links, detail_responses)
+            if capture_network:
+                discover_fund_endpoints('jpmorgan', list_responses, detail_responses, df, endpoint_columns)
 
     # Get the absolute path of the project's root directory
     project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -203,7 +259,7 @@ def jpmorgan_bot(return_df=False, headless=True):
     csv_path = os.path.join(project_dir, 'data', 'jpmorgan.csv')
 
     print('Saving JPMorgan ETF yield data to CSV file...')
-    df.to_csv(csv_path)
+    save_snapshot(df, csv_path)
     print('Done!')
     if return_df:
         return df
@@ -1,5 +1,4 @@
 import os
-import time
 import pandas as pd
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -7,9 +6,15 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from selenium.common.exceptions import NoSuchElementException
 from selenium.common.exceptions import ElementNotInteractableException
-from utils.drivers import setup_driver
+from utils.drivers import leased_driver
+from utils.waits import wait_for_network_idle
+from utils.storage import save_snapshot
+from utils.tabs import harvest_tabs
+from functools import partial
 from tqdm import tqdm
 
+name_selector = '#etf-header > div.container > div.etf-title-row > div.etf-name'
+
 
 def navigate_to_page(driver, url):
     """
@@ -30,7 +35,7 @@ def navigate_to_page(driver, url):
             WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.CSS_SELECTOR, css_selector)))
             button = driver.find_element(By.CSS_SELECTOR, css_selector)
             button.click()
-            time.sleep(2)  # delay to allow the page to react
+            wait_for_network_idle(driver, idle_time=0.3, timeout=5)  # wait for the page to react
         except (NoSuchElementException, TimeoutException):
             pass
 
@@ -58,7 +63,7 @@ def navigate_to_page(driver, url):
     for selector in sector_selectors:
         click_button(selector)
 
-    time.sleep(2)  # delay before proceeding to next step
+    wait_for_network_idle(driver, timeout=5)  # wait for the filtered list before proceeding to next step
 
 
 def get_links(driver):
@@ -88,7 +93,7 @@ def get_links(driver):
 
         # Scroll down by chunk
         driver.execute_script("window.scrollBy(0, 800);")  # Adjust this value according to your needs
-        time.sleep(2)  # Adjust this value according to your internet speed or webpage's response time
+        wait_for_network_idle(driver, timeout=5)  # wait for the next rows to be loaded
 
         # Calculate new scroll height and compare with last scroll height
         new_height = get_scroll_height()
@@ -99,7 +104,7 @@ def get_links(driver):
     return list(links)  # Return the links as a list
 
 
-def extract_etf_info(driver, url):
+def extract_etf_info(driver, url, navigate=True):
     """
     :description: Extract the ETF info from the page
 
@@ -107,11 +112,14 @@ def extract_etf_info(driver, url):
     :type driver: selenium.webdriver.chrome.webdriver.WebDriver
     :param url: The url of the target page
     :type url: str
+    :param navigate: Whether to load the page first, False if it is already loaded
+    :type navigate: bool
     :return: The ETF info
     :rtype: dict
     """
     # Navigate to the url
-    driver.get(url)
+    if navigate:
+        driver.get(url)
 
     # Check for the " pop-up
     try:
@@ -165,7 +173,7 @@ def extract_etf_info(driver, url):
     # Scroll down about 5% of the webpage
     scroll_height = driver.execute_script("return document.body.scrollHeight")
     driver.execute_script(f"window.scrollTo(0, {scroll_height * 0.05});")
-    time.sleep(2)  # delay to allow the page to load
+    wait_for_network_idle(driver, timeout=5)  # wait for the lazy-loaded sections
 
     try:
         # First try with the usual CSS selector
@@ -192,8 +200,7 @@ def extract_etf_info(driver, url):
         return None
 
     # Extract the info
-    name = WebDriverWait(driver, 5).until(EC.presence_of_element_located(
-        (By.CSS_SELECTOR, '#etf-header > div.container > div.etf-title-row > div.etf-name'))).text
+    name = WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.CSS_SELECTOR, name_selector))).text
 
     try:
         # First try with the usual CSS selector
@@ -233,7 +240,7 @@ def extract_etf_info(driver, url):
     return {"Ticker": ticker, "Name": name, "Yield to Maturity": yield_to_maturity, "As of Date": as_of_date}
 
 
-def get_etf_data(driver, links):
+def get_etf_data(driver, links, tabs=1):
     """
     :description: Get the ETF data
 
@@ -241,17 +248,23 @@ def get_etf_data(driver, links):
     :type driver: selenium.webdriver.chrome.webdriver.WebDriver
     :param links: The links to the ETF pages
     :type links: list
+    :param tabs: Number of tabs loading ETF pages at the same time, see utils.tabs.harvest_tabs
+    :type tabs: int
     :return: The ETF data
     :rtype: pd.DataFrame
     """
     # Get data for all ETFs
     data = []
-    for link in tqdm(links):
-        etf_data = extract_etf_info(driver, link)
+    if tabs > 1:
+        results = harvest_tabs(driver, links, name_selector, partial(extract_etf_info, navigate=False), tabs=tabs)
+        data = [etf_data for etf_data in results if etf_data is not None]
+    else:
+        for link in tqdm(links):
+            etf_data = extract_etf_info(driver, link)
 
-        # Only add the etf_data to the list if it's not None
-        if etf_data is not None:
-            data.append(etf_data)
+            # Only add the etf_data to the list if it's not None
+            if etf_data is not None:
+                data.append(etf_data)
 
     # Convert data list to a pandas DataFrame
     df = pd.DataFrame(data)
@@ -270,7 +283,7 @@ def get_etf_data(driver, links):
     return df
 
 
-def pimco_bot(return_df=False, headless=True):
+def pimco_bot(return_df=False, headless=True, lean=False, tabs=1):
     """
     :description: Run the PIMCO ETF yield bot
 
@@ -278,15 +291,19 @@ def pimco_bot(return_df=False, headless=True):
     :type return_df: bool
     :param headless: Whether to run the bot in headless mode
     :type headless: bool
+    :param lean: Whether to block images, fonts, stylesheets and trackers to speed up page loads
+    :type lean: bool
+    :param tabs: Number of tabs loading ETF pages at the same time in the one browser, default is 1
+    :type tabs: int
     :return: The ETF data
     :rtype: pd.DataFrame
     """
     print('Downloading PIMCO ETF yield data...')
     url = 'https://www.pimco.com/en-us/investments/etf'
-    driver = setup_driver(headless)
-    navigate_to_page(driver, url)
-    links = get_links(driver)
-    df = get_etf_data(driver, links)
+    with leased_driver(headless, lean) as driver:
+        navigate_to_page(driver, url)
+        links = get_links(driver)
+        df = get_etf_data(driver, links, tabs)
 
     # Get the absolute path of the project's root directory
     project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -298,7 +315,7 @@ def pimco_bot(return_df=False, headless=True):
     csv_path = os.path.join(project_dir, 'data', 'pimco.csv')
 
     print('Saving PIMCO ETF yield data to CSV file...')
-    df.to_csv(csv_path)
+    save_snapshot(df, csv_path)
     print('Done!')
     if return_df:
         return df
@@ -1,19 +1,22 @@
 import os
-import time
 import pandas as pd
 from tqdm import tqdm
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import NoSuchElementException, TimeoutException, ElementNotInteractableException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from utils.drivers import setup_driver
+from utils.drivers import leased_driver
+from utils.waits import polite_pause, wait_for_element, wait_for_network_idle
+from utils.extraction import extract_fields
+from utils.incremental import plan_refresh, merge_previous
+from utils.storage import save_snapshot
 
 
 def scroll_down(driver, percentage=0.05):
     # Scroll down about 5% of the webpage
     scroll_height = driver.execute_script("return document.body.scrollHeight")
     driver.execute_script(f"window.scrollTo(0, {scroll_height * percentage});")
-    time.sleep(1)  # delay to allow the page to load
+    wait_for_network_idle(driver, timeout=5)  # wait for the page to load
 
 
 def navigate_to_page(driver, url):
@@ -74,21 +77,28 @@ def get_links(driver):
     """
     scroll_down(driver)
 
-    links = []
-    i = 1
-    while True:
-        try:
-            link_element = driver.find_element(
-                By.CSS_SELECTOR,
-                f'#page_product_finder > table.views-table.views-table--responsive.views-view-table.cols-7.sticky'
-                f'-enabled.table--page_product_finder.table-funds.d-none.d-lg-table.sticky-table > tbody > '
-                f'tr:nth-child({i}) > td.td--fund.views-field.row-data > a'
-            )
-            links.append(link_element.get_attribute('href'))
-            i += 1
-        except NoSuchElementException:
-            break
-    return links
+    fields = extract_fields(driver, {
+        'links': (
+            '#page_product_finder > table.views-table.views-table--responsive.views-view-table.cols-7.sticky'
+            '-enabled.table--page_product_finder.table-funds.d-none.d-lg-table.sticky-table > tbody > '
+            'tr > td.td--fund.views-field.row-data > a',
+            'href',
+            'all'
+        )
+    })
+    return fields['links']
+
+
+def ticker_from_link(link):
+    """
+    :description: Get the ticker from the link to the ETF page
+
+    :param link: The link to the ETF page
+    :type link: str
+    :return: The ticker
+    :rtype: str
+    """
+    return link.split('/')[-1].upper()
 
 
 def get_yield_data(driver, links):
@@ -103,37 +113,31 @@ def get_yield_data(driver, links):
     :rtype: dict
     """
     wait_time = 5
+    yield_selector = '#sfm-table--yields > table > tbody > tr:nth-child(3) > td:nth-child(3)'
     data = {}
     for link in tqdm(links):
         try:
+            polite_pause('schwab')
             driver.get(link)
-            time.sleep(2)
-
-            ticker = link.split('/')[-1].upper()
-
-            name_element = driver.find_element(
-                By.XPATH,
-                "//*[starts-with(@id, 'product_intro--')]"
-            )
-            name = name_element.text.split('\n')[0]
 
-            yield_element = (
-                By.CSS_SELECTOR,
-                '#sfm-table--yields > table > tbody > tr:nth-child(3) > td:nth-child(3)'
-            )
-            yield_element = WebDriverWait(driver, wait_time).until(EC.presence_of_element_located(yield_element))
-            yield_to_maturity = yield_element.get_attribute("innerText")
+            ticker = ticker_from_link(link)
 
-            as_of_element = driver.find_element(
-                By.CSS_SELECTOR,
-                '#sfm-table--yields > table > tbody > tr:nth-child(3) > th > div'
-            )
-            as_of = as_of_element.get_attribute("innerText")
+            # Wait for the intro and the yields table, then read all fields in one round trip
+            wait_for_element(driver, (By.XPATH, "//*[starts-with(@id, 'product_intro--')]"), wait_time)
+            wait_for_element(driver, (By.CSS_SELECTOR, yield_selector), wait_time)
+            fields = extract_fields(driver, {
+                'name': '[id^="product_intro--"]',
+                'yield_to_maturity': (yield_selector, 'innerText'),
+                'as_of': ('#sfm-table--yields > table > tbody > tr:nth-child(3) > th > div', 'innerText'),
+            })
+            if fields['as_of'] is None:
+                print(f"As of date not found for {link}. Skipping to next link.")
+                continue
 
             data[ticker] = {
-                'Name': name,
-                'Yield to Maturity': yield_to_maturity,
-                'As of': as_of.split(' ')[-1]
+                'Name': fields['name'].split('\n')[0],
+                'Yield to Maturity': fields['yield_to_maturity'],
+                'As of': fields['as_of'].split(' ')[-1]
             }
         except TimeoutException:
             print(f"TimeoutException encountered for {link}. Skipping to next link.")
@@ -142,7 +146,7 @@ def get_yield_data(driver, links):
     return data
 
 
-def create_and_save_dataframe(data, file_path):
+def create_and_save_dataframe(data, file_path, previous=None):
     """
     :description: Create a dataframe from the data and save it to a CSV file
 
@@ -150,19 +154,23 @@ def create_and_save_dataframe(data, file_path):
     :type data: dict
     :param file_path: The path to the CSV file
     :type file_path: str
+    :param previous: Rows of the previous run to keep for the funds that were not fetched again
+    :type previous: pd.DataFrame
     :return: The dataframe
     :rtype: pd.DataFrame
     """
     df = pd.DataFrame.from_dict(data, orient='index')
-    df['Yield to Maturity'] = df['Yield to Maturity'].str.rstrip('%').astype('float') / 100.0
-    df['As of'] = pd.to_datetime(df['As of'])
-    df['As of'] = df['As of'].dt.strftime('%m-%d-%Y')
+    if not df.empty:
+        df['Yield to Maturity'] = df['Yield to Maturity'].str.rstrip('%').astype('float') / 100.0
+        df['As of'] = pd.to_datetime(df['As of'])
+        df['As of'] = df['As of'].dt.strftime('%m-%d-%Y')
     df.index.name = 'Ticker'
-    df.to_csv(file_path)
+    df = merge_previous(df, previous)
+    save_snapshot(df, file_path)
     return df
 
 
-def schwab_bot(return_df=False, headless=True):
+def schwab_bot(return_df=False, headless=True, lean=False, incremental=False):
     """
     :description: Download Vanguard ETF yield data and save it to a CSV file
 
@@ -170,17 +178,23 @@ def schwab_bot(return_df=False, headless=True):
     :type return_df: bool
     :param headless: Whether to run the bot in headless mode
     :type headless: bool
+    :param lean: Whether to block images, fonts, stylesheets and trackers to speed up page loads
+    :type lean: bool
+    :param incremental: Whether to only fetch the funds whose data may have changed since the previous run
+    :type incremental: bool
     :return: The dataframe
     :rtype: pd.DataFrame
     """
     print('Downloading Schwab ETF yield data...')
     url = 'https://www.schwabassetmanagement.com/product-finder?combine=&field_product_solution_target_id%5B%5D=291' \
           '&field_asset_class_target_id%5B%5D=271&field_asset_class_target_id%5B%5D=286'
-    driver = setup_driver(headless)
-    navigate_to_page(driver, url)
-    links = get_links(driver)
-    data = get_yield_data(driver, links)
-    driver.quit()
+    with leased_driver(headless, lean) as driver:
+        navigate_to_page(driver, url)
+        links = get_links(driver)
+        previous = None
+        if incremental:
+            links, previous = plan_refresh('schwab', links, ticker_from_link)
+        data = get_yield_data(driver, links)
 
     # Get the absolute path of the project's root directory
     project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -192,7 +206,7 @@ def schwab_bot(return_df=False, headless=True):
     csv_path = os.path.join(project_dir, 'data', 'schwab.csv')
 
     print('Saving Schwab ETF yield data to CSV file...')
-    df = create_and_save_dataframe(data, csv_path)
+    df = create_and_save_dataframe(data, csv_path, previous)
     print('Done!')
     if return_df:
         return df
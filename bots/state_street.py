@@ -1,15 +1,23 @@
 import os
-import time
 import pandas as pd
 from tqdm import tqdm
 from datetime import datetime
-from utils.drivers import setup_driver
+from utils.drivers import leased_driver
+from utils.waits import polite_pause, wait_for_element
+from utils.extraction import extract_fields
+from utils.incremental import plan_refresh, merge_previous
+from utils.storage import save_snapshot
+from utils.tabs import harvest_tabs
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 
+name_selector = ('#main-wrapper > div > div.fundpageheader.fundcomps.aem-GridColumn.aem-GridColumn--default--12 '
+                 '> div > h1 > span:nth-child(1)')
+table_selector = '#overview > div > div > section > div.section-content > table'
+
 
 def navigate_to_page(driver, url):
     """
@@ -57,7 +65,61 @@ def get_links(driver):
     return links
 
 
-def get_yield_data(driver, links):
+def ticker_from_link(link):
+    """
+    :description: Get the ticker from the link to the ETF page
+
+    :param link: The link to the ETF page
+    :type link: str
+    :return: The ticker
+    :rtype: str
+    """
+    return link.split('-')[-1].upper()
+
+
+def read_fund_page(driver, link):
+    """
+    :description: Read the yield data from the loaded ETF page
+
+    :param driver: Selenium driver
+    :type driver: selenium.webdriver.chrome.webdriver.WebDriver
+    :param link: The link to the ETF page
+    :type link: str
+    :return: The ticker and its yield data, or None if the page has no yield data
+    :rtype: tuple
+    """
+    ticker = ticker_from_link(link)
+    try:
+        wait_for_element(driver, (By.CSS_SELECTOR, name_selector))
+        wait_for_element(driver, (By.CSS_SELECTOR, table_selector))
+
+        # Read the name, as of date and all table rows in one round trip
+        fields = extract_fields(driver, {
+            'name': name_selector,
+            'as_of_date': '#overview > div > div:nth-child(8) > section > h2 > span',
+            'rows': {
+                'selector': table_selector + ' > tbody > tr',
+                'all': True,
+                'fields': {'text': ':scope', 'data': 'td.data'}
+            }
+        })
+    except (NoSuchElementException, TimeoutException):
+        return None
+    if fields['as_of_date'] is None:
+        return None
+    name = fields['name']
+    as_of_date = fields['as_of_date'].split(' ')[-3:]
+    date_string = ' '.join(as_of_date)
+    date = datetime.strptime(date_string, "%b %d %Y")
+    as_of_date = date.strftime("%m-%d-%Y")
+    for row in fields['rows']:
+        if "Yield to Maturity" in row['text'] or "Weighted Average All in Rate" in row['text'] \
+                or "Current Yield" in row['text']:
+            return ticker, {"Name": name, "Yield to Maturity": row['data'], "As of Date": as_of_date}
+    return None
+
+
+def get_yield_data(driver, links, tabs=1):
     """
     :description: Get the yield data
 
@@ -65,47 +127,27 @@ def get_yield_data(driver, links):
     :type driver: selenium.webdriver.chrome.webdriver.WebDriver
     :param links: The links to the ETF pages
     :type links: list
+    :param tabs: Number of tabs loading ETF pages at the same time, see utils.tabs.harvest_tabs
+    :type tabs: int
     :return: The yield data
     :rtype: dict
     """
-    data = {}
-    for link in tqdm(links):
-        driver.get(link)
-        time.sleep(2)
-        ticker = link.split('-')[-1].upper()
-        try:
-            name_element = driver.find_element(
-                By.CSS_SELECTOR,
-                '#main-wrapper > div > div.fundpageheader.fundcomps.aem-GridColumn.aem-GridColumn--default--12 > div '
-                '> h1 > span:nth-child(1)')
-            name = name_element.text
-            as_of_date_element = driver.find_element(
-                By.CSS_SELECTOR,
-                '#overview > div > div:nth-child(8) > section > h2 > span'
-            )
-            as_of_date = as_of_date_element.text
-            as_of_date = as_of_date.split(' ')[-3:]
-            date_string = ' '.join(as_of_date)
-            date = datetime.strptime(date_string, "%b %d %Y")
-            as_of_date = date.strftime("%m-%d-%Y")
-            table_rows = driver.find_elements(
-                By.CSS_SELECTOR,
-                '#overview > div > div > section > div.section-content > table > tbody > tr')
-            yield_data = None
-            for row in table_rows:
-                if "Yield to Maturity" in row.text or "Weighted Average All in Rate" in row.text \
-                        or "Current Yield" in row.text:
-                    data_element = row.find_element(By.CSS_SELECTOR, 'td.data')
-                    yield_data = data_element.text
-                    break
-            if yield_data is not None:
-                data[ticker] = {"Name": name, "Yield to Maturity": yield_data, "As of Date": as_of_date}
-        except NoSuchElementException:
-            pass
-    return data
-
-
-def create_and_save_dataframe(data, file_path):
+    if tabs > 1:
+        results = harvest_tabs(driver, links, table_selector, read_fund_page, tabs=tabs, issuer='state_street')
+    else:
+        results = []
+        for link in tqdm(links):
+            polite_pause('state_street')
+            try:
+                driver.get(link)
+            except TimeoutException:
+                continue
+            results.append(read_fund_page(driver, link))
+
+    return dict(result for result in results if result is not None)
+
+
+def create_and_save_dataframe(data, file_path, previous=None):
     """
     :description: Create a DataFrame from the data and save it to a CSV file
 
@@ -113,33 +155,46 @@ def create_and_save_dataframe(data, file_path):
     :type data: dict
     :param file_path: The path to the CSV file
     :type file_path: str
+    :param previous: Rows of the previous run to keep for the funds that were not fetched again, default is None
+    :type previous: pd.DataFrame, optional
     :return: The DataFrame
     :rtype: pd.DataFrame
     """
     df = pd.DataFrame.from_dict(data, orient='index')
-    df['Yield to Maturity'] = df['Yield to Maturity'].str.rstrip('%').astype('float') / 100.0
+    if not df.empty:
+        df['Yield to Maturity'] = df['Yield to Maturity'].str.rstrip('%').astype('float') / 100.0
     df.index.name = 'Ticker'
-    df.to_csv(file_path)
+    df = merge_previous(df, previous)
+    save_snapshot(df, file_path)
     return df
 
 
-def state_street_bot(return_df=False):
+def state_street_bot(return_df=False, lean=False, incremental=False, tabs=1):
     """
     :description: Run the State Street bot
 
     :param return_df: Whether to return the DataFrame, default is False
     :type return_df: bool, optional
+    :param lean: Whether to block images, fonts, stylesheets and trackers to speed up page loads, default is False
+    :type lean: bool, optional
+    :param incremental: Whether to only fetch the funds whose data may have changed since the previous run, default
+        is False
+    :type incremental: bool, optional
+    :param tabs: Number of tabs loading ETF pages at the same time in the one browser, default is 1
+    :type tabs: int, optional
     :return: The DataFrame
     :rtype: pd.DataFrame
     """
     print('Downloading State Street ETF yield data...')
     url = 'https://www.ssga.com/us/en/intermediary/etfs/fund-finder?g=assetclass%3Afixed-income'
-    driver = setup_driver()
-    navigate_to_page(driver, url)
-    accept_cookies(driver)
-    links = get_links(driver)
-    data = get_yield_data(driver, links)
-    driver.quit()
+    with leased_driver(lean=lean) as driver:
+        navigate_to_page(driver, url)
+        accept_cookies(driver)
+        links = get_links(driver)
+        previous = None
+        if incremental:
+            links, previous = plan_refresh('state_street', links, ticker_from_link)
+        data = get_yield_data(driver, links, tabs)
 
     # Get the absolute path of the project's root directory
     project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -151,7 +206,7 @@ def state_street_bot(return_df=False):
     csv_path = os.path.join(project_dir, 'data', 'state_street.csv')
 
     print('Saving State Street ETF yield data to CSV file...')
-    df = create_and_save_dataframe(data, csv_path)
+    df = create_and_save_dataframe(data, csv_path, previous)
     print('Done!')
 
     if return_df:
@@ -1,14 +1,19 @@
 import os
-import time
 import pandas as pd
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from selenium.common.exceptions import NoSuchElementException
-from utils.drivers import setup_driver
+from utils.drivers import leased_driver
+from utils.waits import wait_for_network_idle
+from utils.storage import save_snapshot
+from utils.tabs import harvest_tabs
+from functools import partial
 from tqdm import tqdm
 
+overview_selector = '#overview'
+
 
 def navigate_to_page(driver, url):
     """
@@ -62,12 +67,11 @@ def scroll_until_found(driver, css_selector):
     :return: The element
     :rtype: selenium.webdriver.remote.webelement.WebElement
     """
-    SCROLL_PAUSE_TIME = 0.5  # Pause time between scrolls
     last_height = driver.execute_script("return document.body.scrollHeight")
     while True:
         # Scroll down to next viewport
         driver.execute_script("window.scrollBy(0, window.innerHeight);")
-        time.sleep(SCROLL_PAUSE_TIME)  # wait time after each scroll
+        wait_for_network_idle(driver, idle_time=0.3, timeout=5)  # wait for lazy-loaded content after each scroll
         try:
             element = driver.find_element(By.CSS_SELECTOR, css_selector)
             # Scroll so the element is in the center of viewport
@@ -82,7 +86,7 @@ def scroll_until_found(driver, css_selector):
     return element
 
 
-def extract_etf_info(driver, url):
+def extract_etf_info(driver, url, navigate=True):
     """
     :description: Extract the ETF info
 
@@ -90,14 +94,17 @@ def extract_etf_info(driver, url):
     :type driver: selenium.webdriver.chrome.webdriver.WebDriver
     :param url: The url of the ETF page
     :type url: str
+    :param navigate: Whether to load the page first, False if it is already loaded
+    :type navigate: bool
     :return: The ETF info
     :rtype: dict
     """
     # Navigate to the url
-    driver.get(url)
+    if navigate:
+        driver.get(url)
 
     # Wait for the page to load
-    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, '#overview')))
+    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, overview_selector)))
 
     # Check for the pop-up
     try:
@@ -240,7 +247,7 @@ def extract_etf_info(driver, url):
     }
 
 
-def get_etf_data(driver, links):
+def get_etf_data(driver, links, tabs=1):
     """
     :description: Get the ETF data
 
@@ -248,16 +255,22 @@ def get_etf_data(driver, links):
     :type driver: selenium.webdriver.chrome.webdriver.WebDriver
     :param links: The links to the ETF pages
     :type links: list
+    :param tabs: Number of tabs loading ETF pages at the same time, see utils.tabs.harvest_tabs
+    :type tabs: int
     :return: The ETF data
     :rtype: pd.DataFrame
     """
     # Get data for all ETFs
     data = []
-    for link in tqdm(links):
-        etf_data = extract_etf_info(driver, link)
-        # Only add the etf_data to the list if it's not None
-        if etf_data is not None:
-            data.append(etf_data)
+    if tabs > 1:
+        results = harvest_tabs(driver, links, overview_selector, partial(extract_etf_info, navigate=False), tabs=tabs)
+        data = [etf_data for etf_data in results if etf_data is not None]
+    else:
+        for link in tqdm(links):
+            etf_data = extract_etf_info(driver, link)
+            # Only add the etf_data to the list if it's not None
+            if etf_data is not None:
+                data.append(etf_data)
 
     # Convert the data list into a DataFrame
     df = pd.DataFrame(data)
@@ -303,7 +316,7 @@ def get_etf_data(driver, links):
     return df
 
 
-def vaneck_bot(return_df=False, headless=True):
+def vaneck_bot(return_df=False, headless=True, lean=False, tabs=1):
     """
     :description: Run the VanEck ETF yield bot
 
@@ -311,6 +324,10 @@ def vaneck_bot(return_df=False, headless=True):
     :type return_df: bool
     :param headless: Whether to run the bot in headless mode
     :type headless: bool
+    :param lean: Whether to block images, fonts, stylesheets and trackers to speed up page loads
+    :type lean: bool
+    :param tabs: Number of tabs loading ETF pages at the same time in the one browser, default is 1
+    :type tabs: int
     :return: The VanEck ETF yield data
     :rtype: pd.DataFrame
     """
@@ -319,10 +336,10 @@ def vaneck_bot(return_df=False, headless=True):
            'prices-returns/?InvType=etf&AssetClass=cb,ib,mb,fr&Funds=emf,esf,'
            'grf,iigf,mwmf,emlf,embf,ccif&ShareClass=a,c,i,y,z&'
            'tab=price-returns&Sort=name&SortDesc=true')
-    driver = setup_driver(headless)
-    navigate_to_page(driver, url)
-    links = get_links(driver)
-    df = get_etf_data(driver, links)
+    with leased_driver(headless, lean) as driver:
+        navigate_to_page(driver, url)
+        links = get_links(driver)
+        df = get_etf_data(driver, links, tabs)
 
     # Get the absolute path of the project's root directory
     project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -334,7 +351,7 @@ def vaneck_bot(return_df=False, headless=True):
     csv_path = os.path.join(project_dir, 'data', 'vaneck.csv')
 
     print('Saving VanEck ETF yield data to CSV file...')
-    df.to_csv(csv_path)
+    save_snapshot(df, csv_path)
     print('Done!')
     if return_df:
         return df
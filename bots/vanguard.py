@@ -1,12 +1,26 @@
 import os
-import time
 import pandas as pd
 from tqdm import tqdm
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from utils.drivers import setup_driver
+from utils.drivers import leased_driver
+from utils.waits import polite_pause, wait_for_element
+from utils.extraction import extract_fields
+from utils.incremental import plan_refresh, merge_previous, load_previous
+from utils.network import captured_json_responses, discover_fund_endpoints, query_fund_endpoint
+from utils.storage import save_snapshot
+from utils.tabs import harvest_tabs
+
+ticker_selector = '#Dashboard > div.container > div > div.col-md-6.col-lg-8 > h1.ticker.rps-display-one'
+yield_selector = (
+    '#characteristics-tabset > characteristics-contianer > div > div > div > fixed-income-characteristic > '
+    'div > div > table > tr:nth-child(3) > td:nth-child(2)'
+)
+
+# Columns read from the fund detail endpoint, located in its JSON by utils.network.discover_fields
+endpoint_columns = ['Name', 'Yield to Maturity', 'As of']
 
 
 def navigate_to_page(driver, url):
@@ -37,24 +51,68 @@ def get_links(driver):
     :return: The links to the ETF pages
     :rtype: list
     """
-    links = []
-    i = 1
-    while True:
-        try:
-            link_element = driver.find_element(
-                By.CSS_SELECTOR,
-                f'body > app-root > vfa-list-page > div > div:nth-child(2) > '
-                f'div.col-lg-9.col-md-8.col-sm-12.p-0 > div > vfa-results > div > vfa-overview > div > div > table > '
-                f'tbody > tr:nth-child({i}) > th > p > span:nth-child(2) > a'
-            )
-            links.append(link_element.get_attribute('href'))
-            i += 1
-        except NoSuchElementException:
-            break
-    return links
+    fields = extract_fields(driver, {
+        'links': (
+            'body > app-root > vfa-list-page > div > div:nth-child(2) > '
+            'div.col-lg-9.col-md-8.col-sm-12.p-0 > div > vfa-results > div > vfa-overview > div > div > table > '
+            'tbody > tr > th > p > span:nth-child(2) > a',
+            'href',
+            'all'
+        )
+    })
+    return fields['links']
+
+
+def ticker_from_link(link):
+    """
+    :description: Get the ticker from the link to the ETF page
+
+    :param link: The link to the ETF page
+    :type link: str
+    :return: The ticker
+    :rtype: str
+    """
+    return link.rstrip('/').split('/')[-1].upper()
+
+
+def read_fund_page(driver, link, wait_time=10):
+    """
+    :description: Read the yield data from the loaded ETF page
+
+    :param driver: Selenium driver
+    :type driver: selenium.webdriver.chrome.webdriver.WebDriver
+    :param link: The link to the ETF page
+    :type link: str
+    :param wait_time: Maximum seconds to wait for the elements
+    :type wait_time: float
+    :return: The ticker and its yield data, or None if the page has no yield data
+    :rtype: tuple
+    """
+    try:
+        # Wait for the header and the characteristics table, then read all fields in one round trip
+        wait_for_element(driver, (By.CSS_SELECTOR, ticker_selector), wait_time)
+        wait_for_element(driver, (By.CSS_SELECTOR, yield_selector), wait_time)
+        fields = extract_fields(driver, {
+            'ticker': ticker_selector,
+            'name': '#Dashboard > div.container > div > div.col-md-6.col-lg-8 > h1.fund-name.rps-display-two',
+            'yield_to_maturity': (yield_selector, 'innerText'),
+            'as_of': ('#characteristics-tabset > characteristics-contianer > div > div > p', 'innerText'),
+        })
+    except TimeoutException:
+        print(f"TimeoutException encountered for {link}. Skipping to next link.")
+        return None
+    if fields['as_of'] is None:
+        print(f"As of date not found for {link}. Skipping to next link.")
+        return None
+
+    return fields['ticker'], {
+        'Name': fields['name'],
+        'Yield to Maturity': fields['yield_to_maturity'],
+        'As of': fields['as_of'].split(' ')[-1]
+    }
 
 
-def get_yield_data(driver, links):
+def get_yield_data(driver, links, tabs=1, responses=None):
     """
     :description: Get the yield data
 
@@ -62,54 +120,60 @@ def get_yield_data(driver, links):
     :type driver: selenium.webdriver.chrome.webdriver.WebDriver
     :param links: The links to the ETF pages
     :type links: list
+    :param tabs: Number of tabs loading ETF pages at the same time, see utils.tabs.harvest_tabs
+    :type tabs: int
+    :param responses: Collects the JSON responses of each ETF page right after it is read, while the browser still
+        has their bodies. The driver must be set up with capture_network=True. Only supported with one tab, as the
+        performance log of the browser mixes the traffic of all its tabs.
+    :type responses: list, optional
     :return: The yield data
     :rtype: dict
+    :raises ValueError: If responses are collected with more than one tab
     """
-    wait_time = 10
-    data = {}
-    for link in tqdm(links):
-        try:
-            driver.get(link)
-            time.sleep(4)
-            ticker_element = driver.find_element(
-                By.CSS_SELECTOR,
-                '#Dashboard > div.container > div > div.col-md-6.col-lg-8 > h1.ticker.rps-display-one'
-            )
-            ticker = ticker_element.text
-
-            name_element = driver.find_element(
-                By.CSS_SELECTOR,
-                '#Dashboard > div.container > div > div.col-md-6.col-lg-8 > h1.fund-name.rps-display-two'
-            )
-            name = name_element.text
-
-            yield_element = (
-                By.CSS_SELECTOR,
-                '#characteristics-tabset > characteristics-contianer > div > div > div > fixed-income-characteristic > '
-                'div > div > table > tr:nth-child(3) > td:nth-child(2)'
-            )
-            yield_element = WebDriverWait(driver, wait_time).until(EC.presence_of_element_located(yield_element))
-            yield_to_maturity = yield_element.get_attribute("innerText")
-
-            as_of_element = driver.find_element(
-                By.CSS_SELECTOR,
-                '#characteristics-tabset > characteristics-contianer > div > div > p'
-            )
-            as_of = as_of_element.get_attribute("innerText")
-
-            data[ticker] = {
-                'Name': name,
-                'Yield to Maturity': yield_to_maturity,
-                'As of': as_of.split(' ')[-1]
-            }
-        except TimeoutException:
-            print(f"TimeoutException encountered for {link}. Skipping to next link.")
-            continue
-
-    return data
-
-
-def create_and_save_dataframe(data, file_path):
+    if tabs > 1 and responses is not None:
+        raise ValueError('Responses can only be collected with one tab')
+
+    def read_and_capture(driver, link):
+        result = read_fund_page(driver, link)
+        responses.extend(captured_json_responses(driver))
+        return result
+
+    read = read_fund_page if responses is None else read_and_capture
+
+    if tabs > 1:
+        results = harvest_tabs(driver, links, yield_selector, read, tabs=tabs, issuer='vanguard')
+    else:
+        results = []
+        for link in tqdm(links):
+            polite_pause('vanguard')
+            try:
+                driver.get(link)
+            except TimeoutException:
+                print(f"TimeoutException encountered for {link}. Skipping to next link.")
+                continue
+            results.append(read(driver, link))
+
+    return dict(result for result in results if result is not None)
+
+
+def query_yield_data(tickers, max_concurrency=8):
+    """
+    :description: Get the yield data from the fund detail endpoint with plain HTTP, without a browser. The endpoint
+        and the fields of its JSON are recorded by vanguard_bot with capture_network=True.
+
+    :param tickers: The tickers of the ETFs
+    :type tickers: list
+    :param max_concurrency: Maximum number of requests in flight
+    :type max_concurrency: int, optional
+    :return: The yield data by ticker, with the yield as a fraction and the as of date as MM-DD-YYYY
+    :rtype: dict
+    :raises KeyError: If the endpoint has not been recorded yet, or a response no longer has the recorded fields
+    :raises ValueError: If a request failed or a value no longer converts
+    """
+    return query_fund_endpoint('vanguard', tickers, max_concurrency)
+
+
+def create_and_save_dataframe(data, file_path, previous=None, converted=False):
     """
     :description: Create a dataframe from the data and save it to a CSV file
 
@@ -117,19 +181,26 @@ def create_and_save_dataframe(data, file_path):
     :type data: dict
     :param file_path: The path to the CSV file
     :type file_path: str
+    :param previous: Rows of the previous run to keep for the funds that were not fetched again
+    :type previous: pd.DataFrame
+    :param converted: Whether the yields and dates are already converted, as returned by query_yield_data
+    :type converted: bool
     :return: The dataframe
     :rtype: pd.DataFrame
     """
     df = pd.DataFrame.from_dict(data, orient='index')
-    df['Yield to Maturity'] = df['Yield to Maturity'].str.rstrip('%').astype('float') / 100.0
-    df['As of'] = pd.to_datetime(df['As of'])
-    df['As of'] = df['As of'].dt.strftime('%m-%d-%Y')
+    if not df.empty and not converted:
+        df['Yield to Maturity'] = df['Yield to Maturity'].str.rstrip('%').astype('float') / 100.0
+        df['As of'] = pd.to_datetime(df['As of'])
+        df['As of'] = df['As of'].dt.strftime('%m-%d-%Y')
     df.index.name = 'Ticker'
-    df.to_csv(file_path)
+    df = merge_previous(df, previous)
+    save_snapshot(df, file_path)
     return df
 
 
-def vanguard_bot(return_df=False, headless=True):
+def vanguard_bot(return_df=False, headless=True, lean=False, capture_network=False, incremental=False, tabs=1,
+                 method='browser'):
     """
     :description: Download Vanguard ETF yield data and save it to a CSV file
 
@@ -137,16 +208,24 @@ def vanguard_bot(return_df=False, headless=True):
     :type return_df: bool
     :param headless: Whether to run the bot in headless mode
     :type headless: bool
+    :param lean: Whether to block images, fonts, stylesheets and trackers to speed up page loads
+    :type lean: bool
+    :param incremental: Whether to only fetch the funds whose data may have changed since the previous run
+    :type incremental: bool
+    :param capture_network: Whether to record the issuer's JSON endpoints from the network traffic
+    :type capture_network: bool
+    :param tabs: Number of tabs loading ETF pages at the same time in the one browser, one while capturing the network
+        traffic
+    :type tabs: int
+    :param method: 'browser' to scrape the fund list and the fund pages, or 'endpoint' to read the funds of the
+        previous run from the recorded fund detail endpoint with plain HTTP, falling back to 'browser' with
+        capture_network=True if the endpoint is not recorded yet or reading it fails. 'endpoint' neither finds new
+        funds nor drops delisted ones, so run 'browser' regularly to refresh the fund list.
+    :type method: str
     :return: The dataframe
     :rtype: pd.DataFrame
     """
     print('Downloading Vanguard ETF yield data...')
-    url = 'https://investor.vanguard.com/investment-products/list/etfs?assetclass=fixed_income'
-    driver = setup_driver(headless)
-    navigate_to_page(driver, url)
-    links = get_links(driver)
-    data = get_yield_data(driver, links)
-    driver.quit()
 
     # Get the absolute path of the project's root directory
     project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -157,8 +236,42 @@ def vanguard_bot(return_df=False, headless=True):
     # Construct the paths to your CSV files relative to the project's root directory
     csv_path = os.path.join(project_dir, 'data', 'vanguard.csv')
 
-    print('Saving Vanguard ETF yield data to CSV file...')
-    df = create_and_save_dataframe(data, csv_path)
+    if method == 'endpoint':
+        try:
+            tickers = list(load_previous('vanguard').index)
+            if not tickers:
+                raise KeyError('No previous run to take the Vanguard tickers from')
+            previous = None
+            if incremental:
+                tickers, previous = plan_refresh('vanguard', tickers)
+            data = query_yield_data(tickers)
+            print('Saving Vanguard ETF yield data to CSV file...')
+            df = create_and_save_dataframe(data, csv_path, previous, converted=True)
+        except (KeyError, ValueError) as e:
+            print(f'Reading the fund detail endpoint failed ({e}), scraping the fund pages...')
+            method, capture_network = 'browser', True
+    elif method != 'browser':
+        raise ValueError('method must be "endpoint" or "browser"')
+
+    if method == 'browser':
+        url = 'https://investor.vanguard.com/investment-products/list/etfs?assetclass=fixed_income'
+        detail_responses = [] if capture_network else None
+        with leased_driver(headless, lean, capture_network) as driver:
+            navigate_to_page(driver, url)
+            links = get_links(driver)
+            previous = None
+            if incremental:
+                links, previous = plan_refresh('vanguard', links, ticker_from_link)
+            list_responses = captured_json_responses(driver) if capture_network else []
+            if capture_network and tabs > 1:
+                print('Capturing the network traffic, loading the fund pages in one tab...')
+                tabs = 1
+            data = get_yield_data(driver, links, tabs, detail_responses)
+
+        print('Saving Vanguard ETF yield data to CSV file...')
+        df = create_and_save_dataframe(data, csv_path, previous)
+        if capture_network:
+            discover_fund_endpoints('vanguard', list_responses, detail_responses, df, endpoint_columns)
     print('Done!')
     if return_df:
         return df
@@ -6,9 +6,15 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from selenium.common.exceptions import NoSuchElementException
-from utils.drivers import setup_driver
+from utils.drivers import leased_driver
+from utils.extraction import extract_fields
+from utils.storage import save_snapshot
+from utils.tabs import harvest_tabs
+from functools import partial
 from tqdm import tqdm
 
+overview_selector = '#fund-overview > div > div:nth-child(1) > table'
+
 
 def navigate_to_page(driver, url):
     """
@@ -53,25 +59,16 @@ def get_links(driver):
         '#fundlisting > div > div:nth-child(2) > div.table-responsive > table'
     )))
 
-    idx = 1  # index for nth-child in css selector
-    links = []
-
-    while True:
-        try:
-            # Try finding the link in the current row
-            link = driver.find_element(By.CSS_SELECTOR,
-                                       f'#fundlisting > div > div:nth-child(2) > div.table-responsive > table > '
-                                       f'tbody > tr:nth-child({idx}) > td.nameLink > a')
-            links.append(link.get_attribute('href'))
-            idx += 1
-        except NoSuchElementException:
-            # If the link in the current row was not found, stop the loop
-            break
-
-    return links
+    # Read the links of all rows in one round trip
+    fields = extract_fields(driver, {
+        'links': ('#fundlisting > div > div:nth-child(2) > div.table-responsive > table > tbody > tr > td.nameLink > a',
+                  'href',
+                  'all')
+    })
+    return fields['links']
 
 
-def extract_etf_info(driver, url):
+def extract_etf_info(driver, url, navigate=True):
     """
     :description: Extract the ETF info from the page
 
@@ -79,17 +76,18 @@ def extract_etf_info(driver, url):
     :type driver: selenium.webdriver.chrome.webdriver.WebDriver
     :param url: The url of the target page
     :type url: str
+    :param navigate: Whether to load the page first, False if it is already loaded
+    :type navigate: bool
     :return: The ETF info
     :rtype: dict
     """
     # Navigate to the url
-    driver.get(url)
+    if navigate:
+        driver.get(url)
 
     # Try to extract yield_to_maturity, if it's not available print the ticker and skip to next link
     try:
-        WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.CSS_SELECTOR,
-                                                                        '#fund-overview > div > div:nth-child(1) > '
-                                                                        'table')))
+        WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.CSS_SELECTOR, overview_selector)))
         yield_to_maturity = driver.find_element(By.CSS_SELECTOR,
                                                 '#fund-overview > div > div:nth-child(1) > table > tbody > '
                                                 'tr:nth-child(9) > td:nth-child(2)').text
@@ -115,7 +113,7 @@ def extract_etf_info(driver, url):
     return {"Ticker": ticker, "Name": name, "Yield to Maturity": yield_to_maturity, "As of Date": as_of_date}
 
 
-def get_etf_data(driver, links):
+def get_etf_data(driver, links, tabs=1):
     """
     :description: Get the ETF data
 
@@ -123,20 +121,26 @@ def get_etf_data(driver, links):
     :type driver: selenium.webdriver.chrome.webdriver.WebDriver
     :param links: The links to the ETF pages
     :type links: list
+    :param tabs: Number of tabs loading ETF pages at the same time, see utils.tabs.harvest_tabs
+    :type tabs: int
     :return: The ETF data
     :rtype: pd.DataFrame
     """
     # Get data for all ETFs
     data = []
-    for link in tqdm(links):
-        try:
-            etf_data = extract_etf_info(driver, link)
+    if tabs > 1:
+        results = harvest_tabs(driver, links, overview_selector, partial(extract_etf_info, navigate=False), tabs=tabs)
+        data = [etf_data for etf_data in results if etf_data is not None]
+    else:
+        for link in tqdm(links):
+            try:
+                etf_data = extract_etf_info(driver, link)
 
-            # Only add the etf_data to the list if it's not None
-            if etf_data is not None:
-                data.append(etf_data)
-        except NoSuchElementException:
-            print(f"Failed to retrieve data for {link}. Skipping to next link.")
+                # Only add the etf_data to the list if it's not None
+                if etf_data is not None:
+                    data.append(etf_data)
+            except NoSuchElementException:
+                print(f"Failed to retrieve data for {link}. Skipping to next link.")
 
     # Convert data list to a pandas DataFrame
     df = pd.DataFrame(data)
@@ -157,7 +161,7 @@ def get_etf_data(driver, links):
     return df
 
 
-def wisdomtree_bot(return_df=False, headless=True):
+def wisdomtree_bot(return_df=False, headless=True, lean=False, tabs=1):
     """
     :description: Download WisdomTree ETF yield data
 
@@ -165,15 +169,19 @@ def wisdomtree_bot(return_df=False, headless=True):
     :type return_df: bool
     :param headless: Whether to run the bot in headless mode
     :type headless: bool
+    :param lean: Whether to block images, fonts, stylesheets and trackers to speed up page loads
+    :type lean: bool
+    :param tabs: Number of tabs loading ETF pages at the same time in the one browser, default is 1
+    :type tabs: int
     :return: The DataFrame
     :rtype: pd.DataFrame
     """
     print('Downloading WisdomTree ETF yield data...')
     url = 'https://www.wisdomtree.com/etfs'
-    driver = setup_driver(headless)
-    navigate_to_page(driver, url)
-    links = get_links(driver)
-    df = get_etf_data(driver, links)
+    with leased_driver(headless, lean) as driver:
+        navigate_to_page(driver, url)
+        links = get_links(driver)
+        df = get_etf_data(driver, links, tabs)
 
     # Get the absolute path of the project's root directory
     project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -185,7 +193,7 @@ def wisdomtree_bot(return_df=False, headless=True):
     csv_path = os.path.join('data', 'wisdomtree.csv')
 
     print('Saving WisdomTree ETF yield data to CSV file...')
-    df.to_csv(csv_path)
+    save_snapshot(df, csv_path)
     print('Done!')
     if return_df:
         return df
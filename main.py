@@ -13,32 +13,148 @@ from bots.janus_henderson import janus_henderson_bot
 from bots.dimensional import dimensional_bot
 from bots.flexshares import flexshares_bot
 from utils.processing import process_data
+from utils.storage import save_snapshot
+from utils.drivers import DriverPool, set_default_pool
 
 import os
 import sys
+import inspect
 import logging
+import argparse
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
 # Suppress 'DevTools listening on...' messages
 os.environ['WDM_LOG_LEVEL'] = '0'
 sys.stderr = open(os.devnull, 'w')
 
 
+BOT_LIST = [
+    (ishares_bot, 'ishares_bot'),
+    (vanguard_bot, 'vanguard_bot'),
+    (state_street_bot, 'state_street_bot'),
+    (schwab_bot, 'schwab_bot'),
+    (invesco_bot, 'invesco_bot'),
+    (first_trust_bot, 'first_trust_bot'),
+    (jpmorgan_bot, 'jpmorgan_bot'),
+    (pimco_bot, 'pimco_bot'),
+    (wisdomtree_bot, 'wisdomtree_bot'),
+    (vaneck_bot, 'vaneck_bot'),
+    (goldman_sachs_bot, 'goldman_sachs_bot'),
+    (dimensional_bot, 'dimensional_bot'),
+    (janus_henderson_bot, 'janus_henderson_bot'),
+    (flexshares_bot, 'flexshares_bot')
+]
+
+
+def configure_logging():
+    """
+    :description: This function configures the global logging for the main process and each bot worker.
+
+    :return: None
+    :rtype: None
+    """
+    logging.basicConfig(filename='bot_failures.log',
+                        level=logging.ERROR,
+                        format='%(asctime)s:%(levelname)s:%(message)s')
+
+
 def run_bot(bot, name):
     """
     This function runs a bot and retries if it fails.
 
+    :return: Whether the bot ran successfully
+    :rtype: bool
     """
     max_retries = 2
     for i in range(max_retries + 1):  # Attempting the bot max_retries + 1 times (original run plus two retries)
         try:
             bot()
             print(f'{name} ran successfully!')
-            return
+            return True
         except Exception as e:
             if i < max_retries:
                 print(f'{name} failed on attempt {i + 1}. Retrying...')
             else:
                 logging.error(f'{name} failed on all attempts. Error: {e}')
+    return False
+
+
+def run_bots(bot_list, max_workers=None, executor='thread', max_page_loads=200, incremental=False, tabs=1,
+             lean=False):
+    """
+    :description: This function runs the bots concurrently. Every bot works in its own Chrome instance and writes its
+        own CSV file in the data directory, so the bots are independent of each other and the total run time is
+        roughly that of the slowest bot. In thread mode the bots lease their browsers from a shared pool of warm
+        browsers, at most one per worker and configuration, launched on first lease, so retries don't pay the Chrome
+        start-up again.
+
+    :param bot_list: The bots to run as (bot, name) tuples
+    :type bot_list: list
+    :param max_workers: The number of bots to run at the same time, defaults to one worker per bot
+    :type max_workers: int, optional
+    :param executor: 'thread' to run the bots in threads or 'process' to run them in separate processes
+    :type executor: str, optional
+    :param max_page_loads: The number of page loads after which a pooled browser is replaced with a fresh one
+    :type max_page_loads: int, optional
+    :param incremental: Whether the bots that support it only fetch the funds whose data may have changed since the
+        previous run
+    :type incremental: bool, optional
+    :param tabs: Number of tabs the bots that support it load fund pages in at the same time, in one browser
+    :type tabs: int, optional
+    :param lean: Whether the bots that support it and the pooled browsers load pages lean, see
+        utils.drivers.setup_driver
+    :type lean: bool, optional
+    :return: The names of the bots that failed on all attempts
+    :rtype: list
+    """
+    if executor == 'thread':
+        pool_class, pool_kwargs = ThreadPoolExecutor, {}
+    elif executor == 'process':
+        pool_class, pool_kwargs = ProcessPoolExecutor, {'initializer': configure_logging}
+    else:
+        raise ValueError('executor must be "thread" or "process"')
+
+    if incremental:
+        bot_list = [
+            (partial(bot, incremental=True) if 'incremental' in inspect.signature(bot).parameters else bot, name)
+            for bot, name in bot_list
+        ]
+    if tabs > 1:
+        bot_list = [
+            (partial(bot, tabs=tabs) if 'tabs' in inspect.signature(bot).parameters else bot, name)
+            for bot, name in bot_list
+        ]
+    if lean:
+        bot_list = [
+            (partial(bot, lean=True) if 'lean' in inspect.signature(bot).parameters else bot, name)
+            for bot, name in bot_list
+        ]
+
+    max_workers = max_workers or len(bot_list)
+    driver_pool = None
+    if executor == 'thread':
+        driver_pool = DriverPool(size=max_workers, lean=lean, max_page_loads=max_page_loads, lazy=True)
+        set_default_pool(driver_pool)
+
+    failed = []
+    try:
+        with pool_class(max_workers=max_workers, **pool_kwargs) as pool:
+            futures = {pool.submit(run_bot, bot, name): name for bot, name in bot_list}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    success = future.result()
+                except Exception as e:
+                    logging.error(f'{name} worker crashed. Error: {e}')
+                    success = False
+                if not success:
+                    failed.append(name)
+    finally:
+        if driver_pool is not None:
+            set_default_pool(None)
+            driver_pool.close()
+    return failed
 
 
 def vpn_check():
@@ -61,41 +177,43 @@ def vpn_check():
             print("Invalid input. Please enter Yes or No.")
 
 
-def main():
+def main(max_workers=None, executor='thread', incremental=False, n_jobs=1, offline=False, tabs=1, lean=False,
+         backend='arch'):
     """
     :description: This function runs all the bots and processes the data.
 
+    :param max_workers: The number of bots to run at the same time, defaults to one worker per bot
+    :type max_workers: int, optional
+    :param executor: 'thread' to run the bots in threads or 'process' to run them in separate processes
+    :type executor: str, optional
+    :param incremental: Whether the bots that support it only fetch the funds whose data may have changed
+    :type incremental: bool, optional
+    :param n_jobs: Number of processes fitting the GARCH models, -1 uses all CPU cores
+    :type n_jobs: int, optional
+    :param offline: Whether to skip the bots and process the saved data with the cached price history only
+    :type offline: bool, optional
+    :param tabs: Number of tabs the bots that support it load fund pages in at the same time, in one browser
+    :type tabs: int, optional
+    :param lean: Whether the bots block images, fonts, stylesheets and trackers to speed up page loads
+    :type lean: bool, optional
+    :param backend: 'arch' to fit the GARCH models per symbol or 'numpy' to fit all symbols in batch, see
+        utils.processing.get_expected_semi_deviation
+    :type backend: str, optional
     :return: None
     :rtype: None
     """
     # Global logging configuration
-    logging.basicConfig(filename='bot_failures.log',
-                        level=logging.ERROR,
-                        format='%(asctime)s:%(levelname)s:%(message)s')
+    configure_logging()
+
+    if not offline:
+        # VPN Check
+        vpn_check()
 
-    # VPN Check
-    vpn_check()
-
-    # Run the bots
-    bot_list = [
-        (ishares_bot, 'ishares_bot'),
-        (vanguard_bot, 'vanguard_bot'),
-        (state_street_bot, 'state_street_bot'),
-        (schwab_bot, 'schwab_bot'),
-        (invesco_bot, 'invesco_bot'),
-        (first_trust_bot, 'first_trust_bot'),
-        (jpmorgan_bot, 'jpmorgan_bot'),
-        (pimco_bot, 'pimco_bot'),
-        (wisdomtree_bot, 'wisdomtree_bot'),
-        (vaneck_bot, 'vaneck_bot'),
-        (goldman_sachs_bot, 'goldman_sachs_bot'),
-        (dimensional_bot, 'dimensional_bot'),
-        (janus_henderson_bot, 'janus_henderson_bot'),
-        (flexshares_bot, 'flexshares_bot')
-    ]
-
-    for bot, name in bot_list:
-        run_bot(bot, name)
+        # Run the bots
+        failed = run_bots(BOT_LIST, max_workers=max_workers, executor=executor, incremental=incremental,
+                          tabs=tabs, lean=lean)
+        if failed:
+            print(f'The following bots failed: {", ".join(sorted(failed))}')
 
     logging.info('Starting the main function.')
 
@@ -104,12 +222,12 @@ def main():
 
     print('Processing bond ETF yield data...')
     try:
-        df = process_data(mar=0)
+        df = process_data(mar=0, n_jobs=n_jobs, backend=backend, offline=offline or None)
         print(df)
         print('Saving bond ETF yield data...')
         # Explicitly mention the full path for debugging or confirm directory
         full_path = os.path.join(os.path.dirname(__file__), 'data', 'bond_etf_yield.csv')
-        df.to_csv(full_path)
+        save_snapshot(df, full_path)
         logging.info(f'Data saved successfully to {full_path}.')
         print('Done!')
     except Exception as e:
@@ -120,4 +238,24 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Run the YieldQuery bots and process the bond ETF yield data.')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of bots to run at the same time (default: one worker per bot)')
+    parser.add_argument('--executor', choices=['thread', 'process'], default='thread',
+                        help='Run the bots in threads or in separate processes (default: thread)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only fetch the funds whose data may have changed since the previous run')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Number of processes fitting the GARCH models, -1 uses all CPU cores (default: 1)')
+    parser.add_argument('--offline', action='store_true',
+                        help='Skip the bots and process the saved data with the cached price history only')
+    parser.add_argument('--tabs', type=int, default=1,
+                        help='Number of tabs the bots that support it load fund pages in at the same time (default: 1)')
+    parser.add_argument('--lean', action='store_true',
+                        help='Block images, fonts, stylesheets and trackers to speed up page loads')
+    parser.add_argument('--backend', choices=['arch', 'numpy'], default='arch',
+                        help='Fit the GARCH models per symbol with arch or all symbols in batch with NumPy '
+                             '(default: arch)')
+    args = parser.parse_args()
+    main(max_workers=args.workers, executor=args.executor, incremental=args.incremental, n_jobs=args.jobs,
+         offline=args.offline, tabs=args.tabs, lean=args.lean, backend=args.backend)
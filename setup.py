@@ -12,13 +12,18 @@ setup(
     url='https://github.com/nathanramoscfa/yieldquery',
     packages=find_packages(exclude=['*.ipynb_checkpoints', '*.tests', '*.tests.*', 'tests.*', 'tests']),
     install_requires=[
+        'aiohttp~=3.9.1',
+        'arch~=6.1.0',
         'beautifulsoup4==4.12.2',
+        'lxml~=4.9.3',
         'numpy==1.23.5',
         'pandas==1.5.3',
+        'pyarrow~=14.0.1',
         'python-dotenv==1.0.0',
         'requests==2.28.2',
         'selenium==4.9.0',
         'tqdm==4.65.0',
+        'yahooquery~=2.3.3',
     ],
     classifiers=[
         'Development Status :: 3 - Alpha',
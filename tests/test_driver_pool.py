@@ -0,0 +1,152 @@
+import threading
+import pytest
+from utils import drivers
+
+
+class FakeDriver:
+    def __init__(self):
+        self.quit_called = False
+        self.broken = False
+
+    def get(self, url):
+        pass
+
+    def get_log(self, log_type):
+        return []
+
+    def quit(self):
+        self.quit_called = True
+        if self.broken:
+            raise ConnectionError('chromedriver is gone')
+
+
+class FakeChrome:
+    """Stands in for setup_driver, failing the launches it is told to fail"""
+
+    def __init__(self):
+        self.launched = []
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, headless=True, lean=False, capture_network=False):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError('Chrome failed to start')
+            driver = FakeDriver()
+            self.launched.append(driver)
+            return driver
+
+
+@pytest.fixture
+def chrome(monkeypatch):
+    fake = FakeChrome()
+    monkeypatch.setattr(drivers, 'setup_driver', fake)
+
+    def reset_driver(driver):
+        if driver.broken:
+            raise ConnectionError('Max retries exceeded')
+    monkeypatch.setattr(drivers, 'reset_driver', reset_driver)
+    return fake
+
+
+def test_browsers_are_reused(chrome):
+    pool = drivers.DriverPool(size=1)
+    with pool.lease() as first:
+        pass
+    with pool.lease() as second:
+        pass
+    assert first is second
+    assert len(chrome.launched) == 1
+
+
+def test_browsers_are_replaced_after_max_page_loads(chrome):
+    pool = drivers.DriverPool(size=1, max_page_loads=2)
+    with pool.lease() as first:
+        first.get('a')
+        first.get('b')
+    with pool.lease() as second:
+        pass
+    assert first.quit_called and second is not first
+
+
+def test_release_errors_do_not_hide_the_bot_error(chrome):
+    pool = drivers.DriverPool(size=1)
+    with pytest.raises(ValueError):
+        with pool.lease() as driver:
+            driver.broken = True
+            chrome.failures = 1
+            raise ValueError('the bot failed')
+
+    # The failed relaunch is retried on the next lease instead of losing the slot
+    with pool.lease(timeout=1) as driver:
+        assert driver in chrome.launched and not driver.broken
+    assert pool._missing == 0
+    assert pool._idle.qsize() == 1
+
+
+def test_failed_launch_falls_back_to_a_one_off_browser(chrome):
+    chrome.failures = 1
+    pool = drivers.DriverPool(size=1, lease_timeout=0.1)
+    assert pool._missing == 1
+
+    # Chrome still fails: the lease doesn't wait for a browser that will never come and reports the error
+    chrome.failures = 2
+    with pytest.raises(RuntimeError):
+        with pool.lease():
+            pass
+    assert pool._missing == 1
+
+    # The launch fails once more, the one-off browser starts
+    chrome.failures = 1
+    with pool.lease() as driver:
+        pass
+    assert driver.quit_called and pool._missing == 1
+
+    with pool.lease() as driver:
+        pass
+    assert not driver.quit_called
+    assert pool._missing == 0 and pool._idle.qsize() == 1
+
+
+def test_lease_times_out_to_a_one_off_browser(chrome):
+    pool = drivers.DriverPool(size=1, lease_timeout=0.1)
+    with pool.lease() as pooled:
+        with pool.lease() as one_off:
+            assert one_off is not pooled
+        assert one_off.quit_called
+    assert not pooled.quit_called
+    assert pool._idle.qsize() == 1
+
+
+def test_lazy_pool_launches_on_first_lease(chrome):
+    pool = drivers.DriverPool(size=3, lazy=True)
+    assert chrome.launched == [] and pool._missing == 3
+
+    with pool.lease() as first:
+        pass
+    with pool.lease() as second:
+        pass
+    assert first is second
+    assert len(chrome.launched) == 1 and pool._missing == 2
+
+
+def test_leased_driver_uses_a_pool_per_configuration(chrome, monkeypatch):
+    pool = drivers.DriverPool(size=1, lazy=True)
+    monkeypatch.setattr(drivers, '_default_pool', pool)
+
+    with drivers.leased_driver() as plain:
+        pass
+    with drivers.leased_driver(capture_network=True) as capturing:
+        pass
+    with drivers.leased_driver(capture_network=True) as again:
+        pass
+
+    assert capturing is not plain and again is capturing
+    assert not capturing.quit_called
+    assert pool.for_config(True, False, True).capture_network
+
+    pool.close()
+    assert plain.quit_called and capturing.quit_called
+    with pytest.raises(RuntimeError):
+        pool.for_config(True, True, False)
@@ -0,0 +1,91 @@
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+import pytest
+import pandas as pd
+from bots import first_trust
+from utils.http_client import NOT_MODIFIED
+
+summary_page = '''<html><body>
+<span id="FundNavigation_lblPageHeader">First Trust Low Duration Opportunities ETF (LMBS)</span>
+<div id="FundCharacteristics_FundControlContainer">
+<div class="fundControlHeaderBar">Fund Characteristics as of 2/29/2024</div>
+<table id="FundCharacteristics_FundControlContainer_NameValuePairListing">
+<tr><td>Weighted Average Yield-to-Worst1</td><td>5.12%</td></tr>
+<tr><td>Weighted Average Effective Duration</td><td>2.94 Years</td></tr>
+</table></div></body></html>'''
+
+bot_check_page = '<html><body>Please verify you are a human</body></html>'
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        ticker = self.path.rsplit('=', 1)[-1]
+        etag = f'"{ticker}-1"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = (summary_page if ticker == 'LMBS' else bot_check_page).encode()
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    httpd = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    monkeypatch.setattr(first_trust, 'etf_url',
+                        lambda ticker: f'http://127.0.0.1:{httpd.server_port}/EtfSummary.aspx?Ticker={ticker}')
+    yield
+    httpd.shutdown()
+
+
+def test_parse_etf_data():
+    assert first_trust.parse_etf_data(summary_page) == {
+        'Weighted Average Yield-to-Worst': '5.12%',
+        'Weighted Average Effective Duration': '2.94 Years',
+        'As of': '02-29-2024',
+        'ETF Name': 'First Trust Low Duration Opportunities ETF',
+    }
+    assert first_trust.parse_etf_data(bot_check_page) is None
+
+
+def test_validators_are_kept_for_parsed_pages_only(server):
+    validators = {}
+    data = first_trust.get_etf_data(['LMBS', 'FTSL'], validators)
+    assert list(data) == ['LMBS']
+    assert list(validators) == [first_trust.etf_url('LMBS')]
+
+    # The parsed page is unchanged, the page that gave no data is requested in full again
+    data = first_trust.get_etf_data(['LMBS', 'FTSL'], validators)
+    assert data == {'LMBS': NOT_MODIFIED}
+    assert list(validators) == [first_trust.etf_url('LMBS')]
+
+
+def test_requests_are_unconditional_without_validators(server):
+    data = first_trust.get_etf_data(['LMBS'])
+    assert data['LMBS']['Weighted Average Yield-to-Worst'] == '5.12%'
+    assert first_trust.get_etf_data(['LMBS'])['LMBS'] is not NOT_MODIFIED
+
+
+def test_unchanged_page_without_previous_row_is_fetched_again(server, monkeypatch):
+    calls = []
+    validators = {first_trust.etf_url('LMBS'): {'etag': '"LMBS-1"', 'last_modified': None}}
+    monkeypatch.setattr(first_trust, 'plan_refresh', lambda issuer, tickers: (['LMBS'], None))
+    monkeypatch.setattr(first_trust, 'load_validators', lambda: validators)
+    monkeypatch.setattr(first_trust, 'load_previous', lambda issuer: pd.DataFrame())
+    monkeypatch.setattr(first_trust, 'save_snapshot', lambda df, path: calls.append(('snapshot', df)))
+    monkeypatch.setattr(first_trust, 'save_validators', lambda v: calls.append(('validators', dict(v))))
+
+    df = first_trust.first_trust_bot(return_df=True, incremental=True)
+    assert list(df.index) == ['LMBS']
+    assert df.at['LMBS', 'Weighted Average Yield-to-Worst'] == pytest.approx(0.0512)
+    assert [name for name, _ in calls] == ['snapshot', 'validators']
+    assert list(calls[1][1]) == [first_trust.etf_url('LMBS')]
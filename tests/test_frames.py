@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+from utils import processing
+from utils.frames import coalesce
+
+
+def test_coalesce_takes_the_first_value_and_its_source():
+    df = pd.DataFrame({
+        'YTM': [0.04, np.nan, np.nan, np.nan],
+        'YTW': [0.05, 0.03, np.nan, np.nan],
+        'Yield': [0.06, 0.02, 0.01, np.nan],
+    }, index=['A', 'B', 'C', 'D'])
+
+    values, sources = coalesce(df, ['YTM', 'Missing', 'YTW', 'Yield'])
+
+    pd.testing.assert_series_equal(values, pd.Series([0.04, 0.03, 0.01, np.nan], index=df.index))
+    assert sources.tolist()[:3] == ['YTM', 'YTW', 'Yield'] and pd.isna(sources['D'])
+
+
+def test_coalesce_without_columns():
+    values, sources = coalesce(pd.DataFrame({'YTM': [0.04]}), ['YTW'])
+
+    assert values.isna().all() and sources.isna().all()
+
+
+def test_coalesce_keeps_text():
+    df = pd.DataFrame({'Name': [None, 'Bond ETF'], 'Long Name': ['Treasury ETF', 'Bond Fund']})
+
+    values, _ = coalesce(df, ['Name', 'Long Name'])
+
+    assert values.tolist() == ['Treasury ETF', 'Bond ETF']
+
+
+def test_load_issuer_fills_in_from_the_fallbacks(tmp_path, monkeypatch):
+    pd.DataFrame({
+        'ETF Name': ['Worst', 'Yield', 'Maturity'],
+        'Yield to Worst (%)': [0.05, np.nan, np.nan],
+        'Yield (%)': [0.06, 0.04, np.nan],
+        'Yield to Maturity (%)': [0.07, 0.06, 0.03],
+        'As of Date': ['05-31-2024'] * 3,
+        'Unused': [1, 2, 3],
+    }, index=pd.Index(['A', 'B', 'C'], name='Ticker')).to_csv(tmp_path / 'invesco.csv')
+    monkeypatch.setattr(processing, 'build_file_path', lambda file_name: str(tmp_path / file_name))
+
+    df = processing.load_issuer('invesco', with_sources=True)
+
+    assert list(df.columns) == ['Name', 'Yield to Maturity', 'Yield to Maturity Source', 'Date']
+    assert df['Yield to Maturity'].tolist() == [0.05, 0.04, 0.03]
+    assert df['Yield to Maturity Source'].tolist() == ['Yield to Worst (%)', 'Yield (%)', 'Yield to Maturity (%)']
+
+
+def test_load_issuer_skips_fallbacks_missing_from_the_file(tmp_path, monkeypatch):
+    pd.DataFrame({
+        'NAME': ['Maturity', 'Worst'],
+        'WEIGHTED AVG YIELD TO MATURITY': [0.05, np.nan],
+        'WEIGHTED AVG YIELD TO WORST': [0.06, 0.04],
+        'AS OF DATE': ['05-31-2024'] * 2,
+    }, index=pd.Index(['A', 'B'], name='Ticker')).to_csv(tmp_path / 'flexshares.csv')
+    monkeypatch.setattr(processing, 'build_file_path', lambda file_name: str(tmp_path / file_name))
+
+    df = processing.load_issuer('flexshares', with_sources=True)
+
+    assert df['Yield to Maturity'].tolist() == [0.05, 0.04]
+    assert df['Yield to Maturity Source'].tolist() == ['WEIGHTED AVG YIELD TO MATURITY', 'WEIGHTED AVG YIELD TO WORST']
+    assert df['Name'].tolist() == ['Maturity', 'Worst']
+
+
+def test_load_issuer_reads_only_the_schema_columns(tmp_path, monkeypatch):
+    requested = []
+
+    def load_snapshot(csv_path, columns=None):
+        requested.append((csv_path, columns))
+        return pd.DataFrame({'ETF Name': ['Bond ETF'], 'Yield (%)': [0.04], 'As of Date': ['05-31-2024']},
+                            index=['A'])
+
+    monkeypatch.setattr(processing, 'load_snapshot', load_snapshot)
+    monkeypatch.setattr(processing, 'build_file_path', lambda file_name: str(tmp_path / file_name))
+
+    df = processing.load_issuer('invesco')
+
+    assert requested == [(str(tmp_path / 'invesco.csv'),
+                          ['ETF Name', 'Yield to Worst (%)', 'Yield (%)', 'Yield to Maturity (%)', 'As of Date'])]
+    assert list(df.columns) == ['Name', 'Yield to Maturity', 'Date']
+    assert df.index.name == 'Ticker' and df.loc['A', 'Yield to Maturity'] == 0.04
+
+
+def test_load_issuers_matches_the_issuer_functions(tmp_path, monkeypatch):
+    monkeypatch.setattr(processing, 'build_file_path', lambda file_name: str(tmp_path / file_name))
+    for issuer, schema in processing.issuer_schemas.items():
+        pd.DataFrame({
+            schema['columns']['Name']: [f'{issuer} bond ETF'],
+            schema['columns']['Yield to Maturity']: [0.04],
+            schema['columns']['Date']: ['05-31-2024'],
+        }, index=pd.Index([issuer.upper()], name='Ticker')).to_csv(tmp_path / schema['file'])
+
+    loaded = processing.load_issuers(max_workers=4)
+
+    assert list(loaded) == list(processing.issuer_schemas)
+    for issuer, df in loaded.items():
+        pd.testing.assert_frame_equal(df, getattr(processing, issuer)())
+        assert df.loc[issuer.upper(), 'Name'] == f'{issuer} bond ETF'
+    assert len(processing.combine_data()) == len(processing.issuer_schemas)
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from utils import processing
+
+
+def simulate(rng, nobs, omega, alpha, beta, mu=0.05):
+    returns = np.empty(nobs)
+    variance = omega / (1 - alpha - beta)
+    for t in range(nobs):
+        shock = np.sqrt(variance) * rng.standard_normal()
+        returns[t] = mu + shock
+        variance = omega + alpha * shock ** 2 + beta * variance
+    return returns
+
+
+@pytest.fixture(scope='module')
+def returns_by_symbol():
+    rng = np.random.default_rng(0)
+    return {f'S{i}': simulate(rng, int(rng.integers(300, 700)), 0.02 + 0.05 * rng.random(),
+                              0.03 + 0.1 * rng.random(), 0.8)
+            for i in range(6)}
+
+
+@pytest.mark.parametrize('p, q', [(1, 1), (1, 2), (2, 1), (2, 2)])
+def test_batch_fit_matches_arch(returns_by_symbol, p, q):
+    df = processing.validate_numpy_garch(returns_by_symbol, p, q)
+
+    assert df['Converged'].all()
+    assert df['Within Tolerance'].all(), df
+    assert (df['NumPy Log-Likelihood'] >= df['arch Log-Likelihood'] - 1e-3).all()
+
+
+def test_symbols_not_converged_fall_back_to_arch(returns_by_symbol, monkeypatch):
+    fit_garch_batch = processing.fit_garch_batch
+
+    def not_converged(*args, **kwargs):
+        fit = fit_garch_batch(*args, **kwargs)
+        fit['converged'][:] = False
+        return fit
+
+    monkeypatch.setattr(processing, 'fit_garch_batch', not_converged)
+    expected = processing.forecast_garch_volatilities(returns_by_symbol)
+
+    assert processing.forecast_garch_volatilities_numpy(returns_by_symbol) == expected
+
+
+def test_numpy_backend_matches_arch_backend(returns_by_symbol):
+    returns_by_symbol = dict(returns_by_symbol, SHORT=returns_by_symbol['S0'][:processing.garch_min_observations - 1])
+
+    expected = processing.forecast_garch_volatilities(returns_by_symbol)
+    forecasts = processing.forecast_garch_volatilities_numpy(returns_by_symbol)
+
+    # The series too short for the batch fit are fitted with arch_model, like the arch backend does
+    assert list(forecasts) == list(expected) and 'SHORT' in forecasts
+    for symbol, forecast in forecasts.items():
+        assert forecast == pytest.approx(expected[symbol], abs=1e-3)
+
+
+def test_parallel_fits_match_serial_fits(returns_by_symbol):
+    returns_by_symbol = dict(list(returns_by_symbol.items())[:3])
+    progress = []
+
+    serial = processing.forecast_garch_volatilities(returns_by_symbol, n_jobs=1)
+    parallel = processing.forecast_garch_volatilities(returns_by_symbol, n_jobs=2, chunksize=1,
+                                                      progress=lambda done, total: progress.append((done, total)))
+
+    assert list(parallel) == list(serial) == list(returns_by_symbol)
+    assert parallel == serial
+    assert progress == [(1, 3), (2, 3), (3, 3)]
+
+
+def test_fits_are_warm_started_from_the_stored_params(returns_by_symbol, tmp_path, monkeypatch):
+    monkeypatch.setattr(processing, 'garch_params_file', str(tmp_path / 'garch_params.json'))
+    returns_by_symbol = {'S0': returns_by_symbol['S0']}
+
+    cold = processing.forecast_garch_volatilities(returns_by_symbol, kind='returns')
+    stored = processing.load_garch_params()
+    assert sorted(stored) == ['S0|1|1|returns', 'S0|1|2|returns', 'S0|2|1|returns', 'S0|2|2|returns']
+
+    starts = {}
+    fit_garch = processing.fit_garch
+
+    def recording_fit(returns, p, q, starting_values=None):
+        starts[(p, q)] = starting_values
+        return fit_garch(returns, p, q, starting_values)
+
+    monkeypatch.setattr(processing, 'fit_garch', recording_fit)
+    warm = processing.forecast_garch_volatilities(returns_by_symbol, kind='returns')
+
+    assert starts == {(p, q): stored[f'S0|{p}|{q}|returns'] for p in (1, 2) for q in (1, 2)}
+    assert warm['S0'] == pytest.approx(cold['S0'], abs=1e-4)
+
+    # Other kinds of series are not started from these params
+    starts.clear()
+    processing.forecast_garch_volatilities(returns_by_symbol, kind='downside')
+    assert set(starts.values()) == {None}
+
+
+def test_fit_garch_ignores_starting_values_of_another_model(returns_by_symbol):
+    returns = returns_by_symbol['S1']
+
+    res = processing.fit_garch(returns, 1, 1, starting_values=[0.05, 0.02, 0.1])
+
+    assert res.convergence_flag == 0
+    assert res.params.tolist() == pytest.approx(processing.fit_garch(returns, 1, 1).params.tolist())
@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+from utils import incremental
+
+
+@pytest.fixture
+def previous_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(incremental, 'data_dir', str(tmp_path))
+    df = pd.DataFrame({
+        'Name': ['Current', 'Stale', 'Undated'],
+        'Yield to Maturity': [0.04, 0.05, 0.06],
+        'As of': ['05-31-2024', '03-28-2024', None],
+    }, index=pd.Index(['CUR', 'OLD', 'UND'], name='Ticker'))
+    df.to_csv(tmp_path / 'vanguard.csv')
+    return df
+
+
+@pytest.mark.parametrize('as_of, frequency, today, current', [
+    ('06-14-2024', 'daily', '2024-06-17', True),
+    ('06-13-2024', 'daily', '2024-06-17', False),
+    ('05-31-2024', 'monthly', '2024-06-20', True),
+    ('04-30-2024', 'monthly', '2024-06-20', False),
+    ('03-31-2024', 'quarterly', '2024-06-20', True),
+    ('12-29-2023', 'quarterly', '2024-06-20', False),
+    ('not a date', 'daily', '2024-06-17', False),
+])
+def test_is_current(as_of, frequency, today, current):
+    assert incremental.is_current(as_of, frequency, today) == current
+
+
+def test_plan_refresh_fetches_stale_undated_and_new_funds(previous_run):
+    links = [f'https://example.com/{ticker.lower()}' for ticker in ['CUR', 'OLD', 'UND', 'NEW']]
+
+    to_fetch, previous = incremental.plan_refresh('vanguard', links, lambda link: link.rsplit('/', 1)[-1].upper(),
+                                                  today='2024-06-20')
+
+    assert to_fetch == links[1:]
+    assert list(previous.index) == ['CUR']
+
+
+def test_plan_refresh_without_previous_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(incremental, 'data_dir', str(tmp_path))
+
+    to_fetch, previous = incremental.plan_refresh('vanguard', ['BND'])
+
+    assert to_fetch == ['BND'] and previous.empty
+
+
+def test_merge_previous_prefers_the_fresh_rows(previous_run):
+    fresh = pd.DataFrame({'Name': ['Stale, refetched'], 'Yield to Maturity': [0.045], 'As of': ['05-31-2024']},
+                         index=pd.Index(['OLD'], name='Ticker'))
+
+    merged = incremental.merge_previous(fresh, previous_run)
+
+    assert list(merged.index) == ['OLD', 'CUR', 'UND']
+    assert merged.loc['OLD', 'Name'] == 'Stale, refetched'
+
+
+def test_merge_previous_with_nothing_to_merge(previous_run):
+    fresh = previous_run.iloc[:1]
+    assert incremental.merge_previous(fresh, None) is fresh
+    assert incremental.merge_previous(fresh, previous_run.iloc[0:0]) is fresh
+    pd.testing.assert_frame_equal(incremental.merge_previous(previous_run.iloc[0:0], previous_run), previous_run)
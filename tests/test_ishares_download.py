@@ -0,0 +1,90 @@
+import os
+import json
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+import pytest
+from bots import ishares
+from utils import network
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+workbook = open(os.path.join(project_root, 'data', 'downloads', 'ishares.xml'), 'rb').read()
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith('/export'):
+            body, content_type = workbook, 'application/vnd.ms-excel'
+        else:
+            body, content_type = b'<html>Access denied</html>', 'text/html'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(network, 'endpoints_file', str(tmp_path / 'endpoints.json'))
+    monkeypatch.setattr(ishares, 'filepath', str(tmp_path / 'ishares.xml'))
+    return tmp_path
+
+
+class FakeDriver:
+    def __init__(self, events):
+        self.events = events
+
+    def get_log(self, name):
+        events, self.events = self.events, []
+        return [{'message': json.dumps({'message': event})} for event in events]
+
+
+def response_event(url, mime_type, headers=None):
+    return {'method': 'Network.responseReceived',
+            'params': {'requestId': '1', 'response': {'url': url, 'mimeType': mime_type, 'headers': headers or {}}}}
+
+
+def test_captured_download_urls():
+    driver = FakeDriver([
+        response_event('https://www.ishares.com/page', 'text/html'),
+        response_event('https://www.ishares.com/api.json', 'application/json'),
+        response_event('https://www.ishares.com/export?a=1', 'application/vnd.ms-excel'),
+        response_event('https://www.ishares.com/file', 'text/plain', {'Content-Disposition': 'attachment; x.xls'}),
+        {'method': 'Page.downloadWillBegin', 'params': {'url': 'https://www.ishares.com/export?a=1'}},
+        {'method': 'Page.downloadWillBegin', 'params': {'url': 'blob:https://www.ishares.com/123'}},
+    ])
+    assert network.captured_download_urls(driver) == ['https://www.ishares.com/export?a=1',
+                                                      'https://www.ishares.com/file']
+    assert network.captured_download_urls(driver) == []
+
+
+def test_export_endpoint_round_trip(server, paths):
+    with pytest.raises(KeyError):
+        ishares.download_direct()
+
+    # An error page is not recorded, the export that plain HTTP can download is
+    url = ishares.record_export_endpoint([f'{server}/export?fund=all', f'{server}/blocked'])
+    assert url == f'{server}/export?fund=all'
+    assert network.get_endpoint('ishares', 'screener_export') == url
+
+    os.remove(ishares.filepath)
+    assert ishares.download_direct() == ishares.filepath
+    assert open(ishares.filepath, 'rb').read() == workbook
+
+
+def test_unusable_endpoint_is_not_recorded(server, paths):
+    assert ishares.record_export_endpoint([f'{server}/blocked']) is None
+    assert network.get_endpoint('ishares', 'screener_export') is None
+    assert not os.path.exists(ishares.filepath)
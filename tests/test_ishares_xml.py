@@ -0,0 +1,55 @@
+import os
+import xml.etree.ElementTree as ET
+import pandas as pd
+import pytest
+from bots import ishares
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+workbook = os.path.join(project_root, 'data', 'downloads', 'ishares.xml')
+
+
+def tree_rows(path):
+    # All rows of the workbook, read with the whole tree in memory
+    root = ET.parse(path).getroot()
+    return [[data.text for data in row.iter(ishares.spreadsheet_ns + 'Data')]
+            for row in root.iter(ishares.spreadsheet_ns + 'Row')]
+
+
+def tree_xml_to_df(path):
+    # The tree-based conversion xml_to_df replaced, kept as the reference
+    df = pd.DataFrame(tree_rows(path))
+    main_columns = df.loc[0][pd.notnull(df.loc[0])][:16]
+    sub_columns = df.loc[1][pd.notnull(df.loc[1])]
+    df.columns = list(pd.concat([main_columns, sub_columns]))
+    df = df.loc[2:]
+    df = df.loc[:df[df.isnull().all(axis=1)].index[0] - 1]
+    df = df[ishares.xml_columns]
+
+    df.set_index('Ticker', inplace=True)
+    df['Net Expense Ratio (%)'] = pd.to_numeric(df['Net Expense Ratio (%)'], errors='coerce') / 100.0
+    df['Net Assets (USD)'] = df['Net Assets (USD)'].astype(float).round(2)
+    df['Duration (yrs)'] = pd.to_numeric(df['Duration (yrs)'], errors='coerce').round(2)
+    df['Avg. Yield (%)'] = pd.to_numeric(df['Avg. Yield (%)'], errors='coerce') / 100.0
+    df['Avg. Yield as of Date'] = pd.to_datetime(df['Avg. Yield as of Date'])
+    df['Avg. Yield as of Date'] = df['Avg. Yield as of Date'].dt.strftime('%m-%d-%Y')
+    return df
+
+
+@pytest.fixture
+def downloaded(monkeypatch):
+    monkeypatch.setattr(ishares, 'filepath', workbook)
+
+
+def test_iter_xml_rows_reads_the_first_table():
+    rows = list(ishares.iter_xml_rows(workbook))
+
+    assert rows == tree_rows(workbook)[:len(rows)]
+    assert rows[0][0] == 'Ticker'
+    assert any(all(value is None for value in row) for row in rows)
+
+
+def test_xml_to_df_matches_the_tree_conversion(downloaded):
+    df = ishares.xml_to_df()
+
+    assert df.shape == (125, 12)
+    pd.testing.assert_frame_equal(df, tree_xml_to_df(workbook))
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import threading
+from contextlib import contextmanager
+from http.server import HTTPServer, BaseHTTPRequestHandler
+import pandas as pd
+import pytest
+from bots import jpmorgan, vanguard
+from utils import network
+
+funds = {
+    'BND': {'name': 'Total Bond Market ETF', 'ytm': '4.61%', 'asOfDate': '2024-05-31T00:00:00'},
+    'VGSH': {'name': 'Short-Term Treasury ETF', 'ytm': '5.02%', 'asOfDate': '2024-05-31T00:00:00'},
+}
+
+
+def detail_body(ticker):
+    fund = funds[ticker]
+    return {'profile': {'ticker': ticker, 'longName': fund['name']},
+            'characteristics': {'asOfDate': fund['asOfDate'], 'yieldToMaturity': fund['ytm'].rstrip('%'),
+                                'holdings': 10000}}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        ticker = self.path.rsplit('/', 1)[-1].upper()
+        if ticker not in funds:
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = json.dumps(detail_body(ticker)).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+
+
+@pytest.fixture
+def endpoints(tmp_path, monkeypatch):
+    monkeypatch.setattr(network, 'endpoints_file', str(tmp_path / 'endpoints.json'))
+
+
+def scraped():
+    df = pd.DataFrame.from_dict({
+        ticker: {'Name': fund['name'], 'Yield to Maturity': float(fund['ytm'].rstrip('%')) / 100.0,
+                 'As of': '05-31-2024'}
+        for ticker, fund in funds.items()
+    }, orient='index')
+    df.index.name = 'Ticker'
+    return df
+
+
+def captured(base):
+    return [{'url': f'{base}/profile/{ticker.lower()}', 'body': detail_body(ticker)} for ticker in funds]
+
+
+def test_endpoint_url():
+    assert network.endpoint_url('https://x/{ticker_lower}?t={ticker}', ticker='BND') == 'https://x/bnd?t=BND'
+
+
+def test_discover_and_read_fields(endpoints):
+    network.discover_fund_endpoints('vanguard', [], captured('https://api'), scraped(), vanguard.endpoint_columns)
+
+    assert network.get_endpoint('vanguard', 'fund_detail') == 'https://api/profile/{ticker_lower}'
+    fields = network.get_endpoint('vanguard', 'fund_detail_fields')
+    assert fields == {
+        'Name': {'path': ['profile', 'longName'], 'kind': 'text'},
+        'Yield to Maturity': {'path': ['characteristics', 'yieldToMaturity'], 'kind': 'percent'},
+        'As of': {'path': ['characteristics', 'asOfDate'], 'kind': 'date'},
+    }
+    row = network.read_fields(detail_body('VGSH'), fields)
+    assert row == pytest.approx({'Name': 'Short-Term Treasury ETF', 'Yield to Maturity': 0.0502, 'As of': '05-31-2024'})
+
+
+def test_fields_not_stored_when_a_column_is_missing(endpoints):
+    df = scraped().assign(**{'As of': '06-28-2024'})
+    network.discover_fund_endpoints('vanguard', [], captured('https://api'), df, vanguard.endpoint_columns)
+
+    assert network.get_endpoint('vanguard', 'fund_detail') is not None
+    assert network.get_endpoint('vanguard', 'fund_detail_fields') is None
+
+
+def test_query_yield_data_round_trip(server, endpoints):
+    network.discover_fund_endpoints('vanguard', [], captured(server), scraped(), vanguard.endpoint_columns)
+
+    data = vanguard.query_yield_data(['VGSH', 'BND'])
+
+    expected = scraped().to_dict(orient='index')
+    assert list(data) == ['VGSH', 'BND']
+    for ticker, row in data.items():
+        assert row == pytest.approx(expected[ticker])
+
+
+def test_query_yield_data_without_endpoint(endpoints):
+    with pytest.raises(KeyError):
+        vanguard.query_yield_data(['BND'])
+
+
+def test_query_yield_data_failed_request(server, endpoints):
+    network.discover_fund_endpoints('vanguard', [], captured(server), scraped(), vanguard.endpoint_columns)
+
+    with pytest.raises(ValueError):
+        vanguard.query_yield_data(['BND', 'GONE'])
+
+
+def test_fields_not_stored_for_a_shared_url(endpoints):
+    responses = [{'url': 'https://api/profile', 'body': detail_body(ticker)} for ticker in funds]
+    network.discover_fund_endpoints('vanguard', [], responses, scraped(), vanguard.endpoint_columns)
+
+    assert network.get_endpoint('vanguard', 'fund_detail') == 'https://api/profile'
+    assert network.get_endpoint('vanguard', 'fund_detail_fields') is None
+
+
+def test_jpmorgan_query_round_trip(server, endpoints):
+    df = scraped().rename(columns={'As of': 'As of Date'})
+    network.discover_fund_endpoints('jpmorgan', [], captured(server), df, jpmorgan.endpoint_columns)
+
+    queried = jpmorgan.query_etf_data(list(df.index))
+
+    pd.testing.assert_frame_equal(queried[df.columns], df)
+
+
+def test_fetch_json(server, monkeypatch):
+    hosts = []
+    monkeypatch.setattr('utils.http_client.acquire_async', lambda url: hosts.append(url) or asyncio.sleep(0))
+
+    assert network.fetch_json(f'{server}/profile/bnd') == detail_body('BND')
+    assert hosts == [f'{server}/profile/bnd']
+    with pytest.raises(ValueError):
+        network.fetch_json(f'{server}/profile/gone', retries=0)
+
+
+def test_download_file_waits_for_the_rate_limit(server, tmp_path, monkeypatch):
+    hosts = []
+    monkeypatch.setattr(network, 'acquire', hosts.append)
+
+    path = network.download_file(f'{server}/profile/bnd', str(tmp_path / 'bnd.json'))
+
+    assert json.loads(open(path).read()) == detail_body('BND')
+    assert hosts == [f'{server}/profile/bnd']
+
+
+class Scraped(Exception):
+    pass
+
+
+def test_bot_falls_back_to_the_browser(endpoints, monkeypatch):
+    calls = []
+
+    @contextmanager
+    def leased_driver(headless, lean, capture_network):
+        calls.append(capture_network)
+        raise Scraped()
+        yield
+
+    monkeypatch.setattr(vanguard, 'load_previous', lambda issuer: scraped())
+    monkeypatch.setattr(vanguard, 'leased_driver', leased_driver)
+
+    with pytest.raises(Scraped):
+        vanguard.vanguard_bot(method='endpoint')
+    assert calls == [True]
+
+
+def test_responses_are_only_collected_with_one_tab():
+    with pytest.raises(ValueError):
+        vanguard.get_yield_data(None, ['https://investor.vanguard.com/bnd'], tabs=2, responses=[])
+
+
+def test_bot_loads_one_tab_while_capturing(monkeypatch):
+    calls = []
+
+    @contextmanager
+    def leased_driver(headless, lean, capture_network):
+        yield None
+
+    def get_yield_data(driver, links, tabs, responses):
+        calls.append((tabs, responses))
+        raise Scraped()
+
+    monkeypatch.setattr(vanguard, 'leased_driver', leased_driver)
+    monkeypatch.setattr(vanguard, 'navigate_to_page', lambda driver, url: None)
+    monkeypatch.setattr(vanguard, 'get_links', lambda driver: ['https://investor.vanguard.com/bnd'])
+    monkeypatch.setattr(vanguard, 'captured_json_responses', lambda driver: [])
+    monkeypatch.setattr(vanguard, 'get_yield_data', get_yield_data)
+
+    with pytest.raises(Scraped):
+        vanguard.vanguard_bot(tabs=4)
+    with pytest.raises(Scraped):
+        vanguard.vanguard_bot(capture_network=True, tabs=4)
+    assert calls == [(4, None), (1, [])]
@@ -0,0 +1,66 @@
+import pytest
+from utils import parsing
+
+page = """
+<html><head><title>Fund</title><script>var tracking = 1;</script></head>
+<body>
+  <nav><a href="/">Home</a></nav>
+  <h1 id="fund-name">Total Bond ETF</h1>
+  <div class="stats box">
+    <table>
+      <tr><th>Characteristic</th><th>Value</th></tr>
+      <tr><td> Yield to Maturity </td><td> 4.61% </td></tr>
+      <tr><td>As of</td><td>05/31/2024</td></tr>
+      <tr><td>Footnote</td></tr>
+    </table>
+  </div>
+  <table id="holdings"><tr><td>US Treasury</td><td>40%</td></tr></table>
+</body></html>
+"""
+
+
+@pytest.fixture(params=['html.parser', 'lxml'])
+def parser(request, monkeypatch):
+    if request.param == 'lxml' and parsing.lxml is None:
+        pytest.skip('lxml is not installed')
+    monkeypatch.setattr(parsing, 'html_parser', request.param)
+    return request.param
+
+
+def test_only_the_matching_elements_are_built(parser):
+    soup = parsing.parse_html(page, ids=['fund-name'], classes=['stats'])
+
+    assert soup.find('h1', id='fund-name').get_text() == 'Total Bond ETF'
+    assert soup.find('div', class_='stats') is not None
+    assert soup.find('nav') is None and soup.find('script') is None
+    assert soup.find('table', id='holdings') is None
+
+
+def test_elements_by_tag_name(parser):
+    tables = parsing.parse_html(page, names=['table']).find_all('table')
+
+    assert [table.get('id') for table in tables] == [None, 'holdings']
+
+
+def test_whole_page_without_filters(parser):
+    soup = parsing.parse_html(page)
+
+    assert soup.title.get_text() == 'Fund' and soup.find('nav') is not None
+
+
+def test_table_pairs(parser):
+    table = parsing.parse_html(page, classes=['stats']).find('table')
+
+    assert parsing.table_pairs(table) == {'Yield to Maturity': '4.61%', 'As of': '05/31/2024'}
+
+
+@pytest.mark.parametrize('name, attrs, matches', [
+    ('h1', {'id': 'fund-name'}, True),
+    ('div', {'class': ['box', 'stats']}, True),
+    ('div', {'class': 'box stats'}, True),
+    ('div', {'class': 'box'}, False),
+    ('table', None, True),
+    ('nav', {}, False),
+])
+def test_element_matches(name, attrs, matches):
+    assert parsing.element_matches(name, attrs, ['fund-name'], ['stats'], ['table']) == matches
@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+from utils import price_cache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(price_cache, 'prices_dir', str(tmp_path))
+    monkeypatch.setattr(price_cache, 'index_file', str(tmp_path / 'index.json'))
+    monkeypatch.delenv('YIELDQUERY_OFFLINE', raising=False)
+
+
+class FakeYahoo:
+    """Stands in for fetch_closes, serving business day closes up to a date and recording the requests"""
+
+    def __init__(self, until):
+        self.until = pd.Timestamp(until)
+        self.requests = []
+        self.failing = set()
+
+    def __call__(self, tickers, **history_kwargs):
+        self.requests.append((list(tickers), history_kwargs))
+        start = pd.Timestamp(history_kwargs.get('start', self.until - pd.DateOffset(years=3)))
+        dates = pd.bdate_range(start, self.until, name='date')
+        return {ticker: pd.Series(range(len(dates)), index=dates, dtype='float64')
+                for ticker in tickers if ticker not in self.failing}
+
+
+@pytest.fixture
+def yahoo(cache, monkeypatch):
+    fake = FakeYahoo('2024-03-05')
+    monkeypatch.setattr(price_cache, 'fetch_closes', fake)
+    return fake
+
+
+def test_period_start():
+    assert price_cache.period_start('max') is None
+    assert price_cache.period_start('3y', '2024-03-05') == pd.Timestamp('2021-03-05')
+    assert price_cache.period_start('6mo', '2024-03-05') == pd.Timestamp('2023-09-05')
+    assert price_cache.period_start('ytd', '2024-03-05') == pd.Timestamp('2024-01-01')
+
+
+def test_fresh_tickers_are_not_requested(yahoo):
+    now = pd.Timestamp('2024-03-05 18:00')
+    first = price_cache.get_closes(['AGG', 'BND'], now=now)
+    assert len(yahoo.requests) == 1
+    assert set(first.index.get_level_values('symbol')) == {'AGG', 'BND'}
+
+    second = price_cache.get_closes(['AGG', 'BND'], now=now + pd.Timedelta(hours=1))
+    assert len(yahoo.requests) == 1
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_stale_tickers_fetch_from_their_last_bar(yahoo):
+    price_cache.get_closes(['AGG'], now=pd.Timestamp('2024-03-05 18:00'))
+    yahoo.until = pd.Timestamp('2024-03-07')
+    closes = price_cache.get_closes(['AGG'], now=pd.Timestamp('2024-03-07 18:00'))
+    assert yahoo.requests[-1] == (['AGG'], {'start': '2024-03-05'})
+    assert closes.index.get_level_values('date')[-1] == pd.Timestamp('2024-03-07')
+    assert closes.index.get_level_values('date').is_unique
+
+
+def test_failed_download_is_not_marked_fresh(yahoo):
+    yahoo.failing = {'BND'}
+    now = pd.Timestamp('2024-03-05 18:00')
+    closes = price_cache.get_closes(['AGG', 'BND'], now=now)
+    assert set(closes.index.get_level_values('symbol')) == {'AGG'}
+    assert 'BND' not in price_cache.load_index()
+
+    # The failed ticker is asked for again on the next call, the fresh one is not
+    yahoo.failing = set()
+    closes = price_cache.get_closes(['AGG', 'BND'], now=now + pd.Timedelta(hours=1))
+    assert yahoo.requests[-1][0] == ['BND']
+    assert set(closes.index.get_level_values('symbol')) == {'AGG', 'BND'}
+
+
+def test_failed_refresh_keeps_the_ticker_stale(yahoo):
+    price_cache.get_closes(['AGG'], now=pd.Timestamp('2024-03-05 18:00'))
+    checked = price_cache.load_index()['AGG']['checked']
+    yahoo.failing = {'AGG'}
+    closes = price_cache.get_closes(['AGG'], now=pd.Timestamp('2024-03-07 18:00'))
+    assert price_cache.load_index()['AGG']['checked'] == checked
+    assert not closes.empty
+
+    price_cache.get_closes(['AGG'], now=pd.Timestamp('2024-03-07 19:00'))
+    assert len(yahoo.requests) == 3
+
+
+def test_offline_serves_the_cache_only(yahoo):
+    price_cache.get_closes(['AGG'], now=pd.Timestamp('2024-03-05 18:00'))
+    closes = price_cache.get_closes(['AGG', 'BND'], offline=True, now=pd.Timestamp('2024-04-05 18:00'))
+    assert len(yahoo.requests) == 1
+    assert set(closes.index.get_level_values('symbol')) == {'AGG'}
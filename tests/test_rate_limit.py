@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from utils import rate_limit
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, 'monotonic', clock)
+    return clock
+
+
+def test_burst_then_one_token_per_interval(clock):
+    bucket = rate_limit.TokenBucket(rate=2.0, burst=3)
+
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Callers that find the bucket empty queue up behind each other
+    assert [bucket.reserve() for _ in range(3)] == [0.5, 1.0, 1.5]
+
+    clock.now += 2.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.5
+
+
+def test_tokens_refill_up_to_burst(clock):
+    bucket = rate_limit.TokenBucket(rate=1.0, burst=2)
+    bucket.reserve()
+    bucket.reserve()
+
+    clock.now += 60
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 1.0]
+
+
+def test_acquire_waits_for_the_token(clock, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(rate_limit.time, 'sleep', sleeps.append)
+
+    async def sleep(delay):
+        sleeps.append(delay)
+    monkeypatch.setattr(rate_limit.asyncio, 'sleep', sleep)
+
+    bucket = rate_limit.TokenBucket(rate=4.0, burst=1)
+    bucket.acquire()
+    bucket.acquire()
+    asyncio.run(bucket.acquire_async())
+
+    assert sleeps == [0.25, 0.5]
+
+
+def test_set_rate_limit_caps_the_saved_tokens(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, '_buckets', {})
+    monkeypatch.setattr(rate_limit, 'rate_limits', {})
+    bucket = rate_limit.get_bucket('example.com')
+    assert (bucket.rate, bucket.burst) == rate_limit.default_rate_limit
+
+    rate_limit.set_rate_limit('example.com', 1.0, 1)
+
+    assert rate_limit.get_bucket('example.com') is bucket
+    assert [bucket.reserve(), bucket.reserve()] == [0.0, 1.0]
+
+
+def test_host_of():
+    assert rate_limit.host_of('vanguard') == 'investor.vanguard.com'
+    assert rate_limit.host_of('https://www.ssga.com/us/en/etfs?x=1') == 'www.ssga.com'
+    assert rate_limit.host_of('example.com') == 'example.com'
@@ -0,0 +1,98 @@
+import json
+import pandas as pd
+import pytest
+from utils import processing
+
+
+@pytest.fixture(autouse=True)
+def rates_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(processing, 'reference_rates_file', str(tmp_path / 'reference_rates.json'))
+    monkeypatch.setattr(processing, '_reference_rates', {})
+    monkeypatch.delenv('YIELDQUERY_OFFLINE', raising=False)
+    return tmp_path / 'reference_rates.json'
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    calls = []
+
+    def fetch_reference_rates(tickers=processing.reference_rates):
+        calls.append(tickers)
+        rates = {ticker: (0.05, ticker) for ticker in tickers}
+        processing.store_reference_rates(rates)
+        return rates
+
+    monkeypatch.setattr(processing, 'fetch_reference_rates', fetch_reference_rates)
+    return calls
+
+
+def closes(symbols):
+    dates = pd.to_datetime(['2024-05-30', '2024-05-31'])
+    index = pd.MultiIndex.from_product([symbols, dates], names=['symbol', 'date'])
+    return pd.DataFrame({'close': [4.5, 4.6] * len(symbols)}, index=index)
+
+
+def test_cached_close_keeps_the_time_it_was_checked(monkeypatch, fetches):
+    checked = '2024-05-31T22:00:00'
+    monkeypatch.setattr(processing, 'get_closes', lambda tickers, period, offline: closes(tickers))
+    monkeypatch.setattr(processing, 'load_index', lambda: {'^TNX': {'checked': checked}})
+
+    stock_data = processing.download_stock_data(['BND'], with_reference_rates=True)
+
+    assert set(stock_data.index.get_level_values('symbol')) == {'BND'}
+    cached = processing.load_reference_rates()
+    assert cached['^TNX'] == {'rate': 0.046, 'name': processing.reference_rate_names['^TNX'], 'fetched': checked}
+    # Without an index entry the close is as old as its last bar
+    assert cached['^IRX']['fetched'] == '2024-05-31T00:00:00'
+
+    # An old close is not served as fresh
+    assert processing.get_risk_free_rate() == (0.05, '^TNX')
+    assert len(fetches) == 1
+
+
+def test_later_fetch_is_kept(rates_file):
+    processing.store_reference_rates({'^TNX': (0.05, 'Fetched')}, pd.Timestamp('2024-06-01'))
+    processing.store_reference_rates({'^TNX': (0.046, 'Cached')}, {'^TNX': pd.Timestamp('2024-05-31')})
+
+    assert json.loads(rates_file.read_text())['^TNX']['name'] == 'Fetched'
+
+
+def test_offline_mode_stores_nothing_and_serves_the_stale_rate(monkeypatch, rates_file, fetches):
+    monkeypatch.setenv('YIELDQUERY_OFFLINE', '1')
+    monkeypatch.setattr(processing, 'get_closes', lambda tickers, period, offline: closes(tickers))
+
+    processing.download_stock_data(['BND'], with_reference_rates=True)
+    assert not rates_file.exists()
+
+    with pytest.raises(KeyError):
+        processing.get_risk_free_rate()
+
+    processing.store_reference_rates({'^TNX': (0.046, 'Treasury Yield 10 Years')}, pd.Timestamp('2020-01-01'))
+    assert processing.get_risk_free_rate() == (0.046, 'Treasury Yield 10 Years')
+    assert fetches == []
+
+
+def test_fresh_rate_is_served_from_the_cache(monkeypatch, fetches):
+    processing.store_reference_rates({'^TNX': (0.046, 'Treasury Yield 10 Years')})
+
+    assert processing.get_risk_free_rate() == (0.046, 'Treasury Yield 10 Years')
+
+    # Served from disk in the next process
+    monkeypatch.setattr(processing, '_reference_rates', {})
+    assert processing.get_risk_free_rate() == (0.046, 'Treasury Yield 10 Years')
+    assert fetches == []
+
+
+def test_stale_rate_is_fetched_again_with_the_other_reference_rates(fetches):
+    processing.store_reference_rates({'^TNX': (0.046, 'Treasury Yield 10 Years')},
+                                     pd.Timestamp.now() - pd.Timedelta(hours=2))
+
+    assert processing.get_risk_free_rate(ttl=pd.Timedelta(hours=3)) == (0.046, 'Treasury Yield 10 Years')
+    assert fetches == []
+
+    assert processing.get_risk_free_rate() == (0.05, '^TNX')
+    assert fetches == [processing.reference_rates]
+
+    assert processing.get_risk_free_rate('^IRX') == (0.05, '^IRX')
+    assert processing.get_risk_free_rate('^TYX') == (0.05, '^TYX')
+    assert fetches == [processing.reference_rates, processing.reference_rates + ('^TYX',)]
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils import processing
+
+
+@pytest.fixture
+def stock_data():
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range('2024-01-01', periods=60)
+    frames = []
+    for symbol, start, stop in [('BND', 0, 60), ('VGSH', 5, 60), ('NEW', 40, 60), ('GONE', 0, 30)]:
+        close = pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.01, stop - start))), index=dates[start:stop])
+        frames.append(pd.DataFrame({'symbol': symbol, 'date': close.index, 'close': close.values}))
+    df = pd.concat(frames).set_index(['symbol', 'date'])
+
+    # A missing bar, a bar without a close and a leading bar without a close
+    df = df.drop(('BND', dates[10]))
+    df.loc[('BND', dates[20]), 'close'] = np.nan
+    df.loc[('VGSH', dates[5]), 'close'] = np.nan
+    return df
+
+
+def baseline_returns(stock_data):
+    # The per-symbol returns before vectorizing, pct_change forward-filling the closes as in pandas 1.x
+    return {symbol: stock_data.loc[symbol]['close'].ffill().pct_change(fill_method=None).dropna()
+            for symbol in stock_data.index.get_level_values('symbol').unique()}
+
+
+def test_returns_match_the_per_symbol_returns(stock_data):
+    returns = processing.split_returns(processing.get_returns(stock_data))
+
+    expected = baseline_returns(stock_data)
+    assert list(returns) == sorted(expected)
+    for symbol, series in expected.items():
+        pd.testing.assert_series_equal(returns[symbol], series * 100, check_names=False, check_freq=False)
+    assert returns['BND'].loc[stock_data.index.levels[1][20]] == 0
+
+
+def test_standard_deviation_matches_the_per_symbol_returns(stock_data):
+    std_devs = processing.get_standard_deviation(stock_data)['Historical Volatility']
+
+    for symbol, series in baseline_returns(stock_data).items():
+        assert std_devs[symbol] == round(series.std() * np.sqrt(252), 4)
+
+
+def test_close_matrix_normalizes_session_timestamps(stock_data):
+    last = stock_data.xs('BND', drop_level=False).iloc[[-1]]
+    session = pd.Timestamp(last.index[0][1].date(), tz='America/New_York') + pd.Timedelta(hours=15)
+    mixed = pd.concat([stock_data, last.set_axis(pd.MultiIndex.from_tuples([('BND', session)],
+                                                                             names=['symbol', 'date']))])
+    mixed.loc[('BND', session), 'close'] = 1.0
+
+    closes = processing.get_close_matrix(mixed)
+
+    assert isinstance(closes.index, pd.DatetimeIndex)
+    assert closes['BND'].iloc[-1] == 1.0
+    assert closes.index.is_unique
@@ -0,0 +1,74 @@
+import os
+import pandas as pd
+import pytest
+from utils import storage
+
+
+@pytest.fixture
+def snapshot():
+    df = pd.DataFrame({
+        'Name': ['Total Bond Market ETF', 'Short-Term Treasury ETF'],
+        'Yield to Maturity': [0.0461, '5.02'],
+        'As of': ['05-31-2024', '05-31-2024'],
+    }, index=pd.Index(['BND', 'VGSH'], name='Ticker'))
+    return df
+
+
+def touch(path, mtime):
+    os.utime(path, (mtime, mtime))
+
+
+def test_round_trip_is_typed(snapshot, tmp_path):
+    csv_path = str(tmp_path / 'vanguard.csv')
+    typed = storage.save_snapshot(snapshot, csv_path)
+
+    assert typed['Yield to Maturity'].dtype == float
+    assert pd.api.types.is_datetime64_any_dtype(typed['As of'])
+    pd.testing.assert_frame_equal(storage.load_snapshot(csv_path), typed)
+    with open(csv_path) as f:
+        assert '05-31-2024' in f.read()
+
+
+def test_newer_parquet_is_preferred(snapshot, tmp_path, monkeypatch):
+    csv_path = str(tmp_path / 'vanguard.csv')
+    storage.save_snapshot(snapshot, csv_path)
+    touch(csv_path, 1_000_000)
+    touch(storage.snapshot_path(csv_path), 1_000_000)
+
+    monkeypatch.setattr(pd, 'read_csv', None)
+    assert list(storage.load_snapshot(csv_path).index) == ['BND', 'VGSH']
+
+
+def test_csv_edited_after_the_snapshot_is_preferred(snapshot, tmp_path):
+    csv_path = str(tmp_path / 'vanguard.csv')
+    storage.save_snapshot(snapshot, csv_path)
+    edited = pd.read_csv(csv_path, index_col=0)
+    edited.loc['BND', 'Name'] = 'Edited by hand'
+    edited.to_csv(csv_path)
+    touch(storage.snapshot_path(csv_path), 1_000_000)
+
+    df = storage.load_snapshot(csv_path)
+
+    assert df.loc['BND', 'Name'] == 'Edited by hand'
+    assert pd.api.types.is_datetime64_any_dtype(df['As of'])
+
+
+def test_csv_without_snapshot(snapshot, tmp_path):
+    csv_path = str(tmp_path / 'vanguard.csv')
+    storage.save_snapshot(snapshot, csv_path)
+    os.remove(storage.snapshot_path(csv_path))
+
+    pd.testing.assert_frame_equal(storage.load_snapshot(csv_path), storage.to_typed(snapshot))
+
+
+@pytest.mark.parametrize('parquet', [True, False])
+def test_only_the_requested_columns_are_loaded(snapshot, tmp_path, parquet):
+    csv_path = str(tmp_path / 'vanguard.csv')
+    storage.save_snapshot(snapshot, csv_path)
+    if not parquet:
+        os.remove(storage.snapshot_path(csv_path))
+
+    df = storage.load_snapshot(csv_path, columns=['Yield to Maturity', 'Distribution Yield'])
+
+    assert list(df.columns) == ['Yield to Maturity']
+    assert df.index.name == 'Ticker'
@@ -0,0 +1,76 @@
+import pytest
+from utils import drivers, tabs
+
+
+class SwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.current_window_handle = handle
+
+    def new_window(self, kind):
+        handle = f'tab{len(self.driver.pages)}'
+        self.driver.pages[handle] = None
+        self.driver.current_window_handle = handle
+
+
+class FakeBrowser:
+    """Loads a page the moment it is navigated to, in the current tab"""
+
+    def __init__(self, lean=False):
+        self.lean = lean
+        self.pages = {'tab0': None}
+        self.current_window_handle = 'tab0'
+        self.switch_to = SwitchTo(self)
+        self.blocked = set()
+        self.quit_called = False
+
+    def execute_script(self, script, *args):
+        if script == tabs._navigate_script:
+            self.pages[self.current_window_handle] = args[0]
+            return None
+        return self.pages[self.current_window_handle] is not None
+
+    def execute_cdp_cmd(self, command, params):
+        if command == 'Network.setBlockedURLs':
+            self.blocked.add(self.current_window_handle)
+
+    def close(self):
+        del self.pages[self.current_window_handle]
+
+    def get(self, url):
+        self.pages[self.current_window_handle] = url
+
+    def quit(self):
+        self.quit_called = True
+
+
+def harvest(driver, urls, n):
+    return tabs.harvest_tabs(driver, urls, '#ready', lambda driver, url: url.upper(), tabs=n, poll_frequency=0,
+                             progress=False)
+
+
+@pytest.mark.parametrize('lean', [True, False])
+def test_new_tabs_block_resources_when_lean(lean):
+    driver = FakeBrowser(lean)
+    if lean:
+        drivers.block_resources(driver)
+
+    assert harvest(driver, ['a', 'b', 'c'], 3) == ['A', 'B', 'C']
+    assert driver.blocked == ({'tab0', 'tab1', 'tab2'} if lean else set())
+    assert list(driver.pages) == ['tab0'] and driver.current_window_handle == 'tab0'
+
+
+def test_tab_loads_count_towards_max_page_loads(monkeypatch):
+    monkeypatch.setattr(drivers, 'setup_driver', lambda headless, lean, capture_network: FakeBrowser(lean))
+    monkeypatch.setattr(drivers, 'reset_driver', lambda driver: None)
+    pool = drivers.DriverPool(size=1, max_page_loads=3)
+
+    with pool.lease() as first:
+        harvest(first, ['a', 'b', 'c'], 2)
+    assert first.page_loads == 3
+
+    with pool.lease() as second:
+        pass
+    assert first.quit_called and second is not first
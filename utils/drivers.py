@@ -1,25 +1,157 @@
+import os
+import re
+import json
+import queue
+import shutil
+import threading
+import subprocess
+from functools import lru_cache
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-def webdriver_path():
+# On-disk record of resolved chromedriver paths, keyed by the installed Chrome version
+driver_cache_file = os.path.join(project_root, 'drivers', 'chromedriver_cache.json')
+
+# Commands that print the installed Chrome version, tried in order
+chrome_version_commands = [
+    ['google-chrome', '--version'],
+    ['google-chrome-stable', '--version'],
+    ['chromium', '--version'],
+    ['chromium-browser', '--version'],
+    ['/Applications/Google Chrome.app/Contents/MacOS/Google Chrome', '--version'],
+    ['reg', 'query', r'HKEY_CURRENT_USER\Software\Google\Chrome\BLBeacon', '/v', 'version'],
+]
+
+# File extensions blocked in lean mode: images, fonts, stylesheets and media
+lean_blocked_extensions = [
+    'png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'ico',
+    'woff', 'woff2', 'ttf', 'otf', 'eot',
+    'css',
+    'mp4', 'webm', 'mp3', 'm3u8',
+]
+
+# Known analytics and tracker domains blocked in lean mode
+lean_blocked_trackers = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*googlesyndication.com*',
+    '*facebook.net*', '*connect.facebook.com*', '*hotjar.com*', '*demdex.net*', '*omtrdc.net*',
+    '*adobedtm.com*', '*everesttech.net*', '*linkedin.com/px*', '*ads.linkedin.com*', '*bat.bing.com*',
+    '*qualtrics.com*', '*nr-data.net*', '*newrelic.com*', '*optimizely.com*', '*segment.io*',
+    '*quantserve.com*', '*scorecardresearch.com*', '*twitter.com/i/adsct*', '*t.co/*',
+]
+
+# In-process cache of resolved chromedriver paths
+_driver_paths = {}
+_driver_paths_lock = threading.Lock()
+
+# Pool used by leased_driver(), installed with set_default_pool()
+_default_pool = None
+
+
+@lru_cache(maxsize=None)
+def chrome_version():
+    """
+    Get the version of the installed Chrome browser. The version is looked up once per process.
+
+    :return: The Chrome version, or None if it can't be determined
+    :rtype: str
+    """
+    for command in chrome_version_commands:
+        try:
+            output = subprocess.run(command, capture_output=True, text=True, timeout=10).stdout
+        except (OSError, subprocess.SubprocessError):
+            continue
+        match = re.search(r'\d+\.\d+\.\d+\.\d+', output)
+        if match:
+            return match.group()
+    return None
+
+
+def _read_driver_cache():
+    """
+    Read the on-disk chromedriver cache
+
+    :return: Chromedriver paths keyed by Chrome version
+    :rtype: dict
+    """
+    try:
+        with open(driver_cache_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_driver_cache(cache):
+    """
+    Write the on-disk chromedriver cache, replacing the file atomically
+
+    :param cache: Chromedriver paths keyed by Chrome version
+    :type cache: dict
+    :return: None
+    :rtype: None
+    """
+    os.makedirs(os.path.dirname(driver_cache_file), exist_ok=True)
+    temp_file = driver_cache_file + '.tmp'
+    with open(temp_file, 'w') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(temp_file, driver_cache_file)
+
+
+def webdriver_path(offline=None):
     """
-    Get the path to the webdriver
+    Get the path to the webdriver. The chromedriver is resolved once per process and per installed Chrome version and
+    remembered on disk, so later runs don't go through ChromeDriverManager at all. In offline mode the network is
+    never used: the cached chromedriver is used, or else the chromedriver on the PATH.
 
+    :param offline: Whether to resolve the webdriver without network access, defaults to the YIELDQUERY_OFFLINE
+        environment variable
+    :type offline: bool, optional
     :return: The path to the webdriver
     :rtype: str
     """
-    return ChromeDriverManager().install()
+    if offline is None:
+        offline = os.environ.get('YIELDQUERY_OFFLINE', '').lower() in ('1', 'true', 'yes')
 
+    with _driver_paths_lock:
+        version = chrome_version() or 'unknown'
+        path = _driver_paths.get(version)
+        if path is not None and os.path.exists(path):
+            return path
 
-def setup_driver(headless=True):
+        cache = _read_driver_cache()
+        path = cache.get(version)
+        if path is None or not os.path.exists(path):
+            if offline:
+                path = shutil.which('chromedriver')
+                if path is None:
+                    raise FileNotFoundError(f'No cached chromedriver for Chrome {version} and none on the PATH. '
+                                            f'Run once with network access or turn off offline mode.')
+            else:
+                path = ChromeDriverManager().install()
+                cache[version] = path
+                _write_driver_cache(cache)
+
+        _driver_paths[version] = path
+        return path
+
+
+def setup_driver(headless=True, lean=False, capture_network=False):
     """
     Set up the webdriver
 
     :param headless: Whether to run the webdriver in headless mode
     :type headless: bool
+    :param lean: Whether to load pages lean: images, fonts, stylesheets, media and known trackers are blocked, the
+        page load returns once the DOM is ready, and extensions and GPU features are disabled
+    :type lean: bool
+    :param capture_network: Whether to record the network traffic in the performance log, see utils.network
+    :type capture_network: bool
     :return: The webdriver
     :rtype: selenium.webdriver.chrome.webdriver.WebDriver
     """
@@ -28,6 +160,20 @@ def setup_driver(headless=True):
         options.add_argument('--headless')
         options.add_argument('--window-size=1920x1080')
 
+    if lean:
+        options.page_load_strategy = 'eager'
+        options.add_argument('--disable-extensions')
+        options.add_argument('--disable-gpu')
+        options.add_argument('--disable-software-rasterizer')
+        options.add_argument('--mute-audio')
+        options.add_argument('--blink-settings=imagesEnabled=false')
+        options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+
+    if capture_network:
+        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        # Page events carry the downloads the browser starts, see utils.network.captured_download_urls
+        options.add_experimental_option('perfLoggingPrefs', {'enableNetwork': True, 'enablePage': True})
+
     # Suppress WebDriver Logs
     options.add_argument('--log-level=3')
 
@@ -37,4 +183,333 @@ def setup_driver(headless=True):
         "Chrome/89.0.4389.82 Safari/537.36")
 
     driver = webdriver.Chrome(service=Service(webdriver_path()), options=options)
+
+    # Blocking applies per tab, so tabs opened later need block_resources too, see utils.tabs.harvest_tabs
+    driver.lean = lean
+    if lean:
+        block_resources(driver)
     return driver
+
+
+def block_resources(driver):
+    """
+    Block the lean mode resource types and tracker domains in the current tab
+
+    :param driver: The webdriver
+    :type driver: selenium.webdriver.chrome.webdriver.WebDriver
+    :return: None
+    :rtype: None
+    """
+    patterns = [pattern for extension in lean_blocked_extensions for pattern in (f'*.{extension}', f'*.{extension}?*')]
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns + lean_blocked_trackers})
+
+
+def reset_driver(driver):
+    """
+    Reset the state of the webdriver so the next user starts from a clean browser. Closes all but the first tab and
+    clears cookies, local storage, session storage and the cache.
+
+    :param driver: The webdriver
+    :type driver: selenium.webdriver.chrome.webdriver.WebDriver
+    :return: None
+    :rtype: None
+    """
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+
+    # Storage is scoped to the current origin, so clear it before leaving the page
+    try:
+        driver.execute_script('window.localStorage.clear(); window.sessionStorage.clear();')
+    except WebDriverException:
+        pass
+    driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+    driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+    driver.get('about:blank')
+
+
+class DriverPool:
+    """
+    A pool of warm Chrome webdrivers. The browsers are launched up front, or on first lease if lazy, and leased out
+    with a context manager, so the bots don't pay the Chrome cold start on every run and retry. Browsers are reset
+    between leases and replaced after a number of page loads.
+
+    :param size: The number of browsers in the pool
+    :type size: int
+    :param headless: Whether to run the browsers in headless mode
+    :type headless: bool
+    :param lean: Whether to run the browsers in lean mode, see setup_driver()
+    :type lean: bool
+    :param capture_network: Whether the browsers record their network traffic, see setup_driver()
+    :type capture_network: bool
+    :param max_page_loads: The number of page loads after which a browser is replaced with a fresh one
+    :type max_page_loads: int
+    :param lease_timeout: Seconds lease() waits for a free browser before setting up a one-off browser instead
+    :type lease_timeout: float
+    :param lazy: Whether to launch the browsers on first lease instead of up front, so a pool sized for the worst case
+        only starts the browsers that are actually used
+    :type lazy: bool
+    """
+
+    def __init__(self, size=1, headless=True, lean=False, capture_network=False, max_page_loads=200,
+                 lease_timeout=300, lazy=False):
+        self.size = size
+        self.headless = headless
+        self.lean = lean
+        self.capture_network = capture_network
+        self.max_page_loads = max_page_loads
+        self.lease_timeout = lease_timeout
+        self.lazy = lazy
+        self._idle = queue.Queue()
+        self._closed = False
+
+        # Pools for the other browser configurations, see for_config()
+        self._siblings = {}
+        self._siblings_lock = threading.Lock()
+
+        # Slots without a browser, not launched yet or failed to launch, launched on a later lease
+        self._missing = 0
+        self._missing_lock = threading.Lock()
+
+        if lazy:
+            self._missing = size
+        else:
+            with ThreadPoolExecutor(max_workers=size) as executor:
+                list(executor.map(lambda _: self._refill(), range(size)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def for_config(self, headless, lean, capture_network):
+        """
+        Get the pool for a browser configuration. This pool is used if it matches, otherwise a lazy pool of the same
+        size is created for the configuration on first use and closed with this pool.
+
+        :param headless: Whether the browsers run in headless mode
+        :type headless: bool
+        :param lean: Whether the browsers run in lean mode, see setup_driver()
+        :type lean: bool
+        :param capture_network: Whether the browsers record their network traffic, see setup_driver()
+        :type capture_network: bool
+        :return: The driver pool
+        :rtype: DriverPool
+        """
+        config = (headless, lean, capture_network)
+        if config == (self.headless, self.lean, self.capture_network):
+            return self
+        with self._siblings_lock:
+            if self._closed:
+                raise RuntimeError('DriverPool is closed')
+            if config not in self._siblings:
+                self._siblings[config] = DriverPool(self.size, *config, max_page_loads=self.max_page_loads,
+                                                    lease_timeout=self.lease_timeout, lazy=True)
+            return self._siblings[config]
+
+    def _launch(self):
+        """
+        Launch a new browser that counts its own page loads
+
+        :return: The webdriver
+        :rtype: selenium.webdriver.chrome.webdriver.WebDriver
+        """
+        driver = setup_driver(self.headless, self.lean, self.capture_network)
+        driver.page_loads = 0
+        get = driver.get
+
+        def counting_get(url):
+            driver.page_loads += 1
+            return get(url)
+
+        driver.get = counting_get
+        return driver
+
+    def _refill(self):
+        """
+        Launch a browser for an empty slot. If the launch fails the slot is counted as missing, to be launched again
+        on a later lease, so a failed launch never shrinks the pool.
+
+        :return: None
+        :rtype: None
+        """
+        try:
+            self._idle.put(self._launch())
+        except Exception as e:
+            print(f'Failed to launch a pooled browser: {e!r}')
+            with self._missing_lock:
+                self._missing += 1
+
+    def _launch_missing(self):
+        """
+        Launch a browser for a slot that has none, if there is one
+
+        :return: The webdriver, or None if no slot is missing
+        :rtype: selenium.webdriver.chrome.webdriver.WebDriver
+        :raises Exception: The error of the launch, the slot is still counted as missing
+        """
+        with self._missing_lock:
+            if self._missing == 0:
+                return None
+            self._missing -= 1
+        try:
+            return self._launch()
+        except Exception:
+            with self._missing_lock:
+                self._missing += 1
+            raise
+
+    @contextmanager
+    def lease(self, timeout=None):
+        """
+        Lease a browser from the pool for the duration of the with-block. An idle browser is used if there is one,
+        otherwise a browser is launched for a slot that has none yet or whose last launch failed, otherwise the lease
+        waits for a browser to be returned. If none is returned in time, a one-off browser is set up and quit after
+        the with-block.
+
+        :param timeout: Seconds to wait for a free browser, defaults to lease_timeout
+        :type timeout: float, optional
+        :return: The webdriver
+        :rtype: selenium.webdriver.chrome.webdriver.WebDriver
+        """
+        if self._closed:
+            raise RuntimeError('DriverPool is closed')
+        try:
+            driver = self._idle.get_nowait()
+        except queue.Empty:
+            driver = None
+        launch_failed = False
+        if driver is None:
+            try:
+                driver = self._launch_missing()
+            except Exception as e:
+                print(f'Failed to launch a pooled browser: {e!r}')
+                launch_failed = True
+        if driver is None and not launch_failed:
+            # Wait for a browser to be returned, unless launching has just failed, which the one-off browser below
+            # then reports to the bot
+            try:
+                driver = self._idle.get(timeout=self.lease_timeout if timeout is None else timeout)
+            except queue.Empty:
+                pass
+
+        if driver is None:
+            print('No pooled browser is available, setting up a one-off browser')
+            driver = setup_driver(self.headless, self.lean, self.capture_network)
+            try:
+                yield driver
+            finally:
+                _quit(driver)
+            return
+
+        try:
+            yield driver
+        finally:
+            self._release(driver)
+
+    def _release(self, driver):
+        """
+        Return a browser to the pool, resetting it or replacing it with a fresh one. Never raises, so it can't hide
+        the error of the with-block in lease(), and the slot is kept even if the fresh browser fails to launch.
+
+        :param driver: The webdriver
+        :type driver: selenium.webdriver.chrome.webdriver.WebDriver
+        :return: None
+        :rtype: None
+        """
+        if self._closed:
+            _quit(driver)
+            return
+        if driver.page_loads < self.max_page_loads:
+            try:
+                reset_driver(driver)
+                if self.capture_network:
+                    # Drain the performance log so the next lease only sees its own traffic
+                    driver.get_log('performance')
+                self._idle.put(driver)
+                return
+            except Exception:
+                # The browser or chromedriver is gone, e.g. a MaxRetryError from urllib3
+                pass
+        _quit(driver)
+        self._refill()
+
+    def close(self):
+        """
+        Quit all browsers in the pool and in the pools of the other configurations. Leased browsers are quit when
+        they are returned.
+
+        :return: None
+        :rtype: None
+        """
+        with self._siblings_lock:
+            self._closed = True
+            siblings = list(self._siblings.values())
+        for sibling in siblings:
+            sibling.close()
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            _quit(driver)
+
+
+def _quit(driver):
+    """
+    Quit a webdriver, ignoring the errors of a browser or chromedriver that is already gone
+
+    :param driver: The webdriver
+    :type driver: selenium.webdriver.chrome.webdriver.WebDriver
+    :return: None
+    :rtype: None
+    """
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+def set_default_pool(pool):
+    """
+    Install the pool that leased_driver() leases browsers from
+
+    :param pool: The driver pool, or None to go back to one browser per lease
+    :type pool: DriverPool
+    :return: None
+    :rtype: None
+    """
+    global _default_pool
+    _default_pool = pool
+
+
+@contextmanager
+def leased_driver(headless=True, lean=False, capture_network=False):
+    """
+    Lease a webdriver from the default pool, or from its pool for this configuration, see DriverPool.for_config().
+    Without a default pool a new webdriver is set up. The driver is returned to the pool, or quit, when the with-block
+    exits.
+
+    :param headless: Whether to run the webdriver in headless mode
+    :type headless: bool
+    :param lean: Whether to run the webdriver in lean mode, see setup_driver()
+    :type lean: bool
+    :param capture_network: Whether the webdriver records its network traffic, see setup_driver()
+    :type capture_network: bool
+    :return: The webdriver
+    :rtype: selenium.webdriver.chrome.webdriver.WebDriver
+    """
+    pool = _default_pool
+    if pool is not None:
+        with pool.for_config(headless, lean, capture_network).lease() as driver:
+            yield driver
+    else:
+        driver = setup_driver(headless, lean, capture_network)
+        try:
+            yield driver
+        finally:
+            driver.quit()
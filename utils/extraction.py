@@ -0,0 +1,89 @@
+# Walks a normalized spec in the page and returns all values in one round trip
+_extract_script = """
+const spec = arguments[0];
+const root = arguments[1] || document;
+
+function read(element, attr) {
+    if (element === null) {
+        return null;
+    }
+    if (attr === 'text') {
+        return element.innerText.trim();
+    }
+    const property = element[attr];
+    if (property !== undefined && property !== null && typeof property !== 'object') {
+        return property;
+    }
+    return element.getAttribute(attr);
+}
+
+function run(spec, scope) {
+    const result = {};
+    for (const [name, field] of Object.entries(spec)) {
+        if (field.all) {
+            const elements = Array.from(scope.querySelectorAll(field.selector));
+            result[name] = elements.map(e => field.fields ? run(field.fields, e) : read(e, field.attr));
+        } else {
+            const element = field.selector === ':scope' ? scope : scope.querySelector(field.selector);
+            result[name] = field.fields ? (element === null ? null : run(field.fields, element))
+                                        : read(element, field.attr);
+        }
+    }
+    return result;
+}
+
+return run(spec, root);
+"""
+
+
+def normalize_spec(spec):
+    """
+    Normalize an extraction spec so every field is a dict with selector, attr, all and fields keys
+
+    :param spec: Field names mapped to a CSS selector, a (selector, attr) tuple, a (selector, attr, 'all') tuple or a
+        dict with the keys selector, attr ('text' by default), all (False by default) and fields (a nested spec that is
+        evaluated relative to each matched element)
+    :type spec: dict
+    :return: The normalized spec
+    :rtype: dict
+    """
+    normalized = {}
+    for name, field in spec.items():
+        if isinstance(field, str):
+            field = {'selector': field}
+        elif isinstance(field, tuple):
+            field = {'selector': field[0], 'attr': field[1], 'all': len(field) > 2 and field[2] == 'all'}
+        else:
+            field = dict(field)
+        field.setdefault('attr', 'text')
+        field.setdefault('all', False)
+        if field.get('fields') is not None:
+            field['fields'] = normalize_spec(field['fields'])
+        normalized[name] = field
+    return normalized
+
+
+def extract_fields(driver, spec, root=None):
+    """
+    Extract many values from the page in a single execute_script round trip instead of one WebDriver call per
+    element. Selectors of nested fields are relative to the matched element, use ':scope > ...' for direct children
+    and ':scope' for the matched element itself.
+
+    Example::
+
+        extract_fields(driver, {
+            'ticker': '#ticker',
+            'links': ('table tbody tr a', 'href', 'all'),
+            'rows': {'selector': 'table tbody tr', 'all': True, 'fields': {'label': 'th', 'value': 'td'}},
+        })
+
+    :param driver: Selenium driver
+    :type driver: selenium.webdriver.chrome.webdriver.WebDriver
+    :param spec: Field names mapped to selectors, see normalize_spec()
+    :type spec: dict
+    :param root: Element to evaluate the selectors in, defaults to the whole document
+    :type root: selenium.webdriver.remote.webelement.WebElement, optional
+    :return: Field names mapped to the extracted values. Missing elements give None, 'all' fields give lists.
+    :rtype: dict
+    """
+    return driver.execute_script(_extract_script, normalize_spec(spec), root)
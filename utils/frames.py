@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+
+def coalesce(df, columns):
+    """
+    Take the first value that is not null across a ranked list of columns, for all rows at once
+
+    :param df: The data
+    :type df: pd.DataFrame
+    :param columns: The columns in order of preference, columns missing from df are skipped
+    :type columns: list
+    :return: The values, and the column each value was taken from, null where all columns are null
+    :rtype: tuple
+    """
+    columns = [column for column in columns if column in df.columns]
+    if not columns:
+        empty = pd.Series(np.nan, index=df.index, dtype=float)
+        return empty, empty.astype(object)
+
+    candidates = df[columns]
+    present = candidates.notna().to_numpy()
+    first = present.argmax(axis=1)
+    found = present.any(axis=1)
+    rows = np.arange(len(df))
+
+    values = pd.Series(candidates.to_numpy()[rows, first], index=df.index).where(found).infer_objects()
+    sources = pd.Series(np.array(columns, dtype=object)[first], index=df.index).where(found)
+    return values, sources
@@ -0,0 +1,228 @@
+import atexit
+import random
+import asyncio
+import threading
+import aiohttp
+from tqdm import tqdm
+from utils.rate_limit import acquire_async
+
+# Connection pool of the shared client. Connections are kept alive between requests, so repeated requests to the same
+# host skip the TCP and TLS handshakes.
+connection_limit = 100
+host_connection_limit = 4
+dns_cache_seconds = 300
+
+# Request defaults
+default_timeout = 30
+default_retries = 3
+default_backoff = 1.0
+retry_statuses = {429, 500, 502, 503, 504}
+
+# Returned instead of the body when a conditional request finds the page unchanged
+NOT_MODIFIED = object()
+
+# The client runs on an event loop in a background thread, so synchronous bots (and running notebooks) can share one
+# connection pool across threads
+_loop = None
+_session = None
+_client_lock = threading.Lock()
+
+
+def _client_loop():
+    """
+    Get the event loop of the shared client, starting it on first use
+
+    :return: The event loop
+    :rtype: asyncio.AbstractEventLoop
+    """
+    global _loop
+    with _client_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='http-client', daemon=True).start()
+    return _loop
+
+
+async def _get_session():
+    """
+    Get the shared client session, creating it on first use. Must run on the client loop.
+
+    :return: The client session
+    :rtype: aiohttp.ClientSession
+    """
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=connection_limit,
+            limit_per_host=host_connection_limit,
+            ttl_dns_cache=dns_cache_seconds
+        )
+        _session = aiohttp.ClientSession(connector=connector)
+    return _session
+
+
+async def fetch_text(url, headers=None, timeout=default_timeout, retries=default_retries, backoff=default_backoff,
+                     validators=None):
+    """
+    Fetch a page with the shared client, waiting for the rate limit of the url's host before every attempt.
+    Connection errors, timeouts and retryable statuses are retried with exponential backoff and jitter. Must run on
+    the client loop, use fetch or fetch_all from synchronous code.
+
+    :param url: The url to fetch
+    :type url: str
+    :param headers: Request headers
+    :type headers: dict, optional
+    :param timeout: Maximum seconds per attempt
+    :type timeout: float
+    :param retries: Number of retries after the first attempt
+    :type retries: int
+    :param backoff: Seconds to wait before the first retry, doubled for every further retry
+    :type backoff: float
+    :param validators: ETag and Last-Modified headers by url. If given, the request is conditional and the dict is
+        updated with the headers of the response.
+    :type validators: dict, optional
+    :return: The response body, NOT_MODIFIED if a conditional request found the page unchanged, or None if the
+        request failed
+    :rtype: str
+    """
+    session = await _get_session()
+    headers = dict(headers or {})
+    if validators is not None and url in validators:
+        if validators[url].get('etag'):
+            headers['If-None-Match'] = validators[url]['etag']
+        if validators[url].get('last_modified'):
+            headers['If-Modified-Since'] = validators[url]['last_modified']
+    for attempt in range(retries + 1):
+        await acquire_async(url)
+        try:
+            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                if response.status == 304 and validators is not None:
+                    return NOT_MODIFIED
+                if response.status == 200:
+                    text = await response.text()
+                    if validators is not None and ('ETag' in response.headers or 'Last-Modified' in response.headers):
+                        validators[url] = {
+                            'etag': response.headers.get('ETag'),
+                            'last_modified': response.headers.get('Last-Modified')
+                        }
+                    return text
+                if response.status not in retry_statuses:
+                    print(f'Failed to retrieve page: {url} (status {response.status})')
+                    return None
+                error = f'status {response.status}'
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = repr(e)
+
+        if attempt < retries:
+            print(f'Attempt {attempt + 1} failed for {url}: {error}')
+            await asyncio.sleep(backoff * 2 ** attempt + random.uniform(0, backoff))
+
+    print(f'Failed to retrieve page: {url} after {retries + 1} attempts')
+    return None
+
+
+async def _fetch_all(urls, progress, parse=None, max_concurrency=None, **kwargs):
+    """
+    Fetch the urls concurrently on the client loop
+
+    :param urls: The urls to fetch
+    :type urls: list
+    :param progress: Whether to show a progress bar
+    :type progress: bool
+    :param parse: Parses each response body in a worker thread as soon as it arrives, see fetch_all
+    :type parse: callable, optional
+    :param max_concurrency: Maximum number of requests in flight, defaults to the connection limits
+    :type max_concurrency: int, optional
+    :return: The response bodies, or the parsed results, in the order of the urls
+    :rtype: list
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    async def fetch_indexed(index, url):
+        if semaphore is None:
+            text = await fetch_text(url, **kwargs)
+        else:
+            async with semaphore:
+                text = await fetch_text(url, **kwargs)
+        if parse is None or not isinstance(text, str):
+            return index, text
+        try:
+            return index, await loop.run_in_executor(None, parse, text)
+        except Exception as e:
+            return index, e
+
+    results = [None] * len(urls)
+    tasks = [fetch_indexed(index, url) for index, url in enumerate(urls)]
+    with tqdm(total=len(urls), disable=not progress) as bar:
+        for task in asyncio.as_completed(tasks):
+            index, text = await task
+            results[index] = text
+            bar.update()
+    return results
+
+
+def fetch_all(urls, headers=None, timeout=default_timeout, retries=default_retries,
+              backoff=default_backoff, progress=False, validators=None, parse=None, max_concurrency=None):
+    """
+    Fetch the urls concurrently through the shared client and wait for all of them. Concurrency per host is bounded
+    by host_connection_limit and the request rate per host by utils.rate_limit.
+
+    :param urls: The urls to fetch
+    :type urls: list
+    :param headers: Request headers
+    :type headers: dict, optional
+    :param timeout: Maximum seconds per attempt
+    :type timeout: float
+    :param retries: Number of retries after the first attempt
+    :type retries: int
+    :param backoff: Seconds to wait before the first retry, doubled for every further retry
+    :type backoff: float
+    :param progress: Whether to show a progress bar
+    :type progress: bool
+    :param validators: ETag and Last-Modified headers by url of the previous fetch, see
+        utils.incremental.load_validators. If given, the requests are conditional, so unchanged pages are not downloaded
+        again, and the dict is updated with the headers of the responses. Saving it is left to the caller, once the
+        pages have been used.
+    :type validators: dict, optional
+    :param parse: Parses each response body in a worker thread, off the event loop, while the other requests are in
+        flight. An exception raised by parse is returned in place of its result.
+    :type parse: callable, optional
+    :param max_concurrency: Maximum number of requests in flight, defaults to the connection limits
+    :type max_concurrency: int, optional
+    :return: The response bodies, or the results of parse, in the order of the urls, None for failed requests and
+        NOT_MODIFIED for unchanged pages
+    :rtype: list
+    """
+    coroutine = _fetch_all(list(urls), progress, parse=parse, max_concurrency=max_concurrency, headers=headers,
+                           timeout=timeout, retries=retries, backoff=backoff, validators=validators)
+    return asyncio.run_coroutine_threadsafe(coroutine, _client_loop()).result()
+
+
+def fetch(url, **kwargs):
+    """
+    Fetch a single page through the shared client. Takes the keyword arguments of fetch_all.
+
+    :param url: The url to fetch
+    :type url: str
+    :return: The response body, or None if the request failed
+    :rtype: str
+    """
+    return fetch_all([url], **kwargs)[0]
+
+
+def close_client():
+    """
+    Close the shared client session and its pooled connections. The client is reopened on the next request.
+
+    :return: None
+    :rtype: None
+    """
+    global _session
+    if _loop is None or _session is None:
+        return
+    session, _session = _session, None
+    asyncio.run_coroutine_threadsafe(session.close(), _loop).result()
+
+
+atexit.register(close_client)
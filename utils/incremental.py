@@ -0,0 +1,146 @@
+import os
+import json
+import threading
+import pandas as pd
+from utils.storage import load_snapshot
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+data_dir = os.path.join(project_root, 'data')
+
+# ETag and Last-Modified headers of pages fetched with conditional requests
+validators_file = os.path.join(project_root, 'data', 'http_validators.json')
+_validators_lock = threading.Lock()
+
+# How often each issuer publishes new yields. Data as of the previous business day ('daily') or the previous month
+# or quarter end ('monthly', 'quarterly') is current, so the fund page doesn't need to be fetched again.
+publication_frequencies = {
+    'first_trust': 'monthly',
+    'invesco': 'daily',
+    'schwab': 'monthly',
+    'state_street': 'daily',
+    'vanguard': 'monthly',
+}
+
+# Names of the as of date column in the issuer CSV files
+as_of_columns = ['As of Date', 'As of']
+
+
+def load_previous(issuer):
+    """
+    Load the data of the previous run from data/<issuer>.csv
+
+    :param issuer: The issuer key, e.g. 'vanguard'
+    :type issuer: str
+    :return: The previous data indexed by ticker, empty if there is no previous run
+    :rtype: pd.DataFrame
+    """
+    csv_path = os.path.join(data_dir, f'{issuer}.csv')
+    if not os.path.exists(csv_path):
+        return pd.DataFrame()
+    df = load_snapshot(csv_path)
+    return df[~df.index.duplicated(keep='first')]
+
+
+def is_current(as_of, frequency, today=None):
+    """
+    Check whether data with the given as of date is the latest the issuer has published
+
+    :param as_of: The as of date
+    :type as_of: str or pd.Timestamp
+    :param frequency: 'daily', 'monthly' or 'quarterly'
+    :type frequency: str
+    :param today: The date to check against, defaults to today
+    :type today: str or pd.Timestamp, optional
+    :return: Whether the data is current
+    :rtype: bool
+    """
+    as_of = pd.to_datetime(as_of, format='%m-%d-%Y', errors='coerce')
+    if pd.isna(as_of):
+        return False
+    today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+    if frequency == 'daily':
+        return as_of >= today - pd.offsets.BDay(1)
+    period = {'monthly': 'M', 'quarterly': 'Q'}[frequency]
+    return as_of.to_period(period) >= today.to_period(period) - 1
+
+
+def plan_refresh(issuer, items, key=None, today=None):
+    """
+    Split the funds into those whose page has to be fetched and those whose previous data is still current
+
+    :param issuer: The issuer key, e.g. 'vanguard'
+    :type issuer: str
+    :param items: The funds as tickers, or as links with key mapping a link to its ticker
+    :type items: list
+    :param key: Maps an item to its ticker, defaults to the item itself
+    :type key: callable, optional
+    :param today: The date to check against, defaults to today
+    :type today: str or pd.Timestamp, optional
+    :return: The items to fetch and the previous rows to keep
+    :rtype: tuple
+    """
+    key = key or (lambda item: item)
+    previous = load_previous(issuer)
+    as_of_column = next((column for column in as_of_columns if column in previous.columns), None)
+    if as_of_column is None:
+        return list(items), previous.iloc[0:0]
+
+    frequency = publication_frequencies.get(issuer, 'daily')
+    to_fetch, current = [], []
+    for item in items:
+        ticker = key(item)
+        if ticker in previous.index and is_current(previous.at[ticker, as_of_column], frequency, today):
+            current.append(ticker)
+        else:
+            to_fetch.append(item)
+    print(f'{len(current)} funds are current, fetching {len(to_fetch)} of {len(items)}.')
+    return to_fetch, previous.loc[current]
+
+
+def merge_previous(df, previous):
+    """
+    Add the kept rows of the previous run to the freshly fetched data
+
+    :param df: The freshly fetched data indexed by ticker
+    :type df: pd.DataFrame
+    :param previous: The previous rows to keep, or None
+    :type previous: pd.DataFrame
+    :return: The combined data
+    :rtype: pd.DataFrame
+    """
+    if previous is None or previous.empty:
+        return df
+    if df.empty:
+        return previous.copy()
+    previous = previous.loc[previous.index.difference(df.index, sort=False)]
+    return pd.concat([df, previous])
+
+
+def load_validators():
+    """
+    Load the ETag and Last-Modified headers of previously fetched pages
+
+    :return: The validators by url
+    :rtype: dict
+    """
+    with _validators_lock:
+        if not os.path.exists(validators_file):
+            return {}
+        with open(validators_file) as f:
+            return json.load(f)
+
+
+def save_validators(validators):
+    """
+    Save the ETag and Last-Modified headers of fetched pages
+
+    :param validators: The validators by url
+    :type validators: dict
+    :return: None
+    :rtype: None
+    """
+    with _validators_lock:
+        tmp_file = validators_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(validators, f, indent=2, sort_keys=True)
+        os.replace(tmp_file, validators_file)
@@ -0,0 +1,531 @@
+import os
+import re
+import json
+import math
+import threading
+import requests
+import pandas as pd
+from selenium.common.exceptions import WebDriverException
+from utils.http_client import fetch, fetch_all
+from utils.rate_limit import acquire
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Issuer JSON endpoints discovered from captured network traffic
+endpoints_file = os.path.join(project_root, 'data', 'endpoints.json')
+_endpoints_lock = threading.Lock()
+
+# MIME types of the files the issuers' download buttons serve
+download_mime_types = ['spreadsheet', 'excel', 'octet-stream', 'text/csv']
+
+user_agent = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+              'Chrome/89.0.4389.82 Safari/537.36')
+
+
+def captured_json_responses(driver, url_pattern=None):
+    """
+    Get the JSON responses recorded since the last call. The driver must be set up with capture_network=True.
+    Reading the performance log drains it, so each response is returned once.
+
+    :param driver: Selenium driver
+    :type driver: selenium.webdriver.chrome.webdriver.WebDriver
+    :param url_pattern: Regular expression the response URL must match, defaults to all JSON responses
+    :type url_pattern: str, optional
+    :return: The responses as dicts with url, status and body (the parsed JSON)
+    :rtype: list
+    """
+    responses = []
+    for entry in driver.get_log('performance'):
+        message = json.loads(entry['message'])['message']
+        if message['method'] != 'Network.responseReceived':
+            continue
+        response = message['params']['response']
+        if 'json' not in response.get('mimeType', ''):
+            continue
+        if url_pattern is not None and not re.search(url_pattern, response['url']):
+            continue
+        try:
+            body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': message['params']['requestId']})
+            responses.append({
+                'url': response['url'],
+                'status': response['status'],
+                'body': json.loads(body['body']),
+            })
+        except (WebDriverException, ValueError, KeyError):
+            # The body is no longer available or is not valid JSON
+            continue
+    return responses
+
+
+def is_download_response(response):
+    """
+    Check whether a captured response is a file download rather than a page, script or API call
+
+    :param response: The response of a Network.responseReceived event
+    :type response: dict
+    :return: Whether the response is sent as an attachment or as a spreadsheet
+    :rtype: bool
+    """
+    headers = {name.lower(): value for name, value in response.get('headers', {}).items()}
+    if headers.get('content-disposition', '').lower().startswith('attachment'):
+        return True
+    mime_type = response.get('mimeType', '').lower()
+    return any(kind in mime_type for kind in download_mime_types)
+
+
+def captured_download_urls(driver):
+    """
+    Get the URLs of the downloads the browser started since the last call. The driver must be set up with
+    capture_network=True. Downloads are found from the Page.downloadWillBegin events and from the responses sent as
+    attachments or spreadsheets, which also covers files the page fetches and saves itself. Reading the performance
+    log drains it.
+
+    :param driver: Selenium driver
+    :type driver: selenium.webdriver.chrome.webdriver.WebDriver
+    :return: The http(s) URLs of the downloads, in the order they were seen
+    :rtype: list
+    """
+    urls = []
+    for entry in driver.get_log('performance'):
+        message = json.loads(entry['message'])['message']
+        if message['method'] in ('Page.downloadWillBegin', 'Browser.downloadWillBegin'):
+            url = message['params']['url']
+        elif message['method'] == 'Network.responseReceived' and is_download_response(message['params']['response']):
+            url = message['params']['response']['url']
+        else:
+            continue
+        if url.startswith('http') and url not in urls:
+            urls.append(url)
+    return urls
+
+
+def load_endpoints():
+    """
+    Load the discovered endpoints
+
+    :return: Endpoint URL templates keyed by issuer and endpoint name
+    :rtype: dict
+    """
+    try:
+        with open(endpoints_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_endpoint(issuer, name, url):
+    """
+    Store an endpoint URL template, replacing the file atomically
+
+    :param issuer: The issuer key, e.g. 'jpmorgan'
+    :type issuer: str
+    :param name: The endpoint name, e.g. 'fund_list' or 'fund_detail'
+    :type name: str
+    :param url: The URL, with {ticker} style placeholders for per-fund endpoints, or the fields of an endpoint
+    :type url: str or dict
+    :return: None
+    :rtype: None
+    """
+    with _endpoints_lock:
+        endpoints = load_endpoints()
+        endpoints.setdefault(issuer, {})[name] = url
+        os.makedirs(os.path.dirname(endpoints_file), exist_ok=True)
+        temp_file = endpoints_file + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(endpoints, f, indent=2, sort_keys=True)
+        os.replace(temp_file, endpoints_file)
+
+
+def get_endpoint(issuer, name):
+    """
+    Get a discovered endpoint URL template
+
+    :param issuer: The issuer key
+    :type issuer: str
+    :param name: The endpoint name
+    :type name: str
+    :return: The URL template, or None if it has not been discovered yet
+    :rtype: str
+    """
+    return load_endpoints().get(issuer, {}).get(name)
+
+
+def discover_endpoint(responses, issuer, name, needles, placeholders=None):
+    """
+    Find the captured response that carries the data seen on the page and store its URL. The response whose body
+    contains the most of the needles wins, e.g. the tickers of the fund list or the ticker and yield of a fund page.
+
+    :param responses: Responses from captured_json_responses()
+    :type responses: list
+    :param issuer: The issuer key
+    :type issuer: str
+    :param name: The endpoint name
+    :type name: str
+    :param needles: Values scraped from the rendered page
+    :type needles: list
+    :param placeholders: Values to turn into placeholders in the stored URL, e.g. {'ticker': 'JPST'}, see
+        endpoint_url
+    :type placeholders: dict, optional
+    :return: The body of the matching response, or None if no response contains any of the needles
+    :rtype: dict or list
+    """
+    needles = [str(needle) for needle in needles if needle]
+    best, best_hits = None, 0
+    for response in responses:
+        text = json.dumps(response['body'])
+        hits = sum(needle in text for needle in needles)
+        if hits > best_hits:
+            best, best_hits = response, hits
+    if best is None:
+        return None
+
+    url = best['url'].replace('{', '{{').replace('}', '}}')
+    for placeholder, value in (placeholders or {}).items():
+        # Keep the case the site uses, e.g. /profile/bnd is stored as /profile/{ticker_lower}
+        url = url.replace(str(value), '{' + placeholder + '}')
+        url = re.sub(re.escape(str(value)), '{' + placeholder + '_lower}', url, flags=re.IGNORECASE)
+    save_endpoint(issuer, name, url)
+    return best['body']
+
+
+def leaf_values(body, path=()):
+    """
+    Walk the scalar values of a JSON body
+
+    :param body: The parsed JSON
+    :type body: dict or list
+    :param path: The path of body within the whole document
+    :type path: tuple
+    :return: The path, a list of keys and indices, and the value of each scalar
+    :rtype: generator
+    """
+    if isinstance(body, dict):
+        for key, value in body.items():
+            yield from leaf_values(value, path + (key,))
+    elif isinstance(body, list):
+        for index, value in enumerate(body):
+            yield from leaf_values(value, path + (index,))
+    else:
+        yield list(path), body
+
+
+def to_number(leaf):
+    """
+    Read a JSON value as a number, e.g. 4.12, '4.12' or '4.12%'
+
+    :param leaf: The JSON value
+    :return: The number, or None if the value is not a number
+    :rtype: float
+    """
+    if isinstance(leaf, bool):
+        return None
+    if isinstance(leaf, (int, float)):
+        return float(leaf)
+    if isinstance(leaf, str):
+        try:
+            return float(leaf.strip().rstrip('%'))
+        except ValueError:
+            return None
+    return None
+
+
+def convert_leaf(leaf, kind):
+    """
+    Convert a JSON value to the form the bots store, see matching_kind
+
+    :param leaf: The JSON value
+    :param kind: 'text', 'number', 'percent' or 'date'
+    :type kind: str
+    :return: The text, the number, the percentage as a fraction, or the date as MM-DD-YYYY
+    """
+    if kind == 'text':
+        return str(leaf).strip()
+    if kind == 'number':
+        return to_number(leaf)
+    if kind == 'percent':
+        return to_number(leaf) / 100.0
+    if kind == 'date':
+        return pd.Timestamp(leaf).strftime('%m-%d-%Y')
+    raise ValueError(f'Unknown kind {kind}')
+
+
+def matching_kind(leaf, value):
+    """
+    Find how a JSON value converts to a value of the scraped data
+
+    :param leaf: The JSON value
+    :param value: The scraped value, a text, a number, a yield as a fraction or a date as MM-DD-YYYY
+    :return: The kind of convert_leaf that turns leaf into value, or None if it doesn't match
+    :rtype: str
+    """
+    if leaf is None or isinstance(leaf, bool):
+        return None
+    if isinstance(value, str):
+        if str(leaf).strip() == value.strip():
+            return 'text'
+        if isinstance(leaf, str) and re.fullmatch(r'\d{2}-\d{2}-\d{4}', value):
+            try:
+                if convert_leaf(leaf, 'date') == value:
+                    return 'date'
+            except (ValueError, OverflowError):
+                return None
+        return None
+    number = to_number(leaf)
+    if number is None or value is None or pd.isna(value):
+        return None
+    if math.isclose(number, value, rel_tol=1e-6):
+        return 'number'
+    if math.isclose(number / 100.0, value, rel_tol=1e-6):
+        return 'percent'
+    return None
+
+
+def value_at(body, path):
+    """
+    Get the value at a path of a JSON body
+
+    :param body: The parsed JSON
+    :type body: dict or list
+    :param path: The keys and indices
+    :type path: list
+    :return: The value
+    :raises KeyError: If the path is not in the body
+    """
+    for key in path:
+        try:
+            body = body[key]
+        except (KeyError, IndexError, TypeError):
+            raise KeyError(f'{path} is not in the response')
+    return body
+
+
+def discover_fields(issuer, name, samples):
+    """
+    Store where each value of the scraped rows is found in the JSON of the same fund, and how it converts, so rows
+    can be read from the endpoint with read_fields. A field must give the scraped value for every sample, and the
+    fields are only stored if all columns are found.
+
+    :param issuer: The issuer key
+    :type issuer: str
+    :param name: The endpoint name, the fields are stored as <name>_fields
+    :type name: str
+    :param samples: The JSON of a fund and its scraped values by column, for one or more funds
+    :type samples: list
+    :return: The path and kind by column, or None if a column was not found
+    :rtype: dict
+    """
+    (first_body, first_row), others = samples[0], samples[1:]
+
+    def reproduces(field, column):
+        for body, row in others:
+            try:
+                if matching_kind(value_at(body, field['path']), row[column]) != field['kind']:
+                    return False
+            except KeyError:
+                return False
+        return True
+
+    leaves = list(leaf_values(first_body))
+    fields = {}
+    for column, value in first_row.items():
+        for path, leaf in leaves:
+            field = {'path': path, 'kind': matching_kind(leaf, value)}
+            if field['kind'] is not None and reproduces(field, column):
+                fields[column] = field
+                break
+        else:
+            return None
+    save_endpoint(issuer, f'{name}_fields', fields)
+    return fields
+
+
+def read_fields(body, fields):
+    """
+    Read a row from the JSON of a fund with the fields stored by discover_fields
+
+    :param body: The JSON of the fund
+    :type body: dict or list
+    :param fields: The path and kind by column
+    :type fields: dict
+    :return: The values by column
+    :rtype: dict
+    :raises KeyError: If the response no longer has one of the fields
+    :raises ValueError: If a value no longer converts
+    """
+    return {column: convert_leaf(value_at(body, field['path']), field['kind']) for column, field in fields.items()}
+
+
+def discover_fund_endpoints(issuer, list_responses, detail_responses, df, columns=None):
+    """
+    Store the fund list endpoint, the response carrying the most tickers of the scraped data, and the fund detail
+    endpoint, the response carrying the ticker and name of the first fund. With columns, also store where the values
+    of those columns are found in the fund detail response, see discover_fields.
+
+    :param issuer: The issuer key
+    :type issuer: str
+    :param list_responses: Responses captured while loading the fund list
+    :type list_responses: list
+    :param detail_responses: Responses captured while loading the fund pages
+    :type detail_responses: list
+    :param df: The scraped data, indexed by ticker with a Name column
+    :type df: pd.DataFrame
+    :param columns: The columns to read from the fund detail endpoint, see read_fields
+    :type columns: list, optional
+    :return: None
+    :rtype: None
+    """
+    discover_endpoint(list_responses, issuer, 'fund_list', list(df.index))
+    if df.empty:
+        return
+    ticker, name = df.index[0], df['Name'].iloc[0]
+
+    # Prefer the responses requested for this fund over lists that happen to contain it
+    own_responses = [r for r in detail_responses if str(ticker).lower() in r['url'].lower()]
+    body = discover_endpoint(own_responses or detail_responses, issuer, 'fund_detail', [ticker, name],
+                             {'ticker': ticker})
+    if body is None or not columns:
+        return
+
+    # Every fund must have its own URL, or all funds would be read from the first fund's response
+    template = get_endpoint(issuer, 'fund_detail')
+    if '{ticker' not in template:
+        return
+
+    # Check the fields against every fund whose detail response was captured
+    bodies = {r['url']: r['body'] for r in detail_responses}
+    samples = [(body, df.loc[ticker, columns].to_dict())]
+    for other in df.index[1:]:
+        other_body = bodies.get(endpoint_url(template, ticker=other))
+        if other_body is not None:
+            samples.append((other_body, df.loc[other, columns].to_dict()))
+    discover_fields(issuer, 'fund_detail', samples)
+
+
+def fetch_json(url, timeout=30, **kwargs):
+    """
+    Fetch a JSON endpoint with plain HTTP, without rendering the page, through the shared client of
+    utils.http_client and the rate limit of the url's host
+
+    :param url: The URL of the endpoint
+    :type url: str
+    :param timeout: Seconds to wait for the response
+    :type timeout: float
+    :param kwargs: Keyword arguments passed on to utils.http_client.fetch
+    :return: The parsed JSON
+    :rtype: dict or list
+    :raises ValueError: If the request failed or the response is not JSON
+    """
+    headers = {'User-Agent': user_agent, 'Accept': 'application/json'}
+    headers.update(kwargs.pop('headers', {}))
+    body = fetch(url, headers=headers, timeout=timeout, parse=json.loads, **kwargs)
+    if body is None or isinstance(body, Exception):
+        raise ValueError(f'Failed to read {url}: {body}')
+    return body
+
+
+def query_fund_endpoint(issuer, tickers, max_concurrency=8):
+    """
+    Read the rows of funds from the fund detail endpoint with plain HTTP, without a browser. The endpoint and the
+    fields of its JSON are recorded by discover_fund_endpoints with columns.
+
+    :param issuer: The issuer key
+    :type issuer: str
+    :param tickers: The tickers of the funds
+    :type tickers: list
+    :param max_concurrency: Maximum number of requests in flight
+    :type max_concurrency: int, optional
+    :return: The values by column of each fund by ticker, see read_fields
+    :rtype: dict
+    :raises KeyError: If the endpoint has not been recorded yet, or a response no longer has the recorded fields
+    :raises ValueError: If a request failed or a value no longer converts
+    """
+    url = get_endpoint(issuer, 'fund_detail')
+    fields = get_endpoint(issuer, 'fund_detail_fields')
+    if url is None or fields is None:
+        raise KeyError(f'No fund detail endpoint recorded for {issuer}')
+
+    headers = {'User-Agent': user_agent, 'Accept': 'application/json'}
+    bodies = fetch_all([endpoint_url(url, ticker=ticker) for ticker in tickers], headers=headers, progress=True,
+                       parse=json.loads, max_concurrency=max_concurrency)
+    data = {}
+    for ticker, body in zip(tickers, bodies):
+        if body is None or isinstance(body, Exception):
+            raise ValueError(f'Failed to read the fund detail endpoint of {issuer} for {ticker}: {body}')
+        data[ticker] = read_fields(body, fields)
+    return data
+
+
+def download_file(url, path, timeout=60, validate=None, chunk_size=1 << 16, **kwargs):
+    """
+    Stream a file to disk with plain HTTP, under the rate limit of the url's host. The file is written to a temporary file and renamed, so an interrupted
+    download never replaces the previous file.
+
+    :param url: The URL of the file
+    :type url: str
+    :param path: The path to save the file to
+    :type path: str
+    :param timeout: Seconds to wait for the server
+    :type timeout: float
+    :param validate: Checks the first chunk of the file, e.g. that it is not an error page
+    :type validate: callable, optional
+    :param chunk_size: Bytes written at a time
+    :type chunk_size: int
+    :param kwargs: Keyword arguments passed on to requests.get
+    :return: The path of the file
+    :rtype: str
+    :raises ValueError: If validate rejects the file
+    """
+    headers = {'User-Agent': user_agent}
+    headers.update(kwargs.pop('headers', {}))
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_file = path + '.tmp'
+    # Streamed with requests, which the shared text client can't do, but under the same rate limit
+    acquire(url)
+    try:
+        with requests.get(url, headers=headers, timeout=timeout, stream=True, **kwargs) as response:
+            response.raise_for_status()
+            with open(temp_file, 'wb') as f:
+                for i, chunk in enumerate(response.iter_content(chunk_size)):
+                    if i == 0 and validate is not None and not validate(chunk):
+                        raise ValueError(f'Unexpected content downloaded from {url}')
+                    f.write(chunk)
+        os.replace(temp_file, path)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+    return path
+
+
+def endpoint_url(template, **placeholders):
+    """
+    Fill in the placeholders of an endpoint URL template. Each placeholder can also be used in lower case, as
+    {<placeholder>_lower}.
+
+    :param template: The URL template
+    :type template: str
+    :param placeholders: Values for the placeholders, e.g. ticker='JPST'
+    :return: The URL
+    :rtype: str
+    """
+    values = {name: str(value) for name, value in placeholders.items()}
+    values.update({f'{name}_lower': value.lower() for name, value in values.items()})
+    return template.format(**values)
+
+
+def read_endpoint(issuer, name, **placeholders):
+    """
+    Fetch a discovered endpoint with plain HTTP
+
+    :param issuer: The issuer key
+    :type issuer: str
+    :param name: The endpoint name
+    :type name: str
+    :param placeholders: Values for the placeholders in the URL template, e.g. ticker='JPST'
+    :return: The parsed JSON
+    :rtype: dict or list
+    :raises KeyError: If the endpoint has not been discovered yet
+    """
+    url = get_endpoint(issuer, name)
+    if url is None:
+        raise KeyError(f'No {name} endpoint discovered for {issuer}. Run the bot with capture_network=True first.')
+    return fetch_json(endpoint_url(url, **placeholders))
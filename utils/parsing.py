@@ -0,0 +1,114 @@
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    # Beautiful Soup 4.13+ asks an ElementFilter which tags of the page to build
+    from bs4.filter import ElementFilter
+except ImportError:
+    ElementFilter = None
+
+try:
+    import lxml  # noqa: F401
+except ImportError:
+    lxml = None
+
+# The tree builder used to parse the issuer pages. lxml parses in C and is several times faster than Python's
+# html.parser, which is used when lxml is not installed. Any builder name BeautifulSoup accepts can be set here.
+html_parser = 'lxml' if lxml is not None else 'html.parser'
+
+
+def element_matches(name, attrs, ids=None, classes=None, names=None):
+    """
+    Check whether a tag has one of the ids, one of the classes or one of the tag names
+
+    :param name: The tag name
+    :type name: str
+    :param attrs: The attributes of the tag
+    :type attrs: dict
+    :param ids: The ids to keep
+    :type ids: list, optional
+    :param classes: The classes to keep
+    :type classes: list, optional
+    :param names: The tag names to keep, e.g. ['table']
+    :type names: list, optional
+    :return: Whether the tag matches
+    :rtype: bool
+    """
+    attrs = attrs or {}
+    if names and name in names:
+        return True
+    if ids and attrs.get('id') in ids:
+        return True
+    if classes:
+        tag_classes = attrs.get('class') or ''
+        if isinstance(tag_classes, str):
+            tag_classes = tag_classes.split()
+        return any(tag_class in classes for tag_class in tag_classes)
+    return False
+
+
+def strainer(ids=None, classes=None, names=None):
+    """
+    Build the filter that makes BeautifulSoup only build the matching elements of a page, with everything inside them
+
+    :param ids: The ids to keep
+    :type ids: list, optional
+    :param classes: The classes to keep
+    :type classes: list, optional
+    :param names: The tag names to keep, e.g. ['table']
+    :type names: list, optional
+    :return: The filter to pass as parse_only
+    :rtype: bs4.SoupStrainer
+    """
+    def matches(name, attrs):
+        return element_matches(name, attrs, ids, classes, names)
+
+    if ElementFilter is None:
+        # Beautiful Soup 4.12 calls a function passed as the tag name with the name and attributes of each tag
+        return SoupStrainer(matches)
+
+    class Strainer(ElementFilter):
+        def allow_tag_creation(self, nsprefix, name, attrs):
+            return matches(name, attrs)
+
+        def allow_string_creation(self, string):
+            return False
+
+    return Strainer()
+
+
+def parse_html(html, ids=None, classes=None, names=None):
+    """
+    Parse an issuer page with the fastest available parser. When ids, classes or names are given, only the matching
+    elements and their content are built into the tree, which takes a fraction of the time and memory of the full page.
+
+    :param html: The html of the page
+    :type html: str
+    :param ids: The ids of the elements to keep
+    :type ids: list, optional
+    :param classes: The classes of the elements to keep
+    :type classes: list, optional
+    :param names: The tag names of the elements to keep, e.g. ['table']
+    :type names: list, optional
+    :return: The parsed elements
+    :rtype: bs4.BeautifulSoup
+    """
+    parse_only = strainer(ids, classes, names) if ids or classes or names else None
+    return BeautifulSoup(html, html_parser, parse_only=parse_only)
+
+
+def table_pairs(table):
+    """
+    Read a table of name and value rows
+
+    :param table: The table
+    :type table: bs4.element.Tag
+    :return: The stripped text of the second cell by the stripped text of the first cell, rows with less than two
+        cells are skipped
+    :rtype: dict
+    """
+    pairs = {}
+    for row in table.find_all('tr'):
+        cols = row.find_all('td')
+        if len(cols) >= 2:
+            pairs[cols[0].get_text().strip()] = cols[1].get_text().strip()
+    return pairs
@@ -0,0 +1,265 @@
+import os
+import json
+import pandas as pd
+from yahooquery import Ticker
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# One parquet file of daily closes per ticker, and an index of when each ticker was last checked and from which date
+# its history is complete
+prices_dir = os.path.join(project_root, 'data', 'prices')
+index_file = os.path.join(prices_dir, 'index.json')
+
+# Cached closes checked less than max_age ago are served without asking Yahoo Finance for new bars
+max_age = pd.Timedelta(hours=12)
+
+# Units of the yahooquery period strings
+period_units = {'d': 'days', 'wk': 'weeks', 'mo': 'months', 'y': 'years'}
+
+
+def period_start(period, today=None):
+    """
+    Get the first date of a yahooquery period such as '3y' or '6mo'
+
+    :param period: The period, 'max' for the full history
+    :type period: str
+    :param today: The date the period ends, defaults to today
+    :type today: str or pd.Timestamp, optional
+    :return: The first date, None for 'max'
+    :rtype: pd.Timestamp
+    """
+    if period == 'max':
+        return None
+    today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+    if period == 'ytd':
+        return today.replace(month=1, day=1)
+    number = int(period.rstrip('abcdefghijklmnopqrstuvwxyz'))
+    unit = period_units[period[len(str(number)):]]
+    return today - pd.DateOffset(**{unit: number})
+
+
+def cache_path(ticker):
+    """
+    Get the path of the cache file of a ticker
+
+    :param ticker: The ticker
+    :type ticker: str
+    :return: The path of data/prices/<ticker>.parquet
+    :rtype: str
+    """
+    return os.path.join(prices_dir, f'{ticker}.parquet')
+
+
+def load_index():
+    """
+    Load when each ticker was last checked and from which date its cached history is complete
+
+    :return: {'checked': ISO timestamp, 'start': ISO date or 'max'} by ticker
+    :rtype: dict
+    """
+    if not os.path.exists(index_file):
+        return {}
+    with open(index_file) as f:
+        return json.load(f)
+
+
+def save_index(index):
+    """
+    Save the cache index
+
+    :param index: {'checked': ISO timestamp, 'start': ISO date or 'max'} by ticker
+    :type index: dict
+    :return: None
+    :rtype: None
+    """
+    os.makedirs(prices_dir, exist_ok=True)
+    tmp_file = index_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, index_file)
+
+
+def read_closes(ticker):
+    """
+    Read the cached closes of a ticker
+
+    :param ticker: The ticker
+    :type ticker: str
+    :return: The closes indexed by date, None if the ticker is not cached
+    :rtype: pd.Series
+    """
+    path = cache_path(ticker)
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)['close']
+
+
+def write_closes(ticker, closes):
+    """
+    Write the closes of a ticker to its cache file
+
+    :param ticker: The ticker
+    :type ticker: str
+    :param closes: The closes indexed by date
+    :type closes: pd.Series
+    :return: None
+    :rtype: None
+    """
+    os.makedirs(prices_dir, exist_ok=True)
+    path = cache_path(ticker)
+    tmp_file = path + '.tmp'
+    closes.rename('close').rename_axis('date').to_frame().to_parquet(tmp_file)
+    os.replace(tmp_file, path)
+
+
+def normalize_dates(dates):
+    """
+    Convert the dates of a yahooquery history, a mix of dates and timezone-aware timestamps of the running session,
+    to dates at midnight
+
+    :param dates: The dates
+    :type dates: pd.Index
+    :return: The dates
+    :rtype: pd.DatetimeIndex
+    """
+    return pd.DatetimeIndex(pd.to_datetime(pd.Index(dates).astype(str).str[:10]), name='date')
+
+
+def fetch_closes(tickers, **history_kwargs):
+    """
+    Download the daily closes of several tickers in one yahooquery request
+
+    :param tickers: The tickers
+    :type tickers: list
+    :param history_kwargs: Arguments of yahooquery's Ticker.history, such as period or start
+    :return: The closes indexed by date by ticker, tickers Yahoo Finance returned no data for are missing
+    :rtype: dict
+    """
+    history = Ticker(' '.join(tickers), asynchronous=True).history(**history_kwargs)
+
+    # Failed tickers turn the result into a dict of frames and error messages
+    if isinstance(history, dict):
+        frames = [frame for frame in history.values() if isinstance(frame, pd.DataFrame) and not frame.empty]
+        history = pd.concat(frames) if frames else pd.DataFrame()
+    if history.empty or 'close' not in history.columns:
+        return {}
+
+    closes = {}
+    for symbol, symbol_data in history['close'].groupby(level='symbol'):
+        series = symbol_data.droplevel('symbol')
+        series.index = normalize_dates(series.index)
+        closes[symbol] = series[~series.index.duplicated(keep='last')].dropna().astype('float64')
+    return closes
+
+
+def covers(entry, start):
+    """
+    Check whether the cached history of a ticker goes back to the start of the requested period
+
+    :param entry: The index entry of the ticker
+    :type entry: dict
+    :param start: The first date of the period, None for the full history
+    :type start: pd.Timestamp
+    :return: Whether the history is complete from start
+    :rtype: bool
+    """
+    cached_start = entry.get('start')
+    if cached_start is None:
+        return False
+    if cached_start == 'max':
+        return True
+    return start is not None and pd.Timestamp(cached_start) <= start
+
+
+def is_fresh(entry, now):
+    """
+    Check whether the cached closes of a ticker can be served without asking for new bars
+
+    :param entry: The index entry of the ticker
+    :type entry: dict
+    :param now: The current time
+    :type now: pd.Timestamp
+    :return: Whether the ticker was checked less than max_age ago, or after the day of the last session
+    :rtype: bool
+    """
+    checked = pd.Timestamp(entry['checked'])
+    last_session = pd.offsets.BDay().rollback(now.normalize())
+    return now - checked < max_age or checked.normalize() > last_session
+
+
+def get_closes(tickers, period='3y', offline=None, now=None):
+    """
+    Get the daily closes of the tickers from the cache, downloading only the bars that are missing or stale
+
+    Tickers without cached closes, or whose cache starts after the period, are downloaded in full. Stale tickers are
+    downloaded from their last cached bar, which replaces an intraday close saved during a session, and merged into
+    the cache. Only tickers that came back are marked as checked, so failed ones are asked for again. In offline mode
+    nothing is downloaded and tickers without cached closes are left out.
+
+    :param tickers: The tickers
+    :type tickers: list
+    :param period: The yahooquery period to return, e.g. '3y'
+    :type period: str
+    :param offline: Whether to serve from the cache only, defaults to the YIELDQUERY_OFFLINE environment variable
+    :type offline: bool, optional
+    :param now: The current time, defaults to now
+    :type now: pd.Timestamp, optional
+    :return: The closes in the layout of yahooquery's Ticker.history, indexed by symbol and date
+    :rtype: pd.DataFrame
+    """
+    if offline is None:
+        offline = os.environ.get('YIELDQUERY_OFFLINE', '').lower() in ('1', 'true', 'yes')
+    now = pd.Timestamp(now or pd.Timestamp.now())
+    start = period_start(period, now)
+    index = load_index()
+    cached = {ticker: read_closes(ticker) for ticker in dict.fromkeys(tickers)}
+
+    if not offline:
+        # Group the tickers to download by the date to download from, one request per group
+        downloads = {}
+        for ticker, closes in cached.items():
+            entry = index.get(ticker)
+            if entry is None or not covers(entry, start):
+                downloads.setdefault(None, []).append(ticker)
+            elif is_fresh(entry, now):
+                continue
+            elif closes is None or closes.empty:
+                downloads.setdefault(None, []).append(ticker)
+            else:
+                downloads.setdefault(closes.index[-1], []).append(ticker)
+
+        updated = False
+        for fetch_from, group in downloads.items():
+            if fetch_from is None:
+                fetched = fetch_closes(group, period=period)
+            else:
+                fetched = fetch_closes(group, start=fetch_from.strftime('%Y-%m-%d'))
+
+            # Tickers missing from a failed or empty reply keep their index entry, so they are asked for again
+            for ticker in group:
+                if ticker not in fetched:
+                    continue
+                if fetch_from is None:
+                    closes = fetched[ticker]
+                else:
+                    closes = pd.concat([cached[ticker][cached[ticker].index < fetch_from], fetched[ticker]])
+                write_closes(ticker, closes)
+                cached[ticker] = closes
+                entry = index.setdefault(ticker, {})
+                entry['checked'] = now.isoformat()
+                if fetch_from is None:
+                    entry['start'] = start.strftime('%Y-%m-%d') if start is not None else 'max'
+                updated = True
+        if updated:
+            save_index(index)
+
+    frames = {}
+    for ticker, closes in cached.items():
+        if closes is None or closes.empty:
+            continue
+        if start is not None:
+            closes = closes[closes.index >= start]
+        frames[ticker] = closes.to_frame('close')
+    if not frames:
+        return pd.DataFrame(columns=['close'], index=pd.MultiIndex.from_arrays([[], []], names=['symbol', 'date']))
+    return pd.concat(frames, names=['symbol', 'date'])
@@ -1,4 +1,5 @@
 import os
+import json
 import pandas as pd
 import numpy as np
 from yahooquery import Ticker
@@ -6,10 +7,38 @@ from arch import arch_model
 from arch.__future__ import reindexing
 from tqdm import tqdm
 from typing import Tuple
+from itertools import product
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from utils.price_cache import get_closes, normalize_dates, load_index
+from utils.storage import load_snapshot
+from utils.frames import coalesce
 
 processing_dir = os.path.dirname(__file__)
 project_root = os.path.dirname(processing_dir)
 
+# Fitted GARCH parameters of the previous run, used as starting values
+garch_params_file = os.path.join(project_root, 'data', 'garch_params.json')
+
+# Settings of the vectorized GARCH backend
+garch_backcast_window = 75
+garch_max_persistence = 0.9999
+garch_min_observations = 30
+garch_batch_rows = 4096
+
+# Reference rates fetched together, so one request serves the 13-week, 5-year and 10-year Treasury yields
+reference_rates = ('^TNX', '^IRX', '^FVX')
+reference_rate_names = {
+    '^TNX': 'CBOE Interest Rate 10 Year T No',
+    '^IRX': '13 WEEK TREASURY BILL',
+    '^FVX': 'Treasury Yield 5 Years'
+}
+
+# Cached reference rates, in memory and on disk, are served for reference_rate_ttl after they were fetched
+reference_rates_file = os.path.join(project_root, 'data', 'reference_rates.json')
+reference_rate_ttl = pd.Timedelta(hours=1)
+_reference_rates = {}
+
 
 def build_file_path(file_name):
     """
@@ -23,6 +52,131 @@ def build_file_path(file_name):
     return os.path.join(project_root, 'data', file_name)
 
 
+# Where each issuer's data is stored and which of its columns make up the combined data, by output column. An issuer
+# can list fallbacks for an output column, source columns in order of preference that fill in the funds without a
+# value in its column, see utils.frames.coalesce.
+issuer_schemas = {
+    'ishares': {
+        'file': 'ishares.csv',
+        'columns': {
+            'Name': 'Name',
+            'Yield to Maturity': 'Avg. Yield (%)',
+            'Date': 'Avg. Yield as of Date'
+        }
+    },
+    'vanguard': {
+        'file': 'vanguard.csv',
+        'columns': {'Name': 'Name', 'Yield to Maturity': 'Yield to Maturity', 'Date': 'As of'}
+    },
+    'state_street': {
+        'file': 'state_street.csv',
+        'columns': {'Name': 'Name', 'Yield to Maturity': 'Yield to Maturity', 'Date': 'As of Date'}
+    },
+    'schwab': {
+        'file': 'schwab.csv',
+        'columns': {'Name': 'Name', 'Yield to Maturity': 'Yield to Maturity', 'Date': 'As of'}
+    },
+    'invesco': {
+        'file': 'invesco.csv',
+        'columns': {
+            'Name': 'ETF Name',
+            'Yield to Maturity': 'Yield to Worst (%)',
+            'Date': 'As of Date'
+        },
+        'fallbacks': {'Yield to Maturity': ['Yield (%)', 'Yield to Maturity (%)']}
+    },
+    'first_trust': {
+        'file': 'first_trust.csv',
+        'columns': {'Name': 'ETF Name', 'Yield to Maturity': 'Weighted Average Yield-to-Worst', 'Date': 'As of'}
+    },
+    'jpmorgan': {
+        'file': 'jpmorgan.csv',
+        'columns': {'Name': 'Name', 'Yield to Maturity': 'Yield to Maturity', 'Date': 'As of Date'}
+    },
+    'pimco': {
+        'file': 'pimco.csv',
+        'columns': {'Name': 'Name', 'Yield to Maturity': 'Yield to Maturity', 'Date': 'As of Date'}
+    },
+    'wisdomtree': {
+        'file': 'wisdomtree.csv',
+        'columns': {'Name': 'Name', 'Yield to Maturity': 'Yield to Maturity', 'Date': 'As of Date'}
+    },
+    'vaneck': {
+        'file': 'vaneck.csv',
+        'columns': {'Name': 'Name', 'Yield to Maturity': 'Yield to Maturity', 'Date': 'As of Date'}
+    },
+    'goldman_sachs': {
+        'file': 'goldman_sachs.csv',
+        'columns': {'Name': 'Name', 'Yield to Maturity': 'Yield to Maturity', 'Date': 'As of Date'}
+    },
+    'janus_henderson': {
+        'file': 'janus_henderson.csv',
+        'columns': {'Name': 'Name', 'Yield to Maturity': 'Yield to Worst', 'Date': 'As of Date'}
+    },
+    'dimensional': {
+        'file': 'dimensional.csv',
+        'columns': {'Name': 'Name', 'Yield to Maturity': 'Yield to Maturity', 'Date': 'As of Date'}
+    },
+    'flexshares': {
+        'file': 'flexshares.csv',
+        'columns': {
+            'Name': 'NAME',
+            'Yield to Maturity': 'WEIGHTED AVG YIELD TO MATURITY',
+            'Date': 'AS OF DATE'
+        },
+        'fallbacks': {'Yield to Maturity': ['WEIGHTED AVG YIELD TO WORST', 'WEIGHTED AVG NOMINAL YIELD']}
+    }
+}
+
+
+def load_issuer(issuer, with_sources=False):
+    """
+    :description: This function loads the data of an issuer as described by its schema in issuer_schemas. Only the
+        source columns of the schema are read.
+
+    :param issuer: The issuer key, e.g. 'vanguard'
+    :type issuer: str
+    :param with_sources: Whether to add a '<column> Source' column naming the source column of each value, for the
+        columns with fallbacks
+    :type with_sources: bool
+    :return: The issuer's Name, Yield to Maturity and Date by ticker
+    :rtype: pd.DataFrame
+    """
+    schema = issuer_schemas[issuer]
+    fallbacks = schema.get('fallbacks', {})
+    chains = {column: [source_column] + fallbacks.get(column, [])
+              for column, source_column in schema['columns'].items()}
+    source_columns = list(dict.fromkeys(column for chain in chains.values() for column in chain))
+    source = load_snapshot(build_file_path(schema['file']), columns=source_columns)
+
+    df = pd.DataFrame(index=source.index)
+    for column, chain in chains.items():
+        # Funds without a value in the column take the first fallback with one
+        df[column], sources = coalesce(source, chain)
+        if with_sources and column in fallbacks:
+            df[f'{column} Source'] = sources
+    df.index.name = 'Ticker'
+    return df
+
+
+def load_issuers(issuers=None, max_workers=None, with_sources=False):
+    """
+    :description: This function loads the data of several issuers concurrently.
+
+    :param issuers: The issuer keys, defaults to all issuers in issuer_schemas
+    :type issuers: list
+    :param max_workers: The number of files to read at the same time, defaults to one per issuer
+    :type max_workers: int
+    :param with_sources: Whether to add the source columns of the values taken from fallbacks, see load_issuer
+    :type with_sources: bool
+    :return: The data of each issuer by issuer key, in the order of issuers
+    :rtype: dict
+    """
+    issuers = list(issuers or issuer_schemas)
+    with ThreadPoolExecutor(max_workers=max_workers or len(issuers)) as executor:
+        return dict(zip(issuers, executor.map(partial(load_issuer, with_sources=with_sources), issuers)))
+
+
 def ishares():
     """
     :description: This function retrieves the iShares ETF data.
@@ -30,14 +184,7 @@ def ishares():
     :return: The iShares ETF data
     :rtype: pd.DataFrame
     """
-    file_path = build_file_path('ishares.csv')
-    df = pd.read_csv(file_path, index_col=0)
-    df = df[['Name', 'Avg. Yield (%)', 'Avg. Yield as of Date']]
-    df.rename(columns={
-        'Avg. Yield (%)': 'Yield to Maturity',
-        'Avg. Yield as of Date': 'Date'
-    }, inplace=True)
-    return df
+    return load_issuer('ishares')
 
 
 def vanguard():
@@ -47,11 +194,7 @@ def vanguard():
     :return: The Vanguard ETF data
     :rtype: pd.DataFrame
     """
-    filepath = build_file_path('vanguard.csv')
-    df = pd.read_csv(filepath, index_col=0)
-    df = df[['Name', 'Yield to Maturity', 'As of']]
-    df.rename(columns={'Avg. Yield (%)': 'Yield to Maturity', 'As of': 'Date'}, inplace=True)
-    return df
+    return load_issuer('vanguard')
 
 
 def state_street():
@@ -61,11 +204,7 @@ def state_street():
     :return: The State Street ETF data
     :rtype: pd.DataFrame
     """
-    filepath = build_file_path('state_street.csv')
-    df = pd.read_csv(filepath, index_col=0)
-    df = df[['Name', 'Yield to Maturity', 'As of Date']]
-    df.rename(columns={'Avg. Yield (%)': 'Yield to Maturity', 'As of Date': 'Date'}, inplace=True)
-    return df
+    return load_issuer('state_street')
 
 
 def schwab():
@@ -75,18 +214,7 @@ def schwab():
     :return: The Schwab ETF data
     :rtype: pd.DataFrame
     """
-    filepath = build_file_path('schwab.csv')
-    df = pd.read_csv(filepath, index_col=0)
-    # df = df[['ETF Name', 'Average Yield to Maturity', 'Average Yield to Maturity Date']]
-    # df.rename(columns={
-    #     'ETF Name': 'Name',
-    #     'Average Yield to Maturity': 'Yield to Maturity',
-    #     'Average Yield to Maturity Date': 'Date'
-    # }, inplace=True)
-    df.rename(columns={
-        'As of': 'Date'
-    }, inplace=True)
-    return df
+    return load_issuer('schwab')
 
 
 def invesco():
@@ -96,29 +224,7 @@ def invesco():
     :return: The Invesco ETF data
     :rtype: pd.DataFrame
     """
-    filepath = build_file_path('invesco.csv')
-    df = pd.read_csv(filepath, index_col=0)
-    df = df[[
-        'ETF Name',
-        'Yield to Maturity (%)',
-        'Yield to Worst (%)',
-        'Yield (%)',
-        'As of Date'
-    ]]
-    df.rename(columns={
-        'ETF Name': 'Name',
-        'Yield to Maturity (%)': 'Yield to Maturity',
-        'Yield to Worst (%)': 'Yield to Worst',
-        'Yield (%)': 'Yield',
-        'As of Date': 'Date'
-    }, inplace=True)
-    df['Yield to Maturity'] = df.apply(
-        lambda x: x['Yield to Worst'] if pd.notnull(x['Yield to Worst']) else (
-            x['Yield'] if pd.notnull(x['Yield']) else x['Yield to Maturity']),
-        axis=1
-    )
-    df.drop(columns=['Yield to Worst', 'Yield'], inplace=True)
-    return df
+    return load_issuer('invesco')
 
 
 def first_trust():
@@ -128,15 +234,7 @@ def first_trust():
     :return: The First Trust ETF data
     :rtype: pd.DataFrame
     """
-    filepath = build_file_path('first_trust.csv')
-    df = pd.read_csv(filepath, index_col=0)
-    df = df[['ETF Name', 'Weighted Average Yield-to-Worst', 'As of']]
-    df.rename(columns={
-        'ETF Name': 'Name',
-        'Weighted Average Yield-to-Worst': 'Yield to Maturity',
-        'As of': 'Date'
-    }, inplace=True)
-    return df
+    return load_issuer('first_trust')
 
 
 def jpmorgan():
@@ -146,11 +244,7 @@ def jpmorgan():
     :return: The JPMorgan ETF data
     :rtype: pd.DataFrame
     """
-    filepath = build_file_path('jpmorgan.csv')
-    df = pd.read_csv(filepath, index_col=0)
-    df = df[['Name', 'Yield to Maturity', 'As of Date']]
-    df.rename(columns={'As of Date': 'Date'}, inplace=True)
-    return df
+    return load_issuer('jpmorgan')
 
 
 def pimco():
@@ -160,11 +254,7 @@ def pimco():
     :return: The PIMCO ETF data
     :rtype: pd.DataFrame
     """
-    filepath = build_file_path('pimco.csv')
-    df = pd.read_csv(filepath, index_col=0)
-    df = df[['Name', 'Yield to Maturity', 'As of Date']]
-    df.rename(columns={'As of Date': 'Date'}, inplace=True)
-    return df
+    return load_issuer('pimco')
 
 
 def wisdomtree():
@@ -174,11 +264,7 @@ def wisdomtree():
     :return: The WisdomTree ETF data
     :rtype: pd.DataFrame
     """
-    filepath = build_file_path('wisdomtree.csv')
-    df = pd.read_csv(filepath, index_col=0)
-    df = df[['Name', 'Yield to Maturity', 'As of Date']]
-    df.rename(columns={'As of Date': 'Date'}, inplace=True)
-    return df
+    return load_issuer('wisdomtree')
 
 
 def vaneck():
@@ -188,11 +274,7 @@ def vaneck():
     :return: The VanEck ETF data
     :rtype: pd.DataFrame
     """
-    filepath = build_file_path('vaneck.csv')
-    df = pd.read_csv(filepath, index_col=0)
-    df = df[['Name', 'Yield to Maturity', 'As of Date']]
-    df.rename(columns={'As of Date': 'Date'}, inplace=True)
-    return df
+    return load_issuer('vaneck')
 
 
 def goldman_sachs():
@@ -202,11 +284,7 @@ def goldman_sachs():
     :return: The Goldman Sachs ETF data
     :rtype: pd.DataFrame
     """
-    filepath = build_file_path('goldman_sachs.csv')
-    df = pd.read_csv(filepath, index_col=0)
-    df = df[['Name', 'Yield to Maturity', 'As of Date']]
-    df.rename(columns={'As of Date': 'Date'}, inplace=True)
-    return df
+    return load_issuer('goldman_sachs')
 
 
 def janus_henderson():
@@ -216,11 +294,7 @@ def janus_henderson():
     :return: The Janus Henderson ETF data
     :rtype: pd.DataFrame
     """
-    filepath = build_file_path('janus_henderson.csv')
-    df = pd.read_csv(filepath, index_col=0)
-    df = df[['Name', 'Yield to Worst', 'As of Date']]
-    df.rename(columns={'Yield to Worst': 'Yield to Maturity', 'As of Date': 'Date'}, inplace=True)
-    return df
+    return load_issuer('janus_henderson')
 
 
 def dimensional():
@@ -230,11 +304,7 @@ def dimensional():
     :return: The Dimensional ETF data
     :rtype: pd.DataFrame
     """
-    filepath = build_file_path('dimensional.csv')
-    df = pd.read_csv(filepath, index_col=0)
-    df = df[['Name', 'Yield to Maturity', 'As of Date']]
-    df.rename(columns={'As of Date': 'Date'}, inplace=True)
-    return df
+    return load_issuer('dimensional')
 
 
 def flexshares():
@@ -244,19 +314,7 @@ def flexshares():
     :return: The FlexShares ETF data
     :rtype: pd.DataFrame
     """
-    filepath = build_file_path('flexshares.csv')
-    df = pd.read_csv(filepath, index_col=0)
-    df['WEIGHTED AVG YIELD TO MATURITY'] = df['WEIGHTED AVG YIELD TO MATURITY'].fillna(
-        df['WEIGHTED AVG YIELD TO WORST'])
-    df['WEIGHTED AVG YIELD TO MATURITY'] = df['WEIGHTED AVG YIELD TO MATURITY'].fillna(df['WEIGHTED AVG NOMINAL YIELD'])
-    df = df[['NAME', 'WEIGHTED AVG YIELD TO MATURITY', 'AS OF DATE']]
-    df.rename(columns={
-        'NAME': 'Name',
-        'WEIGHTED AVG YIELD TO MATURITY': 'Yield to Maturity',
-        'AS OF DATE': 'Date'
-    }, inplace=True)
-    df.index.name = 'Ticker'
-    return df
+    return load_issuer('flexshares')
 
 
 def combine_data():
@@ -266,38 +324,7 @@ def combine_data():
     :return: The processed ETF data
     :rtype: pd.DataFrame
     """
-    ishares_df = ishares()
-    vanguard_df = vanguard()
-    state_street_df = state_street()
-    schwab_df = schwab()
-    invesco_df = invesco()
-    first_trust_df = first_trust()
-    jpmorgan_df = jpmorgan()
-    pimco_df = pimco()
-    wisdomtree_df = wisdomtree()
-    vaneck_df = vaneck()
-    goldman_sachs_df = goldman_sachs()
-    janus_henderson_df = janus_henderson()
-    dimensional_df = dimensional()
-    flexshares_df = flexshares()
-
-    # List of dataframes
-    dfs = [
-        ishares_df,
-        vanguard_df,
-        state_street_df,
-        schwab_df,
-        invesco_df,
-        first_trust_df,
-        jpmorgan_df,
-        pimco_df,
-        wisdomtree_df,
-        vaneck_df,
-        goldman_sachs_df,
-        janus_henderson_df,
-        dimensional_df,
-        flexshares_df
-    ]
+    dfs = load_issuers().values()
 
     # Drop all-NA columns from each DataFrame before concatenation
     cleaned_dfs = [df.dropna(axis=1, how='all') for df in dfs]
@@ -308,7 +335,7 @@ def combine_data():
     return combined_df.dropna()
 
 
-def download_stock_data(tickers, period='3y'):
+def download_stock_data(tickers, period='3y', cache=True, offline=None, with_reference_rates=False):
     """
     :description: This function downloads the stock data.
 
@@ -316,110 +343,766 @@ def download_stock_data(tickers, period='3y'):
     :type tickers: list
     :param period: Period to download
     :type period: str
+    :param cache: Whether to serve the closes from the price cache in data/prices and download only the missing bars
+    :type cache: bool
+    :param offline: Whether to serve from the price cache only, without network access, defaults to the
+        YIELDQUERY_OFFLINE environment variable
+    :type offline: bool
+    :param with_reference_rates: Whether to download the reference rates in the same request and cache their last
+        close for get_risk_free_rate, stamped with the time the price cache last checked them. Nothing is cached in
+        offline mode, where the closes may be arbitrarily old.
+    :type with_reference_rates: bool
     :return: The stock data
     :rtype: pd.DataFrame
     """
-    ticker_str = ' '.join(tickers)
-    ticker_obj = Ticker(ticker_str, asynchronous=True)
-    stock_data = ticker_obj.history(period=period)
+    if offline is None:
+        offline = os.environ.get('YIELDQUERY_OFFLINE', '').lower() in ('1', 'true', 'yes')
+    rate_tickers = [ticker for ticker in reference_rates if ticker not in tickers] if with_reference_rates else []
+    if cache or offline:
+        stock_data = get_closes(list(tickers) + rate_tickers, period=period, offline=offline)
+    else:
+        ticker_str = ' '.join(list(tickers) + rate_tickers)
+        ticker_obj = Ticker(ticker_str, asynchronous=True)
+        stock_data = ticker_obj.history(period=period)
+
+    if rate_tickers:
+        symbols = stock_data.index.get_level_values('symbol')
+        if not offline:
+            # A close served from the price cache is as recent as the cache's last check of the ticker
+            index = load_index() if cache else {}
+            rates, fetched = {}, {}
+            for ticker in rate_tickers:
+                closes = stock_data.loc[symbols == ticker, 'close'].dropna()
+                if closes.empty:
+                    continue
+                rates[ticker] = (round(float(closes.iloc[-1]) / 100, 4), reference_rate_names[ticker])
+                if not cache:
+                    fetched[ticker] = pd.Timestamp.now()
+                elif 'checked' in index.get(ticker, {}):
+                    fetched[ticker] = pd.Timestamp(index[ticker]['checked'])
+                else:
+                    fetched[ticker] = pd.Timestamp(closes.index[-1][1])
+            store_reference_rates(rates, fetched)
+        stock_data = stock_data[~symbols.isin(rate_tickers)]
 
     return stock_data
 
 
-def get_standard_deviation(stock_data):
+def get_close_matrix(stock_data):
+    """
+    :description: This function pivots the stock data to a matrix of closes with one row per date and one column per
+        symbol.
+
+    :param stock_data: The stock data indexed by symbol and date
+    :type stock_data: pd.DataFrame
+    :return: The closes, NaN where a symbol has no bar
+    :rtype: pd.DataFrame
+    """
+    closes = stock_data['close']
+    dates = closes.index.get_level_values('date')
+    if not isinstance(dates, pd.DatetimeIndex):
+        # yahooquery mixes dates with timestamps of the running session
+        closes.index = pd.MultiIndex.from_arrays(
+            [closes.index.get_level_values('symbol'), normalize_dates(dates)], names=['symbol', 'date'])
+    closes = closes[~closes.index.duplicated(keep='last')]
+    return closes.unstack('symbol').sort_index()
+
+
+def get_returns(stock_data):
+    """
+    :description: This function calculates the daily returns of all symbols at once. The return of each bar is
+        relative to the previous close of the same symbol, so gaps in one symbol's history don't affect the others.
+        As with the forward-filled pct_change of a single symbol, a bar without a close has a return of 0.
+
+    :param stock_data: The stock data indexed by symbol and date
+    :type stock_data: pd.DataFrame
+    :return: The returns with one row per date and one column per symbol, NaN where a symbol has no return
+    :rtype: pd.DataFrame
+    """
+    closes = get_close_matrix(stock_data)
+    bars = get_close_matrix(stock_data.assign(close=1.0)).notna()
+    return closes.ffill().pct_change(fill_method=None).where(bars)
+
+
+def get_standard_deviation(stock_data, returns=None):
     """
     :description: This function calculates the standard deviation of the stock data.
 
     :param stock_data: The stock data
     :type stock_data: pd.DataFrame
+    :param returns: The returns of get_returns, calculated from stock_data if not given
+    :type returns: pd.DataFrame
     :return: Standard deviation of the stock data
     :rtype: pd.DataFrame
     """
-    std_devs = {}
-    for symbol in stock_data.index.get_level_values('symbol').unique():
-        symbol_data = stock_data.loc[symbol]
-        returns = symbol_data['close'].pct_change().dropna()
-        annualized_std_dev = returns.std() * np.sqrt(252)
-        std_devs[symbol] = annualized_std_dev
+    if returns is None:
+        returns = get_returns(stock_data)
+    std_devs = returns.std() * np.sqrt(252)
+
+    return round(std_devs.rename_axis(None).to_frame('Historical Volatility'), 4)
 
-    return round(pd.DataFrame.from_dict(std_devs, orient='index', columns=['Historical Volatility']), 4)
+
+def split_returns(returns):
+    """
+    :description: This function splits the returns matrix into the percentage returns of each symbol.
+
+    :param returns: The returns with one row per date and one column per symbol
+    :type returns: pd.DataFrame
+    :return: The percentage returns of each symbol without missing values
+    :rtype: dict
+    """
+    returns = returns * 100
+    return {symbol: returns[symbol].dropna() for symbol in returns.columns}
+
+
+def load_garch_params():
+    """
+    :description: Load the GARCH parameters stored by the previous run.
+
+    :return: The fitted parameters by key, see garch_param_key
+    :rtype: dict
+    """
+    if not os.path.exists(garch_params_file):
+        return {}
+    with open(garch_params_file) as f:
+        return json.load(f)
 
 
-# Function to tune GARCH parameters
-def tune_garch_parameters(returns):
+def save_garch_params(params):
+    """
+    :description: Store the fitted GARCH parameters as starting values for the next run.
+
+    :param params: The fitted parameters by key, see garch_param_key
+    :type params: dict
+    :return: None
+    :rtype: None
+    """
+    tmp_file = garch_params_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(params, f, indent=1, sort_keys=True)
+    os.replace(tmp_file, garch_params_file)
+
+
+def garch_param_key(symbol, p, q, kind):
+    """
+    :description: Build the key of a fitted GARCH model in the parameter store.
+
+    :param symbol: The ticker
+    :type symbol: str
+    :param p: The lag order of the squared innovations (ARCH terms)
+    :type p: int
+    :param q: The lag order of the conditional variance (GARCH terms)
+    :type q: int
+    :param kind: The kind of return series, e.g. 'returns' or 'downside'
+    :type kind: str
+    :return: The key
+    :rtype: str
+    """
+    return f'{symbol}|{p}|{q}|{kind}'
+
+
+def fit_garch(returns, p, q, starting_values=None):
+    """
+    :description: Fit a GARCH(p, q) model, starting the optimizer from the given parameters if any. Falls back to the
+        default starting values if the warm-started fit fails or does not converge.
+
+    :param returns: Returns in percent
+    :type returns: pd.Series
+    :param p: The lag order of the squared innovations (ARCH terms)
+    :type p: int
+    :param q: The lag order of the conditional variance (GARCH terms)
+    :type q: int
+    :param starting_values: Parameters of a previous fit of the same model
+    :type starting_values: list, optional
+    :return: The fitted result
+    :rtype: arch.univariate.base.ARCHModelResult
+    """
+    model = arch_model(returns, vol='Garch', p=p, o=0, q=q, rescale=False)
+    if starting_values is not None and len(starting_values) == model.num_params:
+        try:
+            res = model.fit(disp='off', starting_values=np.asarray(starting_values))
+            if res.convergence_flag == 0:
+                return res
+        except Exception:
+            pass
+    return model.fit(disp='off')
+
+
+def tune_garch_parameters(returns, return_aics=False, starting_values=None, fitted_params=None):
+    """
+    :description: Fit a GARCH model for every (p, q) order in {1, 2} x {1, 2} and select the one with the lowest AIC.
+
+    :param returns: Returns in percent
+    :type returns: pd.Series
+    :param return_aics: Whether to also return the AIC of every candidate order
+    :type return_aics: bool
+    :param starting_values: Parameters of previous fits by (p, q) order to warm-start the optimizer
+    :type starting_values: dict, optional
+    :param fitted_params: If given, filled with the fitted parameters by (p, q) order
+    :type fitted_params: dict, optional
+    :return: The best (p, q) order and its fitted result, both None if no order could be fitted, followed by the AIC
+        by order if return_aics is True
+    :rtype: tuple
+    """
+    starting_values = starting_values or {}
     best_aic = np.inf
     best_order = None
+    best_res = None
+    aics = {}
     p_values = range(1, 3)
     q_values = range(1, 3)
     for p in p_values:
         for q in q_values:
             try:
-                model = arch_model(returns, vol='Garch', p=p, o=0, q=q, rescale=False)
-                res = model.fit(disp='off')
-                if res.aic < best_aic:
-                    best_aic = res.aic
-                    best_order = (p, q)
-            except:
+                res = fit_garch(returns, p, q, starting_values.get((p, q)))
+            except Exception:
                 continue
-    return best_order
+            aics[(p, q)] = res.aic
+            if fitted_params is not None:
+                fitted_params[(p, q)] = res.params.tolist()
+            if res.aic < best_aic:
+                best_aic = res.aic
+                best_order = (p, q)
+                best_res = res
+    if return_aics:
+        return best_order, best_res, aics
+    return best_order, best_res
+
+
+def forecast_garch_volatility(returns, starting_values=None, fitted_params=None):
+    """
+    :description: Fit a GARCH model with the best (p, q) order to the returns and forecast the annualized volatility.
+
+    :param returns: Returns in percent
+    :type returns: pd.Series
+    :param starting_values: Parameters of previous fits by (p, q) order to warm-start the optimizer
+    :type starting_values: dict, optional
+    :param fitted_params: If given, filled with the fitted parameters by (p, q) order
+    :type fitted_params: dict, optional
+    :return: The annualized volatility forecast as a fraction, or None if no order could be fitted
+    :rtype: float
+    """
+    # Call the tuning function to get the fitted model with the best p and q
+    best_order, res = tune_garch_parameters(returns, starting_values=starting_values, fitted_params=fitted_params)
+    if res is None:
+        return None
 
+    # Get the last forecast of the conditional volatility and annualize it
+    forecast = res.forecast(start=0).variance.iloc[-1].iloc[0] ** 0.5 * np.sqrt(252)
 
-def get_expected_standard_deviation(stock_data):
-    expected_std_devs = {}
-    for symbol in tqdm(stock_data.index.get_level_values('symbol').unique()):
-        symbol_data = stock_data.loc[symbol]
-        returns = symbol_data['close'].pct_change().dropna() * 100
+    # Rescale the forecast back to the original scale
+    return round(forecast / 100, 4)
 
-        # Call the tuning function to get the best p and q
-        try:
-            best_p, best_q = tune_garch_parameters(returns)
-        except TypeError:
-            continue
 
-        # Fit a GARCH model with the best p and q
-        model = arch_model(returns, vol='GARCH', p=best_p, o=0, q=best_q, rescale=False)
-        res = model.fit(disp='off')
+def _forecast_garch_volatility_item(item):
+    """
+    :description: Process pool worker for forecast_garch_volatility.
 
-        # Get the last forecast of the conditional volatility and annualize it
-        forecast = res.forecast(start=0).variance.iloc[-1][0] ** 0.5 * np.sqrt(252)
+    :param item: The symbol, its returns and the starting values by (p, q) order
+    :type item: tuple
+    :return: The symbol, its forecast and the fitted parameters by (p, q) order
+    :rtype: tuple
+    """
+    symbol, returns, starting_values = item
+    fitted_params = {}
+    forecast = forecast_garch_volatility(returns, starting_values, fitted_params)
+    return symbol, forecast, fitted_params
 
-        # Rescale the forecast back to the original scale
-        expected_std_dev = forecast / 100
 
-        # Store the result
-        expected_std_devs[symbol] = round(expected_std_dev, 4)
+def forecast_garch_volatilities(returns_by_symbol, n_jobs=1, chunksize=None, progress=None, kind=None):
+    """
+    :description: Forecast the GARCH volatility of many symbols, optionally in parallel processes. The results are in
+        the order of the input regardless of which process finishes first.
+
+    :param returns_by_symbol: Returns in percent by symbol
+    :type returns_by_symbol: dict
+    :param n_jobs: Number of processes, 1 fits in the current process and -1 uses all CPU cores
+    :type n_jobs: int
+    :param chunksize: Number of symbols sent to a process at a time, defaults to about four chunks per process
+    :type chunksize: int, optional
+    :param progress: Called with (done, total) after each symbol, defaults to a tqdm progress bar
+    :type progress: callable, optional
+    :param kind: The kind of return series, e.g. 'returns' or 'downside'. If given, the fits are warm-started from
+        the parameters stored for this kind by the previous run, and the new parameters are stored.
+    :type kind: str, optional
+    :return: The annualized volatility forecast by symbol, symbols that could not be fitted are left out
+    :rtype: dict
+    """
+    stored_params = load_garch_params() if kind is not None else {}
+    items = []
+    for symbol, returns in returns_by_symbol.items():
+        starting_values = {}
+        if kind is not None:
+            for p, q in product(range(1, 3), range(1, 3)):
+                key = garch_param_key(symbol, p, q, kind)
+                if key in stored_params:
+                    starting_values[(p, q)] = stored_params[key]
+        items.append((symbol, returns, starting_values))
+    total = len(items)
+    n_jobs = os.cpu_count() if n_jobs == -1 else max(1, n_jobs)
+
+    bar = None
+    if progress is None:
+        bar = tqdm(total=total)
+
+        def progress(done, _):
+            bar.update(done - bar.n)
+
+    forecasts = {}
+    pool = None
+    try:
+        if n_jobs == 1 or total <= 1:
+            results = map(_forecast_garch_volatility_item, items)
+        else:
+            chunksize = chunksize or max(1, total // (n_jobs * 4))
+            pool = ProcessPoolExecutor(max_workers=n_jobs)
+            results = pool.map(_forecast_garch_volatility_item, items, chunksize=chunksize)
+        for done, (symbol, forecast, fitted_params) in enumerate(results, 1):
+            if forecast is not None:
+                forecasts[symbol] = forecast
+            if kind is not None:
+                for (p, q), params in fitted_params.items():
+                    stored_params[garch_param_key(symbol, p, q, kind)] = params
+            progress(done, total)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if bar is not None:
+            bar.close()
+
+    if kind is not None:
+        save_garch_params(stored_params)
+    return forecasts
+
+
+def pad_returns(returns_by_symbol):
+    """
+    :description: Stack return series of different lengths into one 2-D array, aligned on their last observation.
 
-    # Return the results as a DataFrame
-    return pd.DataFrame.from_dict(expected_std_devs, orient='index', columns=['Expected Volatility'])
+    :param returns_by_symbol: Returns by symbol
+    :type returns_by_symbol: dict
+    :return: The symbols, the returns of shape (symbols, observations) left-padded with zeros and the mask of the
+        observed values
+    :rtype: tuple
+    """
+    symbols = list(returns_by_symbol)
+    series = [np.asarray(returns_by_symbol[symbol], dtype=float) for symbol in symbols]
+    nobs = max((len(x) for x in series), default=0)
+    returns = np.zeros((len(series), nobs))
+    observed = np.zeros((len(series), nobs), dtype=bool)
+    for i, x in enumerate(series):
+        if len(x):
+            returns[i, nobs - len(x):] = x
+            observed[i, nobs - len(x):] = True
+    return symbols, returns, observed
+
+
+def garch_backcast(returns, observed):
+    """
+    :description: Pre-sample variance of each series, the exponentially weighted mean (0.94 decay) of the first 75
+        squared demeaned returns, as arch computes it.
+
+    :param returns: Padded returns of shape (symbols, observations)
+    :type returns: np.ndarray
+    :param observed: Mask of the observed values
+    :type observed: np.ndarray
+    :return: The backcast of each series
+    :rtype: np.ndarray
+    """
+    nobs = returns.shape[1]
+    counts = observed.sum(1)
+    means = (returns * observed).sum(1) / counts
+    first = nobs - counts
+    lags = np.arange(garch_backcast_window)
+    index = np.minimum(first[:, None] + lags, nobs - 1)
+    weights = np.where(lags < np.minimum(garch_backcast_window, counts)[:, None], 0.94 ** lags, 0.0)
+    weights /= weights.sum(1, keepdims=True)
+    resids = np.take_along_axis(returns, index, 1) - means[:, None]
+    return (resids ** 2 * weights).sum(1)
+
+
+def garch_variance(params, returns, observed, backcast, p, q):
+    """
+    :description: Conditional variances of constant mean GARCH(p, q) models, computed for all series at once. Before
+        its first observation each series holds its backcast, so every series starts like a separate arch model.
+
+    :param params: Parameters of shape (symbols, 2 + p + q) ordered as mu, omega, alpha_1..p, beta_1..q
+    :type params: np.ndarray
+    :param returns: Padded returns of shape (symbols, observations)
+    :type returns: np.ndarray
+    :param observed: Mask of the observed values
+    :type observed: np.ndarray
+    :param backcast: The backcast of each series
+    :type backcast: np.ndarray
+    :param p: The lag order of the squared innovations (ARCH terms)
+    :type p: int
+    :param q: The lag order of the conditional variance (GARCH terms)
+    :type q: int
+    :return: The squared residuals of shape (symbols, observations) and the conditional variances of shape
+        (symbols, observations + 1), the last column being the one-step forecast
+    :rtype: tuple
+    """
+    n, nobs = returns.shape
+    m = max(p, q)
+    mu, omega = params[:, 0], params[:, 1]
+    alpha, beta = params[:, 2:2 + p].T, params[:, 2 + p:].T
+
+    # Time-major arrays, so every step reads and writes contiguous rows
+    resids2 = np.where(observed.T, (returns.T - mu) ** 2, backcast)
+    lagged_resids2 = np.concatenate([np.broadcast_to(backcast, (m, n)), resids2])
+    sigma2 = np.empty((m + nobs + 1, n))
+    sigma2[:m] = backcast
+    not_started = ~observed.T
+    last_start = not_started.sum(0).max()
+    for t in range(nobs + 1):
+        s = m + t
+        variance = omega.copy()
+        for i in range(p):
+            variance += alpha[i] * lagged_resids2[s - 1 - i]
+        for j in range(q):
+            variance += beta[j] * sigma2[s - 1 - j]
+        if t < last_start:
+            np.copyto(variance, backcast, where=not_started[t])
+        sigma2[s] = variance
+    return resids2.T, sigma2[m:].T
+
+
+def garch_loglikelihood(params, returns, observed, backcast, p, q):
+    """
+    :description: Gaussian log-likelihood and one-step variance forecast of constant mean GARCH(p, q) models, computed
+        for all series at once.
+
+    :param params: Parameters of shape (symbols, 2 + p + q) ordered as mu, omega, alpha_1..p, beta_1..q
+    :type params: np.ndarray
+    :param returns: Padded returns of shape (symbols, observations)
+    :type returns: np.ndarray
+    :param observed: Mask of the observed values
+    :type observed: np.ndarray
+    :param backcast: The backcast of each series
+    :type backcast: np.ndarray
+    :param p: The lag order of the squared innovations (ARCH terms)
+    :type p: int
+    :param q: The lag order of the conditional variance (GARCH terms)
+    :type q: int
+    :return: The log-likelihood and the one-step variance forecast of each series
+    :rtype: tuple
+    """
+    resids2, sigma2 = garch_variance(params, returns, observed, backcast, p, q)
+    loglikelihood = -0.5 * (np.log(2 * np.pi) + np.log(sigma2[:, :-1]) + resids2 / sigma2[:, :-1])
+    return np.where(observed, loglikelihood, 0.0).sum(1), sigma2[:, -1]
 
 
-def get_expected_semi_deviation(stock_data):
-    expected_semi_devs = {}
-    for symbol in tqdm(stock_data.index.get_level_values('symbol').unique()):
-        symbol_data = stock_data.loc[symbol]
-        returns = symbol_data['close'].pct_change().dropna() * 100
+def garch_lag_weights(order):
+    """
+    :description: Ways to spread a starting coefficient over the lags of a GARCH term: evenly, all on the first lag and
+        all on the last lag.
 
-        # Filter negative returns
-        negative_returns = returns[returns < returns.mean()]
+    :param order: The lag order
+    :type order: int
+    :return: The distinct weights of the lags
+    :rtype: list
+    """
+    shapes = [(1 / order,) * order, (1.0,) + (0.0,) * (order - 1), (0.0,) * (order - 1) + (1.0,)]
+    return list(dict.fromkeys(shapes))
 
-        # Call the tuning function to get the best p and q
-        try:
-            best_p, best_q = tune_garch_parameters(negative_returns)
-        except TypeError:
-            continue
 
-        # Fit a GARCH model with the best p and q
-        model = arch_model(negative_returns, vol='GARCH', p=best_p, o=0, q=best_q, rescale=False)
-        res = model.fit(disp='off')
+def fit_garch_batch(returns, observed, p=1, q=1, maxiter=100, tol=1e-8):
+    """
+    :description: Fit constant mean GARCH(p, q) models with normal innovations to many series at once with a batched
+        projected Newton method. Each series takes its own Newton steps on its negative log-likelihood per
+        observation, with its gradient and Hessian taken by finite differences. The likelihoods of all the perturbed
+        and trial parameter sets of all series are computed in one batched recursion per iteration. Higher orders
+        have several local optima, so every way of spreading the ARCH and GARCH terms over their lags is started
+        from, see garch_lag_weights, and the best converged fit of each series is kept. A fit that does not reach
+        tol is flagged as not converged and is only an approximation of the maximum likelihood estimate.
+
+    :param returns: Padded returns in percent of shape (symbols, observations), see pad_returns
+    :type returns: np.ndarray
+    :param observed: Mask of the observed values
+    :type observed: np.ndarray
+    :param p: The lag order of the squared innovations (ARCH terms)
+    :type p: int
+    :param q: The lag order of the conditional variance (GARCH terms)
+    :type q: int
+    :param maxiter: Maximum number of Newton iterations
+    :type maxiter: int
+    :param tol: A series has converged once its Newton decrement, the decrease of its loss a full Newton step
+        predicts, with the variables held at their bounds left out, is below this
+    :type tol: float
+    :return: The params, loglikelihood, aic and forecast (one-step variance) of each series and whether each series
+        converged
+    :rtype: dict
+    """
+    n = len(returns)
+    k = 2 + p + q
+    counts = observed.sum(1)
+    means = (returns * observed).sum(1) / counts
+    variances = (np.where(observed, returns - means[:, None], 0.0) ** 2).sum(1) / counts
+    backcast = garch_backcast(returns, observed)
+
+    def loss(params, rows):
+        # Negative log-likelihood per observation of the parameter sets of the series in rows
+        values = np.empty(len(params))
+        for start in range(0, len(params), garch_batch_rows):
+            chunk = slice(start, start + garch_batch_rows)
+            series = rows[chunk]
+            loglikelihood, _ = garch_loglikelihood(params[chunk], returns[series], observed[series],
+                                                   backcast[series], p, q)
+            persistence = params[chunk, 2:].sum(1)
+            penalty = 1e4 * np.maximum(persistence - garch_max_persistence, 0.0) ** 2
+            values[chunk] = -loglikelihood / counts[series] + penalty
+        return values
+
+    # Bound the parameters and start each series from the best point of arch's starting value grid, once for every
+    # way of spreading the terms over their lags
+    lower = np.column_stack([means - 10 * np.sqrt(variances), 1e-6 * variances, np.zeros((n, p + q))])
+    upper = np.column_stack([means + 10 * np.sqrt(variances), 10 * variances, np.ones((n, p + q))])
+    grid = [(alpha, persistence) for alpha in (0.01, 0.05, 0.1, 0.2) for persistence in (0.5, 0.7, 0.9, 0.98)
+            if persistence > alpha]
+    shapes = list(product(garch_lag_weights(p), garch_lag_weights(q)))
+    starts = []
+    for alpha_weights, beta_weights in shapes:
+        candidates = np.stack([
+            np.column_stack([means, (1 - persistence) * variances,
+                             np.tile(alpha * np.asarray(alpha_weights), (n, 1)),
+                             np.tile((persistence - alpha) * np.asarray(beta_weights), (n, 1))])
+            for alpha, persistence in grid
+        ])
+        candidate_f = loss(candidates.reshape(-1, k), np.tile(np.arange(n), len(grid))).reshape(len(grid), n)
+        starts.append(candidates[candidate_f.argmin(0), np.arange(n)])
+
+    # All starts of all series are minimized together as rows of one batch
+    rows = np.tile(np.arange(n), len(shapes))
+    x = np.concatenate(starts)
+    f = loss(x, rows)
+    lower, upper = lower[rows], upper[rows]
+    converged = np.zeros(len(rows), dtype=bool)
+    stalled = np.zeros(len(rows), dtype=bool)
+    pairs = [(j, m) for j in range(k) for m in range(j + 1, k)]
+    step_lengths = 0.5 ** np.arange(12)
+    identity = np.eye(k)
+
+    for _ in range(maxiter):
+        active = np.flatnonzero(~converged & ~stalled)
+        if not active.size:
+            break
+        xa, la, ua, fa, ra = x[active], lower[active], upper[active], f[active], rows[active]
+
+        # Finite differences around a point kept h inside the bounds
+        h = np.minimum(1e-4 * np.maximum(np.abs(xa), 1e-3), (ua - la) / 4)
+        c = np.clip(xa, la + h, ua - h)
+        sets = [c]
+        for j in range(k):
+            sets.extend([c + h[:, j, None] * identity[j], c - h[:, j, None] * identity[j]])
+        for j, m in pairs:
+            for sj, sm in ((1, 1), (1, -1), (-1, 1), (-1, -1)):
+                sets.append(c + sj * h[:, j, None] * identity[j] + sm * h[:, m, None] * identity[m])
+        values = loss(np.concatenate(sets), np.tile(ra, len(sets))).reshape(len(sets), -1)
+        center, plus, minus = values[0], values[1:2 * k + 1:2].T, values[2:2 * k + 2:2].T
+        gradient = (plus - minus) / (2 * h)
+        hessian = np.zeros((len(active), k, k))
+        hessian[:, range(k), range(k)] = (plus - 2 * center[:, None] + minus) / h ** 2
+        for index, (j, m) in enumerate(pairs):
+            pp, pm, mp, mm = values[2 * k + 1 + 4 * index:2 * k + 5 + 4 * index]
+            hessian[:, j, m] = hessian[:, m, j] = (pp - pm - mp + mm) / (4 * h[:, j] * h[:, m])
+
+        # Hold the variables that sit on a bound and are pushed against it
+        held = ((xa <= la + h) & (gradient > 0)) | ((xa >= ua - h) & (gradient < 0))
+        gradient = np.where(held, 0.0, gradient)
+        free = ~held
+        hessian = hessian * free[:, :, None] * free[:, None, :] + identity * held[:, :, None]
+
+        # Newton direction with the Hessian made positive definite
+        eigenvalues, eigenvectors = np.linalg.eigh(hessian)
+        eigenvalues = np.maximum(np.abs(eigenvalues), 1e-8 * np.maximum(np.abs(eigenvalues).max(1, keepdims=True), 1))
+        direction = -np.einsum('nij,nj->ni', eigenvectors,
+                               np.einsum('nji,nj->ni', eigenvectors, gradient) / eigenvalues)
+
+        # The series whose Newton step predicts less than tol have converged
+        done = -np.einsum('nk,nk->n', gradient, direction) / 2 <= tol
+        converged[active[done]] = True
+
+        # Scaled steepest descent as fallback where the Newton direction finds no decrease
+        fallback = -gradient / np.maximum(np.abs(hessian[:, range(k), range(k)]), 1e-8)
+
+        # Projected backtracking line search, all step lengths of both directions evaluated at once
+        steps = step_lengths[:, None, None]
+        trials = np.clip(np.concatenate([xa[None] + steps * direction[None], xa[None] + steps * fallback[None]]),
+                         la, ua)
+        trial_f = loss(trials.reshape(-1, k), np.tile(ra, len(trials))).reshape(len(trials), -1)
+        decrease = np.einsum('snk,nk->sn', trials - xa[None], gradient)
+        accepted = trial_f <= fa[None] + 1e-4 * decrease
+        found = accepted.any(0) & ~done
+        choice = accepted.argmax(0)
+        x[active] = np.where(found[:, None], trials[choice, np.arange(len(active))], xa)
+        f[active] = np.where(found, trial_f[choice, np.arange(len(active))], fa)
+
+        # A series that can no longer decrease its loss is left where it is, not converged
+        stalled[active[~found & ~done]] = True
+
+    # Keep the best start of each series, preferring the converged ones
+    ranked = np.where(converged, f, f + np.inf).reshape(len(shapes), n)
+    ranked = np.where(np.isfinite(ranked).any(0), ranked, f.reshape(len(shapes), n))
+    best = ranked.argmin(0) * n + np.arange(n)
+    x, converged = x[best], converged[best]
+
+    loglikelihood, forecast = garch_loglikelihood(x, returns, observed, backcast, p, q)
+    return {
+        'params': x,
+        'loglikelihood': loglikelihood,
+        'aic': -2 * loglikelihood + 2 * k,
+        'forecast': forecast,
+        'converged': converged
+    }
+
+
+def forecast_garch_volatilities_numpy(returns_by_symbol, orders=((1, 1), (1, 2), (2, 1), (2, 2))):
+    """
+    :description: Vectorized alternative to forecast_garch_volatilities. Fits every (p, q) order to all symbols in
+        batch with fit_garch_batch and forecasts the annualized volatility from the order with the lowest AIC. The
+        symbols whose batch fit did not converge, and those too short for a stable batch fit, are fitted with
+        arch_model instead, so both backends forecast the same symbols.
+
+    :param returns_by_symbol: Returns in percent by symbol
+    :type returns_by_symbol: dict
+    :param orders: The candidate (p, q) orders
+    :type orders: tuple
+    :return: The annualized volatility forecast by symbol, symbols that could not be fitted are left out
+    :rtype: dict
+    """
+    short = {symbol: returns for symbol, returns in returns_by_symbol.items()
+             if len(returns) < garch_min_observations}
+    forecasts = forecast_garch_volatilities(short) if short else {}
+    batch = {symbol: returns for symbol, returns in returns_by_symbol.items() if symbol not in short}
+    if not batch:
+        return forecasts
+    symbols, returns, observed = pad_returns(batch)
+
+    best_aic = np.full(len(symbols), np.inf)
+    best_forecast = np.full(len(symbols), np.nan)
+    for p, q in tqdm(orders):
+        fit = fit_garch_batch(returns, observed, p, q)
+        for i in np.flatnonzero(~fit['converged']):
+            try:
+                res = fit_garch(batch[symbols[i]], p, q)
+            except Exception:
+                fit['aic'][i] = np.inf
+                continue
+            fit['aic'][i] = res.aic
+            fit['forecast'][i] = res.forecast(start=0).variance.iloc[-1].iloc[0]
+        better = fit['aic'] < best_aic
+        best_aic[better] = fit['aic'][better]
+        best_forecast[better] = fit['forecast'][better]
+
+    # Annualize the forecast and rescale it back to the original scale
+    annualized = np.sqrt(best_forecast) * np.sqrt(252) / 100
+    forecasts.update((symbol, round(forecast, 4)) for symbol, forecast in zip(symbols, annualized)
+                     if np.isfinite(forecast))
+    return {symbol: forecasts[symbol] for symbol in returns_by_symbol if symbol in forecasts}
+
+
+def validate_numpy_garch(returns_by_symbol, p=1, q=1, tolerance=0.01):
+    """
+    :description: Compare the volatility forecasts of fit_garch_batch with those of arch_model for the same order. A
+        symbol is within the tolerance if its batch fit converged and either the forecasts agree or the batch fit
+        reached a higher log-likelihood, i.e. arch stopped at a worse local optimum.
+
+    :param returns_by_symbol: Returns in percent by symbol
+    :type returns_by_symbol: dict
+    :param p: The lag order of the squared innovations (ARCH terms)
+    :type p: int
+    :param q: The lag order of the conditional variance (GARCH terms)
+    :type q: int
+    :param tolerance: Maximum relative difference of the annualized volatility forecasts
+    :type tolerance: float
+    :return: The forecasts and log-likelihoods of both backends, whether the batch fit converged, the relative
+        difference of the forecasts and whether it is within the tolerance by symbol
+    :rtype: pd.DataFrame
+    """
+    returns_by_symbol = {symbol: returns for symbol, returns in returns_by_symbol.items()
+                         if len(returns) >= garch_min_observations}
+    symbols, returns, observed = pad_returns(returns_by_symbol)
+    fit = fit_garch_batch(returns, observed, p, q)
+
+    rows = {}
+    for i, symbol in enumerate(symbols):
+        res = arch_model(returns_by_symbol[symbol], vol='Garch', p=p, o=0, q=q, rescale=False).fit(disp='off')
+        rows[symbol] = {
+            'NumPy Volatility': np.sqrt(fit['forecast'][i] * 252) / 100,
+            'arch Volatility': np.sqrt(res.forecast(start=0).variance.iloc[-1].iloc[0] * 252) / 100,
+            'NumPy Log-Likelihood': fit['loglikelihood'][i],
+            'arch Log-Likelihood': res.loglikelihood,
+            'Converged': fit['converged'][i]
+        }
+    df = pd.DataFrame.from_dict(rows, orient='index')
+    df['Relative Difference'] = (df['NumPy Volatility'] - df['arch Volatility']).abs() / df['arch Volatility']
+    better = df['NumPy Log-Likelihood'] > df['arch Log-Likelihood'] + 1e-3
+    df['Within Tolerance'] = df['Converged'] & ((df['Relative Difference'] <= tolerance) | better)
+    return df
+
+
+def get_expected_standard_deviation(stock_data, n_jobs=1, warm_start=True, backend='arch', returns=None):
+    """
+    :description: This function forecasts the annualized volatility of each symbol with a tuned GARCH model.
+
+    :param stock_data: The stock data
+    :type stock_data: pd.DataFrame
+    :param n_jobs: Number of processes fitting the models, -1 uses all CPU cores
+    :type n_jobs: int
+    :param warm_start: Whether to start the fits from the parameters of the previous run
+    :type warm_start: bool
+    :param backend: 'arch' to fit each symbol with arch_model or 'numpy' to fit all symbols in batch with
+        fit_garch_batch, which ignores n_jobs and warm_start
+    :type backend: str
+    :param returns: The returns of get_returns, calculated from stock_data if not given
+    :type returns: pd.DataFrame
+    :return: Expected volatility of the stock data
+    :rtype: pd.DataFrame
+    """
+    if returns is None:
+        returns = get_returns(stock_data)
+    symbol_returns = split_returns(returns)
+
+    if backend == 'numpy':
+        expected_std_devs = forecast_garch_volatilities_numpy(symbol_returns)
+    else:
+        expected_std_devs = forecast_garch_volatilities(
+            symbol_returns, n_jobs=n_jobs, kind='returns' if warm_start else None)
 
-        # Get the last forecast of the conditional volatility and annualize it
-        forecast = res.forecast(start=0).variance.iloc[-1].iloc[0] ** 0.5 * np.sqrt(252)
+    # Return the results as a DataFrame
+    return pd.DataFrame.from_dict(expected_std_devs, orient='index', columns=['Expected Volatility'])
 
-        # Rescale the forecast back to the original scale
-        expected_semi_dev = forecast / 100
 
-        # Store the result
-        expected_semi_devs[symbol] = round(expected_semi_dev, 4)
+def get_expected_semi_deviation(stock_data, n_jobs=1, warm_start=True, backend='arch', returns=None):
+    """
+    :description: This function forecasts the annualized downside volatility of each symbol with a tuned GARCH model
+        fitted to the returns below the mean.
+
+    :param stock_data: The stock data
+    :type stock_data: pd.DataFrame
+    :param n_jobs: Number of processes fitting the models, -1 uses all CPU cores
+    :type n_jobs: int
+    :param warm_start: Whether to start the fits from the parameters of the previous run
+    :type warm_start: bool
+    :param backend: 'arch' to fit each symbol with arch_model or 'numpy' to fit all symbols in batch with
+        fit_garch_batch, which ignores n_jobs and warm_start
+    :type backend: str
+    :param returns: The returns of get_returns, calculated from stock_data if not given
+    :type returns: pd.DataFrame
+    :return: Expected downside volatility of the stock data
+    :rtype: pd.DataFrame
+    """
+    if returns is None:
+        returns = get_returns(stock_data)
+
+    # Keep the returns below the mean
+    symbol_returns = split_returns(returns.where(returns < returns.mean()))
+
+    if backend == 'numpy':
+        expected_semi_devs = forecast_garch_volatilities_numpy(symbol_returns)
+    else:
+        expected_semi_devs = forecast_garch_volatilities(
+            symbol_returns, n_jobs=n_jobs, kind='downside' if warm_start else None)
 
     # Return the results as a DataFrame
     return pd.DataFrame.from_dict(
@@ -429,38 +1112,120 @@ def get_expected_semi_deviation(stock_data):
     )
 
 
-def get_risk_free_rate(ticker: str = '^TNX') -> Tuple[float, str]:
+def load_reference_rates():
     """
-    Fetch the risk-free rate from a specific ticker, typically a Treasury note yield.
+    :description: Load the reference rates cached on disk into the in-memory cache.
+
+    :return: The cached rates by ticker, each with its rate, name and fetch time
+    :rtype: dict
+    """
+    if not _reference_rates and os.path.exists(reference_rates_file):
+        with open(reference_rates_file) as f:
+            _reference_rates.update(json.load(f))
+    return _reference_rates
+
+
+def store_reference_rates(rates, fetched=None):
+    """
+    :description: Store reference rates in the in-memory and the on-disk cache.
+
+    :param rates: (rate, name) by ticker, the rates as fractions
+    :type rates: dict
+    :param fetched: When the rates were fetched, for all rates or by ticker, defaults to now. A cached rate fetched
+        later is kept.
+    :type fetched: pd.Timestamp or dict
+    :return: None
+    :rtype: None
+    """
+    cache = load_reference_rates()
+    now = pd.Timestamp.now()
+    for ticker, (rate, name) in rates.items():
+        stamp = fetched.get(ticker) if isinstance(fetched, dict) else fetched
+        stamp = pd.Timestamp(stamp if stamp is not None else now)
+        if ticker in cache and pd.Timestamp(cache[ticker]['fetched']) > stamp:
+            continue
+        cache[ticker] = {'rate': rate, 'name': name, 'fetched': stamp.isoformat()}
+
+    tmp_file = reference_rates_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(tmp_file, reference_rates_file)
+
+
+def fetch_reference_rates(tickers=reference_rates):
+    """
+    :description: Fetch the current quotes of reference rates in one request and cache them.
+
+    :param tickers: The tickers of the rates
+    :type tickers: tuple
+    :return: (rate, name) by ticker, the rates as fractions
+    :rtype: dict
+    """
+    data_dict = Ticker(' '.join(tickers)).price
+    rates = {}
+    for ticker in tickers:
+        quote = data_dict.get(ticker)
+        if isinstance(quote, dict) and quote.get('regularMarketPrice') is not None:
+            rates[ticker] = (round(quote['regularMarketPrice'] / 100, 4), quote.get('longName', ticker))
+    store_reference_rates(rates)
+    return rates
+
+
+def get_risk_free_rate(ticker: str = '^TNX', ttl: pd.Timedelta = None, offline: bool = None) -> Tuple[float, str]:
+    """
+    Get the risk-free rate from a specific ticker, typically a Treasury note yield. The rate is served from the
+    in-memory or on-disk cache while it is fresh; otherwise all reference rates are fetched again in one request. In
+    offline mode the cached rate is served however old it is.
 
     Parameters:
     - ticker (str, optional): The ticker symbol for the risk-free rate, defaults to '^TNX' for 10-year Treasury note
                               yield.
+    - ttl (pd.Timedelta, optional): How long a cached rate is served, defaults to reference_rate_ttl.
+    - offline (bool, optional): Whether to serve from the cache only, without network access, defaults to the
+                                YIELDQUERY_OFFLINE environment variable.
 
     Returns:
     - Tuple[float, str]: A tuple containing the risk-free rate as a float and the long name of the risk-free rate
                          source.
-    """
-    data_dict = Ticker(ticker).price
-    risk_free_rate = pd.DataFrame.from_dict(data_dict, orient='index').transpose()
-    risk_free_rate_name = risk_free_rate.loc['longName'].squeeze()
-    risk_free_rate = round(risk_free_rate.loc['regularMarketPrice'].squeeze() / 100, 4)
-    return risk_free_rate, risk_free_rate_name
 
-
-def process_data(mar: float = None) -> pd.DataFrame:
+    Raises:
+    - KeyError: In offline mode, if the rate has never been cached.
+    """
+    if offline is None:
+        offline = os.environ.get('YIELDQUERY_OFFLINE', '').lower() in ('1', 'true', 'yes')
+    ttl = reference_rate_ttl if ttl is None else ttl
+    cached = load_reference_rates().get(ticker)
+    if offline:
+        if cached is None:
+            raise KeyError(f'No cached rate for {ticker} to serve offline')
+    elif cached is None or pd.Timestamp.now() - pd.Timestamp(cached['fetched']) >= ttl:
+        tickers = reference_rates if ticker in reference_rates else reference_rates + (ticker,)
+        fetch_reference_rates(tickers)
+        cached = _reference_rates[ticker]
+    return cached['rate'], cached['name']
+
+
+def process_data(mar: float = None, n_jobs: int = 1, backend: str = 'arch', offline: bool = None) -> pd.DataFrame:
     """
     :description: This function processes the ETF data.
 
     :param mar: The minimum acceptable return.
     :type mar: float
+    :param n_jobs: Number of processes fitting the GARCH models, -1 uses all CPU cores.
+    :type n_jobs: int
+    :param backend: 'arch' or 'numpy', the GARCH backend of get_expected_semi_deviation.
+    :type backend: str
+    :param offline: Whether to serve the price history from the price cache only, without network access, defaults to
+        the YIELDQUERY_OFFLINE environment variable.
+    :type offline: bool
     :return: The processed ETF data.
     :rtype: pd.DataFrame
     """
     df = combine_data()  # Assuming this returns a DataFrame with ETF data
     tickers = list(df.index)
-    stock_data_dict = download_stock_data(tickers)
-    expected_semi_dev_df = get_expected_semi_deviation(stock_data_dict)
+    stock_data_dict = download_stock_data(tickers, offline=offline, with_reference_rates=mar is None)
+    returns = get_returns(stock_data_dict)
+    expected_semi_dev_df = get_expected_semi_deviation(stock_data_dict, n_jobs=n_jobs, backend=backend, returns=returns)
     expected_semi_dev_df.index.name = 'Ticker'
 
     # Ensure both DataFrames have 'Ticker' as their index name for clarity
@@ -491,7 +1256,7 @@ def process_data(mar: float = None) -> pd.DataFrame:
             2
         )
     else:
-        rf = get_risk_free_rate()[0]
+        rf = get_risk_free_rate(offline=offline)[0]
         final_df['Sortino Ratio'] = round(
             (final_df['Yield to Maturity'] - rf) /
             final_df['Downside Volatility'],
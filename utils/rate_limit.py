@@ -0,0 +1,168 @@
+import time
+import asyncio
+import threading
+from urllib.parse import urlsplit
+
+# Host of each issuer's website
+issuer_hosts = {
+    'dimensional': 'www.dimensional.com',
+    'first_trust': 'www.ftportfolios.com',
+    'flexshares': 'www.flexshares.com',
+    'goldman_sachs': 'www.gsam.com',
+    'invesco': 'www.invesco.com',
+    'ishares': 'www.ishares.com',
+    'janus_henderson': 'www.janushenderson.com',
+    'jpmorgan': 'am.jpmorgan.com',
+    'pimco': 'www.pimco.com',
+    'schwab': 'www.schwabassetmanagement.com',
+    'state_street': 'www.ssga.com',
+    'vanguard': 'investor.vanguard.com',
+    'vaneck': 'www.vaneck.com',
+    'wisdomtree': 'www.wisdomtree.com',
+}
+
+# Sustained requests per second and burst size per host. This is the one place to tune throughput: lower the rate of
+# a host that starts throttling us, raise it for a host that allows more. The limits are shared by the Selenium bots
+# and the HTTP client.
+rate_limits = {
+    'www.dimensional.com': (1.0, 2),
+    'www.ftportfolios.com': (1.0, 5),
+    'www.flexshares.com': (1.0, 2),
+    'www.gsam.com': (0.5, 2),
+    'www.invesco.com': (0.5, 2),
+    'www.ishares.com': (2.0, 8),
+    'www.schwabassetmanagement.com': (1.0, 2),
+    'www.ssga.com': (1.0, 2),
+    'investor.vanguard.com': (1.0, 2),
+}
+default_rate_limit = (2.0, 4)
+
+
+class TokenBucket:
+    """
+    Token bucket holding up to burst tokens that refill at rate tokens per second. Every request takes one token.
+    Callers that find the bucket empty reserve a future token and wait for it, so concurrent callers are served in
+    order without polling. Safe to use from several threads and event loops at once.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take a token
+
+        :return: Seconds to wait until the token is available
+        :rtype: float
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self):
+        """
+        Take a token, sleeping until it is available
+
+        :return: None
+        :rtype: None
+        """
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """
+        Take a token, awaiting until it is available
+
+        :return: None
+        :rtype: None
+        """
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(host):
+    """
+    Get the token bucket of the host, creating it from rate_limits on first use
+
+    :param host: The host name, e.g. 'www.ssga.com'
+    :type host: str
+    :return: The token bucket
+    :rtype: TokenBucket
+    """
+    with _buckets_lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            bucket = _buckets[host] = TokenBucket(*rate_limits.get(host, default_rate_limit))
+        return bucket
+
+
+def set_rate_limit(host, rate, burst):
+    """
+    Change the rate limit of a host while running
+
+    :param host: The host name, e.g. 'www.ssga.com'
+    :type host: str
+    :param rate: Sustained requests per second
+    :type rate: float
+    :param burst: Number of requests allowed back to back
+    :type burst: int
+    :return: None
+    :rtype: None
+    """
+    rate_limits[host] = (rate, burst)
+    bucket = get_bucket(host)
+    with bucket._lock:
+        bucket.rate = rate
+        bucket.burst = burst
+        bucket._tokens = min(bucket._tokens, burst)
+
+
+def host_of(target):
+    """
+    Get the host to rate limit for an issuer key or a url
+
+    :param target: The issuer key, e.g. 'vanguard', or a url
+    :type target: str
+    :return: The host name
+    :rtype: str
+    """
+    if target in issuer_hosts:
+        return issuer_hosts[target]
+    return urlsplit(target).hostname or target
+
+
+def acquire(target):
+    """
+    Wait for the rate limit of the issuer's or url's host
+
+    :param target: The issuer key, e.g. 'vanguard', or a url
+    :type target: str
+    :return: None
+    :rtype: None
+    """
+    get_bucket(host_of(target)).acquire()
+
+
+async def acquire_async(target):
+    """
+    Await the rate limit of the issuer's or url's host
+
+    :param target: The issuer key, e.g. 'vanguard', or a url
+    :type target: str
+    :return: None
+    :rtype: None
+    """
+    await get_bucket(host_of(target)).acquire_async()
@@ -0,0 +1,133 @@
+import os
+import datetime
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Format of the dates in the CSV files
+csv_date_format = '%m-%d-%Y'
+
+
+def snapshot_path(csv_path):
+    """
+    Get the path of the Parquet snapshot stored next to a CSV file
+
+    :param csv_path: The path of the CSV file, e.g. data/vanguard.csv
+    :type csv_path: str
+    :return: The path of the snapshot, e.g. data/vanguard.parquet
+    :rtype: str
+    """
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+
+def is_date_column(column):
+    """
+    Check whether a column holds as of dates
+
+    :param column: The column name
+    :type column: str
+    :return: Whether the name contains 'date' or is 'As of'
+    :rtype: bool
+    """
+    return isinstance(column, str) and ('date' in column.lower() or column.lower() == 'as of')
+
+
+def parse_dates(values):
+    """
+    Convert a column of MM-DD-YYYY strings, or dates, to datetimes. Columns with values in any other format are kept
+    as they are, so no value is lost.
+
+    :param values: The column
+    :type values: pd.Series
+    :return: The dates
+    :rtype: pd.Series
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    strings = values.map(lambda value: value.strftime(csv_date_format)
+                         if isinstance(value, (datetime.date, pd.Timestamp)) else value)
+    parsed = pd.to_datetime(strings, format=csv_date_format, errors='coerce')
+    if parsed.notna().sum() != values.notna().sum():
+        return values
+    return parsed
+
+
+def to_typed(df):
+    """
+    Convert the columns of a snapshot to the types they are stored with: dates to datetimes, and columns mixing
+    numbers and strings to numbers if they all parse, or else to strings
+
+    :param df: The snapshot
+    :type df: pd.DataFrame
+    :return: The typed snapshot
+    :rtype: pd.DataFrame
+    """
+    df = df.copy()
+    df.columns = [str(column) for column in df.columns]
+    for column in df.columns:
+        if is_date_column(column):
+            df[column] = parse_dates(df[column])
+        values = df[column]
+        if values.dtype == object and not values.dropna().map(type).eq(str).all():
+            try:
+                df[column] = pd.to_numeric(values)
+            except (ValueError, TypeError):
+                df[column] = values.where(values.isna(), values.astype(str))
+    if df.index.dtype == object:
+        df.index = df.index.astype(str)
+    return df
+
+
+def save_snapshot(df, csv_path, csv=True):
+    """
+    Save an issuer's data, or the combined output, as a typed Parquet snapshot next to the CSV file. Both files are
+    written to a temporary file first and then renamed, so readers never see a partial file.
+
+    :param df: The data indexed by ticker
+    :type df: pd.DataFrame
+    :param csv_path: The path of the CSV file, e.g. data/vanguard.csv
+    :type csv_path: str
+    :param csv: Whether to also export the CSV file, with dates as MM-DD-YYYY
+    :type csv: bool, optional
+    :return: The typed data
+    :rtype: pd.DataFrame
+    """
+    typed = to_typed(df)
+    if csv:
+        tmp_file = csv_path + '.tmp'
+        typed.to_csv(tmp_file, date_format=csv_date_format)
+        os.replace(tmp_file, csv_path)
+
+    # Written after the CSV file, so load_snapshot prefers it
+    parquet_path = snapshot_path(csv_path)
+    tmp_file = parquet_path + '.tmp'
+    typed.to_parquet(tmp_file)
+    os.replace(tmp_file, parquet_path)
+    return typed
+
+
+def load_snapshot(csv_path, columns=None):
+    """
+    Load an issuer's data from its Parquet snapshot. The CSV file is read instead if there is no snapshot or the CSV
+    file was changed after it, e.g. when edited by hand.
+
+    :param csv_path: The path of the CSV file, e.g. data/vanguard.csv
+    :type csv_path: str
+    :param columns: The columns to load if present, defaults to all columns
+    :type columns: list, optional
+    :return: The typed data indexed by ticker
+    :rtype: pd.DataFrame
+    """
+    parquet_path = snapshot_path(csv_path)
+    if os.path.exists(parquet_path) and (
+            not os.path.exists(csv_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)):
+        if columns is not None:
+            names = pq.read_schema(parquet_path).names
+            columns = [column for column in columns if column in names]
+        return pd.read_parquet(parquet_path, columns=columns)
+
+    usecols = None
+    if columns is not None:
+        # Only parse the index and the requested columns
+        header = list(pd.read_csv(csv_path, nrows=0).columns)
+        usecols = header[:1] + [column for column in header[1:] if column in columns]
+    return to_typed(pd.read_csv(csv_path, index_col=0, usecols=usecols))
@@ -0,0 +1,109 @@
+import time
+from tqdm import tqdm
+from selenium.common.exceptions import WebDriverException
+from utils.drivers import block_resources
+from utils.waits import polite_pause
+
+# Empties the current page, so its elements can't be mistaken for those of the next page, and starts loading the next
+# page without waiting for it
+_navigate_script = """
+document.documentElement.innerHTML = '';
+window.location.href = arguments[0];
+"""
+
+_ready_script = "return document.querySelector(arguments[0]) !== null;"
+
+
+def harvest_tabs(driver, urls, ready, extract, tabs=4, timeout=20, poll_frequency=0.2, issuer=None, progress=True):
+    """
+    Load pages in several tabs of one browser at the same time and read each page as soon as its target element
+    appears. A tab that has been read moves on to the next url, so up to tabs pages load in parallel without the
+    memory of a browser per page. The extra tabs of a lean driver block the same resources as its first tab. The extra
+    tabs are closed and the original tab is focused again on return. The performance log of the browser mixes the
+    traffic of all its tabs, so extract can't tell which captured responses belong to its page, see utils.network.
+
+    :param driver: Selenium driver
+    :type driver: selenium.webdriver.chrome.webdriver.WebDriver
+    :param urls: The urls of the pages
+    :type urls: list
+    :param ready: CSS selector of the element that shows the page is ready to be read
+    :type ready: str
+    :param extract: Reads the focused page, called as extract(driver, url)
+    :type extract: callable
+    :param tabs: Number of tabs loading pages at the same time
+    :type tabs: int
+    :param timeout: Maximum seconds to wait for a page's ready element
+    :type timeout: float
+    :param poll_frequency: Seconds between rounds over the tabs
+    :type poll_frequency: float
+    :param issuer: The issuer key whose rate limit every page load waits for, e.g. 'vanguard'
+    :type issuer: str, optional
+    :param progress: Whether to show a progress bar
+    :type progress: bool
+    :return: The results of extract in the order of the urls, None for pages that timed out or failed
+    :rtype: list
+    """
+    urls = list(urls)
+    results = [None] * len(urls)
+    if not urls:
+        return results
+
+    original = driver.current_window_handle
+    handles = [original]
+    pending = iter(enumerate(urls))
+    busy = {}
+
+    def assign(handle):
+        # Start loading the next url in the tab, or leave the tab idle if all urls are assigned
+        item = next(pending, None)
+        if item is None:
+            busy.pop(handle, None)
+            return
+        index, url = item
+        driver.switch_to.window(handle)
+        if issuer is not None:
+            polite_pause(issuer)
+        driver.execute_script(_navigate_script, url)
+        # Count the load like driver.get does in a pooled browser, so it is still replaced after max_page_loads
+        driver.page_loads = getattr(driver, 'page_loads', 0) + 1
+        busy[handle] = (index, url, time.monotonic() + timeout)
+
+    try:
+        for _ in range(min(tabs, len(urls)) - 1):
+            driver.switch_to.new_window('tab')
+            if getattr(driver, 'lean', False):
+                block_resources(driver)
+            handles.append(driver.current_window_handle)
+        for handle in handles:
+            assign(handle)
+
+        with tqdm(total=len(urls), disable=not progress) as bar:
+            while busy:
+                for handle, (index, url, deadline) in list(busy.items()):
+                    driver.switch_to.window(handle)
+                    try:
+                        is_ready = driver.execute_script(_ready_script, ready)
+                    except WebDriverException:
+                        # The page is between documents
+                        is_ready = False
+                    if not is_ready and time.monotonic() < deadline:
+                        continue
+                    if is_ready:
+                        try:
+                            results[index] = extract(driver, url)
+                        except Exception as e:
+                            print(f'Failed to read {url}: {e}')
+                    else:
+                        print(f'Timed out waiting for {url}')
+                    bar.update()
+                    assign(handle)
+                time.sleep(poll_frequency)
+    finally:
+        for handle in handles[1:]:
+            try:
+                driver.switch_to.window(handle)
+                driver.close()
+            except WebDriverException:
+                pass
+        driver.switch_to.window(original)
+    return results
@@ -0,0 +1,115 @@
+import os
+import time
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from utils.rate_limit import acquire, acquire_async
+
+# Returns the document state and the number of finished network requests of the page
+_network_activity_script = """
+performance.setResourceTimingBufferSize(100000);
+return [document.readyState, performance.getEntriesByType('resource').length];
+"""
+
+
+def polite_pause(issuer):
+    """
+    Wait for the rate limit of the issuer's host before requesting a page. Safe to call from several threads.
+
+    :param issuer: The issuer key, e.g. 'vanguard'
+    :type issuer: str
+    :return: None
+    :rtype: None
+    """
+    acquire(issuer)
+
+
+async def polite_pause_async(issuer):
+    """
+    Asynchronous polite_pause for coroutines. Shares the rate limit of polite_pause, so threads and coroutines
+    requesting the same host are limited together.
+
+    :param issuer: The issuer key, e.g. 'vanguard'
+    :type issuer: str
+    :return: None
+    :rtype: None
+    """
+    await acquire_async(issuer)
+
+
+def wait_for_element(driver, locator, timeout=10, condition=EC.presence_of_element_located):
+    """
+    Wait until the element is found and return it as soon as the condition is met
+
+    :param driver: Selenium driver
+    :type driver: selenium.webdriver.chrome.webdriver.WebDriver
+    :param locator: The (By, selector) locator of the element
+    :type locator: tuple
+    :param timeout: Maximum seconds to wait
+    :type timeout: float
+    :param condition: The expected condition to wait for, defaults to the presence of the element
+    :type condition: callable
+    :return: The element
+    :rtype: selenium.webdriver.remote.webelement.WebElement
+    :raises TimeoutException: If the condition is not met within the timeout
+    """
+    return WebDriverWait(driver, timeout).until(condition(locator))
+
+
+def wait_for_network_idle(driver, idle_time=0.5, timeout=10, poll_frequency=0.1):
+    """
+    Wait until the page has been parsed and no network request has finished for idle_time seconds
+
+    :param driver: Selenium driver
+    :type driver: selenium.webdriver.chrome.webdriver.WebDriver
+    :param idle_time: Seconds without network activity that count as idle
+    :type idle_time: float
+    :param timeout: Maximum seconds to wait
+    :type timeout: float
+    :param poll_frequency: Seconds between checks
+    :type poll_frequency: float
+    :return: Whether the network went idle within the timeout
+    :rtype: bool
+    """
+    deadline = time.monotonic() + timeout
+    last_count = None
+    idle_since = time.monotonic()
+    while time.monotonic() < deadline:
+        ready_state, count = driver.execute_script(_network_activity_script)
+        now = time.monotonic()
+        if ready_state == 'loading' or count != last_count:
+            last_count = count
+            idle_since = now
+        elif now - idle_since >= idle_time:
+            return True
+        time.sleep(poll_frequency)
+    return False
+
+
+def wait_for_download(directory, extension, started_after, timeout=60, poll_frequency=0.2):
+    """
+    Wait until a download with the given extension has finished in the directory
+
+    :param directory: The download directory
+    :type directory: str
+    :param extension: The file extension of the download, e.g. '.xls'
+    :type extension: str
+    :param started_after: Epoch time before the download was started
+    :type started_after: float
+    :param timeout: Maximum seconds to wait
+    :type timeout: float
+    :param poll_frequency: Seconds between checks
+    :type poll_frequency: float
+    :return: The path to the downloaded file
+    :rtype: str
+    :raises TimeoutError: If no finished download appears within the timeout
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        files = os.listdir(directory)
+        in_progress = any(f.endswith('.crdownload') for f in files)
+        finished = [os.path.join(directory, f) for f in files if f.endswith(extension)]
+        finished = [f for f in finished if os.path.getmtime(f) >= started_after]
+        if finished and not in_progress:
+            return max(finished, key=os.path.getmtime)
+        time.sleep(poll_frequency)
+    raise TimeoutError(f'No {extension} download finished in {directory} within {timeout} seconds')